@@ -0,0 +1,425 @@
+#include <stdarg.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "bytecode.h"
+#include "memory.h"
+#include "vm.h"
+
+#define TAG_NUMBER   0
+#define TAG_STRING   1
+#define TAG_FUNCTION 2
+
+typedef struct {
+    const uint8_t* current;
+    const uint8_t* end;
+    bool hadError;
+} Reader;
+
+static void loadError(Reader* reader, const char* format, ...) {
+    if (reader->hadError) return;
+    reader->hadError = true;
+
+    startErrorRed();
+    fprintf(stderr, "Could not load bytecode: ");
+    va_list args;
+    va_start(args, format);
+    vfprintf(stderr, format, args);
+    va_end(args);
+    endColor();
+    fputs("\n", stderr);
+}
+
+static bool available(Reader* reader, size_t count) {
+    if (reader->hadError) return false;
+    if ((size_t)(reader->end - reader->current) < count) {
+        loadError(reader, "the file is truncated.");
+        return false;
+    }
+    return true;
+}
+
+static uint64_t readUnsigned(Reader* reader, int size) {
+    if (!available(reader, size)) return 0;
+
+    // Little endian, whatever the byte order of this machine.
+    uint64_t value = 0;
+    for (int i = 0; i < size; i++) {
+        value |= (uint64_t)reader->current[i] << (8u * i);
+    }
+    reader->current += size;
+    return value;
+}
+
+static ObjString* readString(Reader* reader) {
+    uint32_t length = (uint32_t)readUnsigned(reader, 4);
+    if (!available(reader, length)) return NULL;
+
+    ObjString* string = copyString((const char*)reader->current, (int)length);
+    reader->current += length;
+    return string;
+}
+
+// The operands an instruction takes from the stack and how many it
+// leaves, for the instructions whose effect does not depend on operands.
+typedef struct {
+    int operandBytes;
+    int needs;
+    int effect;
+} Instruction;
+
+static const Instruction instructions[] = {
+        [OP_CONSTANT]      = { 1, 0,  1 },
+        [OP_NIL]           = { 0, 0,  1 },
+        [OP_TRUE]          = { 0, 0,  1 },
+        [OP_FALSE]         = { 0, 0,  1 },
+        [OP_POP]           = { 0, 1, -1 },
+        [OP_GET_LOCAL]     = { 1, 0,  1 },
+        [OP_SET_LOCAL]     = { 1, 1,  0 },
+        [OP_DEFINE_GLOBAL] = { 1, 1, -1 },
+        [OP_GET_GLOBAL]    = { 1, 0,  1 },
+        [OP_SET_GLOBAL]    = { 1, 1,  0 },
+        [OP_GET_UPVALUE]   = { 1, 0,  1 },
+        [OP_SET_UPVALUE]   = { 1, 1,  0 },
+        [OP_GET_PROPERTY]  = { 1, 1,  0 },
+        [OP_SET_PROPERTY]  = { 1, 2, -1 },
+        [OP_GET_SUPER]     = { 1, 2, -1 },
+        [OP_EQUAL]         = { 0, 2, -1 },
+        [OP_GREATER]       = { 0, 2, -1 },
+        [OP_LESS]          = { 0, 2, -1 },
+        [OP_ADD]           = { 0, 2, -1 },
+        [OP_SUBTRACT]      = { 0, 2, -1 },
+        [OP_MULTIPLY]      = { 0, 2, -1 },
+        [OP_DIVIDE]        = { 0, 2, -1 },
+        [OP_NOT]           = { 0, 1,  0 },
+        [OP_NEGATE]        = { 0, 1,  0 },
+        [OP_PRINT]         = { 0, 1, -1 },
+        [OP_JUMP]          = { 2, 0,  0 },
+        [OP_JUMP_IF_FALSE] = { 2, 1,  0 },
+        [OP_LOOP]          = { 2, 0,  0 },
+        [OP_CALL]          = { 1, 0,  0 },
+        [OP_INVOKE]        = { 2, 0,  0 },
+        [OP_SUPER_INVOKE]  = { 2, 0,  0 },
+        [OP_CLOSURE]       = { 1, 0,  1 },
+        [OP_CLOSE_UPVALUE] = { 0, 1, -1 },
+        [OP_RETURN]        = { 0, 1, -1 },
+        [OP_CLASS]         = { 1, 0,  1 },
+        [OP_INHERIT]       = { 0, 2, -1 },
+        [OP_METHOD]        = { 1, 2, -1 },
+        [OP_SUBSCRIPT]     = { 0, 2, -1 },
+};
+
+#define UNVISITED     -1
+#define NOT_AN_OFFSET -2
+
+typedef struct {
+    Reader* reader;
+    ObjFunction* function;
+    // The stack height of the frame before each instruction, slot 0
+    // included, or one of the two markers above.
+    int* heights;
+    int* pending;
+    int pendingCount;
+} Verifier;
+
+static bool isStringConstant(Chunk* chunk, int index) {
+    return index < chunk->constants.count &&
+           IS_STRING(chunk->constants.values[index]);
+}
+
+static int instructionLength(Verifier* verifier, int offset) {
+    Chunk* chunk = &verifier->function->chunk;
+    uint8_t op = chunk->code[offset];
+    if (op > OP_SUBSCRIPT || op == OP_CONSTANT_LONG) {
+        loadError(verifier->reader, "unknown instruction %d at %d.", op, offset);
+        return 0;
+    }
+
+    int length = 1 + instructions[op].operandBytes;
+    if (offset + length > chunk->count) {
+        loadError(verifier->reader, "instruction at %d is cut short.", offset);
+        return 0;
+    }
+
+    uint8_t operand = length > 1 ? chunk->code[offset + 1] : 0;
+    switch (op) {
+        case OP_CONSTANT:
+            if (operand >= chunk->constants.count ||
+                IS_FUNCTION(chunk->constants.values[operand])) {
+                loadError(verifier->reader, "bad constant %d at %d.", operand, offset);
+                return 0;
+            }
+            break;
+        case OP_DEFINE_GLOBAL:
+        case OP_GET_GLOBAL:
+        case OP_SET_GLOBAL:
+        case OP_GET_PROPERTY:
+        case OP_SET_PROPERTY:
+        case OP_GET_SUPER:
+        case OP_INVOKE:
+        case OP_SUPER_INVOKE:
+        case OP_CLASS:
+        case OP_METHOD:
+            if (!isStringConstant(chunk, operand)) {
+                loadError(verifier->reader, "bad name constant %d at %d.", operand, offset);
+                return 0;
+            }
+            break;
+        case OP_GET_UPVALUE:
+        case OP_SET_UPVALUE:
+            if (operand >= verifier->function->upvalueCount) {
+                loadError(verifier->reader, "bad upvalue %d at %d.", operand, offset);
+                return 0;
+            }
+            break;
+        case OP_CLOSURE: {
+            if (operand >= chunk->constants.count ||
+                !IS_FUNCTION(chunk->constants.values[operand])) {
+                loadError(verifier->reader, "bad function constant %d at %d.", operand, offset);
+                return 0;
+            }
+            ObjFunction* nested = AS_FUNCTION(chunk->constants.values[operand]);
+            length += 2 * nested->upvalueCount;
+            if (offset + length > chunk->count) {
+                loadError(verifier->reader, "instruction at %d is cut short.", offset);
+                return 0;
+            }
+            break;
+        }
+        default:
+            break;
+    }
+    return length;
+}
+
+static void flowTo(Verifier* verifier, int from, int target, int height) {
+    Chunk* chunk = &verifier->function->chunk;
+    if (target < 0 || target >= chunk->count ||
+        verifier->heights[target] == NOT_AN_OFFSET) {
+        loadError(verifier->reader, "instruction at %d continues outside the code.", from);
+        return;
+    }
+
+    if (verifier->heights[target] == UNVISITED) {
+        verifier->heights[target] = height;
+        verifier->pending[verifier->pendingCount++] = target;
+    } else if (verifier->heights[target] != height) {
+        loadError(verifier->reader, "stack heights disagree at %d.", target);
+    }
+}
+
+static void verifyInstruction(Verifier* verifier, int offset, int length) {
+    Reader* reader = verifier->reader;
+    Chunk* chunk = &verifier->function->chunk;
+    uint8_t* code = chunk->code + offset;
+    uint8_t op = code[0];
+    int height = verifier->heights[offset];
+    int needs = instructions[op].needs;
+    int effect = instructions[op].effect;
+
+    switch (op) {
+        case OP_GET_LOCAL:
+        case OP_SET_LOCAL:
+            if (code[1] >= height) {
+                loadError(reader, "bad local slot %d at %d.", code[1], offset);
+                return;
+            }
+            break;
+        case OP_CALL:
+            needs = code[1] + 1;
+            effect = -code[1];
+            break;
+        case OP_INVOKE:
+            needs = code[2] + 1;
+            effect = -code[2];
+            break;
+        case OP_SUPER_INVOKE:
+            needs = code[2] + 2;
+            effect = -code[2] - 1;
+            break;
+        case OP_CLOSURE:
+            for (int i = 2; i < length; i += 2) {
+                bool isLocal = code[i] == 1;
+                // The closure is pushed before it captures, a local
+                // function captures the slot it is about to be stored in.
+                int limit = isLocal ? height + 1 : verifier->function->upvalueCount;
+                if (code[i] > 1 || code[i + 1] >= limit) {
+                    loadError(reader, "bad captured variable at %d.", offset);
+                    return;
+                }
+            }
+            break;
+        default:
+            break;
+    }
+
+    // Slot 0 holds the closure or the receiver and is never an operand.
+    if (height - 1 < needs) {
+        loadError(reader, "stack underflow at %d.", offset);
+        return;
+    }
+    height += effect;
+    if (height > STACK_MAX) {
+        loadError(reader, "stack overflow at %d.", offset);
+        return;
+    }
+
+    int next = offset + length;
+    switch (op) {
+        case OP_RETURN:
+            return;
+        case OP_JUMP:
+            flowTo(verifier, offset, next + (code[1] << 8u | code[2]), height);
+            return;
+        case OP_JUMP_IF_FALSE:
+            flowTo(verifier, offset, next + (code[1] << 8u | code[2]), height);
+            break;
+        case OP_LOOP:
+            flowTo(verifier, offset, next - (code[1] << 8u | code[2]), height);
+            return;
+        default:
+            break;
+    }
+    flowTo(verifier, offset, next, height);
+}
+
+// Checks that every operand refers to something the function has and
+// every jump lands on an instruction, and that the stack has the same
+// height whichever way an instruction is reached, never reaching below
+// the slots of the frame. The VM trusts its code, a bad chunk would make
+// it read and write outside its arrays.
+static void verifyFunction(Reader* reader, ObjFunction* function) {
+    Chunk* chunk = &function->chunk;
+    if (chunk->count == 0) {
+        loadError(reader, "function has no code.");
+        return;
+    }
+
+    Verifier verifier;
+    verifier.reader = reader;
+    verifier.function = function;
+    verifier.heights = malloc(sizeof(int) * chunk->count);
+    verifier.pending = malloc(sizeof(int) * chunk->count);
+    verifier.pendingCount = 0;
+    if (verifier.heights == NULL || verifier.pending == NULL) {
+        loadError(reader, "not enough memory to verify the code.");
+        free(verifier.heights);
+        free(verifier.pending);
+        return;
+    }
+
+    for (int offset = 0; offset < chunk->count && !reader->hadError;) {
+        int length = instructionLength(&verifier, offset);
+        verifier.heights[offset] = UNVISITED;
+        for (int i = 1; i < length; i++) {
+            verifier.heights[offset + i] = NOT_AN_OFFSET;
+        }
+        offset += length;
+    }
+
+    if (!reader->hadError) {
+        verifier.heights[0] = function->arity + 1;
+        verifier.pending[verifier.pendingCount++] = 0;
+    }
+    while (verifier.pendingCount > 0 && !reader->hadError) {
+        int offset = verifier.pending[--verifier.pendingCount];
+        verifyInstruction(&verifier, offset, instructionLength(&verifier, offset));
+    }
+
+    free(verifier.heights);
+    free(verifier.pending);
+}
+
+static ObjFunction* readFunction(Reader* reader, int depth) {
+    if (depth == UINT8_COUNT) {
+        loadError(reader, "functions are nested too deeply.");
+        return NULL;
+    }
+
+    ObjFunction* function = newFunction();
+    // Reachable from the stack while the rest of it is allocated.
+    push(OBJ_VAL(function));
+
+    bool hasName = readUnsigned(reader, 1) != 0;
+    function->arity = (int)readUnsigned(reader, 2);
+    if (hasName) function->name = readString(reader);
+    function->upvalueCount = (int)readUnsigned(reader, 2);
+    if (function->arity > UINT8_MAX || function->upvalueCount > UINT8_COUNT) {
+        loadError(reader, "function has too many parameters or upvalues.");
+    }
+
+    uint32_t count = (uint32_t)readUnsigned(reader, 4);
+    if (available(reader, (size_t)count * 5)) {
+        const uint8_t* code = reader->current;
+        reader->current += count;
+        for (uint32_t i = 0; i < count; i++) {
+            writeChunk(&function->chunk, code[i], (int)readUnsigned(reader, 4));
+        }
+    }
+
+    int constantCount = (int)readUnsigned(reader, 2);
+    if (constantCount > UINT8_COUNT) {
+        loadError(reader, "chunk has more than %d constants.", UINT8_COUNT);
+    }
+    for (int i = 0; i < constantCount && !reader->hadError; i++) {
+        uint8_t tag = (uint8_t)readUnsigned(reader, 1);
+        switch (tag) {
+            case TAG_NUMBER: {
+                uint64_t bits = readUnsigned(reader, 8);
+                double number;
+                memcpy(&number, &bits, sizeof(double));
+                addConstant(&function->chunk, NUMBER_VAL(number));
+                break;
+            }
+            case TAG_STRING: {
+                ObjString* string = readString(reader);
+                if (string != NULL) addConstant(&function->chunk, OBJ_VAL(string));
+                break;
+            }
+            case TAG_FUNCTION: {
+                ObjFunction* nested = readFunction(reader, depth + 1);
+                if (nested != NULL) addConstant(&function->chunk, OBJ_VAL(nested));
+                break;
+            }
+            default:
+                loadError(reader, "unknown constant tag %d.", tag);
+        }
+    }
+
+    if (!reader->hadError) verifyFunction(reader, function);
+
+    pop();
+    return reader->hadError ? NULL : function;
+}
+
+bool isBytecode(const uint8_t* bytes, size_t length) {
+    return length >= BYTECODE_MAGIC_LENGTH &&
+           memcmp(bytes, BYTECODE_MAGIC, BYTECODE_MAGIC_LENGTH) == 0;
+}
+
+ObjFunction* loadBytecode(const uint8_t* bytes, size_t length) {
+    Reader reader;
+    reader.current = bytes;
+    reader.end = bytes + length;
+    reader.hadError = false;
+
+    if (!isBytecode(bytes, length)) {
+        loadError(&reader, "not a bytecode file.");
+        return NULL;
+    }
+    reader.current += BYTECODE_MAGIC_LENGTH;
+
+    int version = (int)readUnsigned(&reader, 2);
+    if (!reader.hadError && version != BYTECODE_VERSION) {
+        loadError(&reader, "version %d is not supported, expected %d.",
+                  version, BYTECODE_VERSION);
+        return NULL;
+    }
+
+    ObjFunction* function = readFunction(&reader, 0);
+    if (function != NULL && reader.current != reader.end) {
+        loadError(&reader, "unexpected data after the script.");
+        return NULL;
+    }
+    return function;
+}
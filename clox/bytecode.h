@@ -0,0 +1,16 @@
+#ifndef clox_bytecode_h
+#define clox_bytecode_h
+
+#include "object.h"
+
+// Written by plox/bytecode.py, which documents the layout. The loader
+// checks the layout and verifies the code of every function before any
+// of it runs, a file it rejects is an INTERPRET_COMPILE_ERROR.
+#define BYTECODE_MAGIC "LOXC"
+#define BYTECODE_MAGIC_LENGTH 4
+#define BYTECODE_VERSION 1
+
+bool isBytecode(const uint8_t* bytes, size_t length);
+ObjFunction* loadBytecode(const uint8_t* bytes, size_t length);
+
+#endif
@@ -3,6 +3,7 @@
 #include <string.h>
 
 #include "common.h"
+#include "bytecode.h"
 #include "vm.h"
 
 static void repl() {
@@ -19,7 +20,7 @@ static void repl() {
     }
 }
 
-static char* readFile(const char* path) {
+static char* readFile(const char* path, size_t* length) {
     FILE* file = fopen(path, "rb");
     if (file == NULL) {
         fprintf(stderr, "Could not open file \"%s\".\n", path);
@@ -42,14 +43,22 @@ static char* readFile(const char* path) {
         exit(74);
     }
     buffer[bytesRead] = '\0';
+    *length = bytesRead;
 
     fclose(file);
     return buffer;
 }
 
 static void runFile(const char* path) {
-    char* source = readFile(path);
-    InterpretResult result = interpret(source);
+    size_t length;
+    char* source = readFile(path, &length);
+    // A file written by plox --emit-bytecode runs without being compiled.
+    InterpretResult result;
+    if (isBytecode((const uint8_t*)source, length)) {
+        result = interpretBytecode((const uint8_t*)source, length);
+    } else {
+        result = interpret(source);
+    }
     free(source);
 
     if (result == INTERPRET_COMPILE_ERROR) exit(65);
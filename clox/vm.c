@@ -5,6 +5,7 @@
 
 #include "common.h"
 #include "vm.h"
+#include "bytecode.h"
 #include "debug.h"
 #include "compiler.h"
 #include "memory.h"
@@ -708,10 +709,7 @@ static InterpretResult run() {
     }
 }
 
-InterpretResult interpret(const char *source) {
-    ObjFunction* function = compile(source);
-    if (function == NULL) return INTERPRET_COMPILE_ERROR;
-
+static InterpretResult runScript(ObjFunction* function) {
     push(OBJ_VAL(function));
     ObjClosure* closure = newClosure(function);
     pop();
@@ -719,4 +717,18 @@ InterpretResult interpret(const char *source) {
     callValue(OBJ_VAL(closure), 0);
 
     return run();
-}
\ No newline at end of file
+}
+
+InterpretResult interpret(const char *source) {
+    ObjFunction* function = compile(source);
+    if (function == NULL) return INTERPRET_COMPILE_ERROR;
+
+    return runScript(function);
+}
+
+InterpretResult interpretBytecode(const uint8_t* bytes, size_t length) {
+    ObjFunction* function = loadBytecode(bytes, length);
+    if (function == NULL) return INTERPRET_COMPILE_ERROR;
+
+    return runScript(function);
+}
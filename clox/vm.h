@@ -46,6 +46,7 @@ extern VM vm;
 void initVM();
 void freeVM();
 InterpretResult interpret(const char* source);
+InterpretResult interpretBytecode(const uint8_t* bytes, size_t length);
 void push(Value value);
 Value pop();
 
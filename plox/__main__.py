@@ -0,0 +1,3 @@
+from plox.lox import main
+
+main()
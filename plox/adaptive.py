@@ -0,0 +1,314 @@
+import operator
+import weakref
+from collections import Counter
+
+import plox.expr as Expr
+from plox.interpreter import Interpreter, is_plox_equal
+from plox.lox_callable import LoxCallable
+from plox.lox_class import LoxClass
+from plox.lox_function import LoxFunction
+from plox.lox_instance import LoxInstance
+from plox.lox_string import Rope
+from plox.token_type import TokenType
+
+# Executions of a generic site before it tries to specialize itself
+WARMUP = 8
+MAX_BACKOFF = 1024
+
+_NUMBERS = (int, float)
+_STRINGS = (str, Rope)
+
+
+class AdaptiveStats(object):
+    def __init__(self):
+        self.generic = Counter()
+        self.hits = Counter()
+        self.specializations = Counter()
+        self.deopts = Counter()
+        self.sites = set()
+
+    def specialize(self, expr, specialized, target=None):
+        expr.__class__ = specialized
+        expr.target = target
+        expr.hits = 0
+        self.sites.add(expr)
+        self.specializations[expr.kind] += 1
+
+    def deoptimize(self, expr):
+        self._flush(expr)
+        self.sites.discard(expr)
+        self.deopts[expr.kind] += 1
+        expr.__class__ = expr.generic
+        back_off(expr)
+
+    def _flush(self, expr):
+        self.hits[(expr.category, expr.kind)] += expr.hits
+        expr.hits = 0
+
+    def report(self):
+        for expr in self.sites:
+            self._flush(expr)
+
+        lines = []
+        categories = sorted(set(self.generic) | {category for category, _ in self.hits})
+        for category in categories:
+            kinds = {kind: count for (cat, kind), count in self.hits.items() if cat == category}
+            specialized = sum(kinds.values())
+            total = specialized + self.generic[category]
+            rate = 100.0 * specialized / total if total else 0.0
+            lines.append(f'{category}: {specialized} of {total} executions specialized ({rate:.1f}%)')
+            for kind in sorted(kinds):
+                lines.append(f'  {kind:<16} hits: {kinds[kind]:<10} '
+                             f'sites: {self.specializations[kind]:<4} deopts: {self.deopts[kind]}')
+        return '\n'.join(lines)
+
+
+def back_off(expr):
+    expr.backoff = min(getattr(expr, 'backoff', WARMUP) * 2, MAX_BACKOFF)
+    expr.warmup = expr.backoff
+
+
+class _NumberBinary(Expr.Binary):
+    category = 'binary'
+    generic = Expr.Binary
+    op = None
+
+    def accept(self, visitor):
+        left = self.left.accept(visitor)
+        right = self.right.accept(visitor)
+        if left.__class__ in _NUMBERS and right.__class__ in _NUMBERS:
+            self.hits += 1
+            return self.op(left, right)
+
+        visitor.stats.deoptimize(self)
+        return visitor._binary(self, left, right)
+
+
+def _number_binary(symbol, op):
+    return type(f'_Number{op.__name__.capitalize()}', (_NumberBinary,), {'kind': f'number {symbol}', 'op': op})
+
+
+class _NumberDivide(_NumberBinary):
+    kind = 'number /'
+
+    def accept(self, visitor):
+        left = self.left.accept(visitor)
+        right = self.right.accept(visitor)
+        if left.__class__ in _NUMBERS and right.__class__ in _NUMBERS and right != 0:
+            self.hits += 1
+            return left / right
+
+        visitor.stats.deoptimize(self)
+        return visitor._binary(self, left, right)
+
+
+class _StringAdd(Expr.Binary):
+    category = 'binary'
+    generic = Expr.Binary
+    kind = 'string +'
+
+    def accept(self, visitor):
+        left = self.left.accept(visitor)
+        right = self.right.accept(visitor)
+        if left.__class__ in _STRINGS and right.__class__ in _STRINGS:
+            self.hits += 1
+            return visitor._concat(left, right)
+
+        visitor.stats.deoptimize(self)
+        return visitor._binary(self, left, right)
+
+
+NUMBER_BINARIES = {
+    TokenType.PLUS: _number_binary('+', operator.add),
+    TokenType.MINUS: _number_binary('-', operator.sub),
+    TokenType.STAR: _number_binary('*', operator.mul),
+    TokenType.SLASH: _NumberDivide,
+    TokenType.GREATER: _number_binary('>', operator.gt),
+    TokenType.GREATER_EQUAL: _number_binary('>=', operator.ge),
+    TokenType.LESS: _number_binary('<', operator.lt),
+    TokenType.LESS_EQUAL: _number_binary('<=', operator.le),
+    TokenType.EQUAL_EQUAL: _number_binary('==', operator.eq),
+    TokenType.BANG_EQUAL: _number_binary('!=', operator.ne),
+}
+
+
+class _Equality(Expr.Binary):
+    """Equality is defined between any two values so it needs no guard."""
+    category = 'binary'
+    generic = Expr.Binary
+    kind = 'any =='
+
+    def accept(self, visitor):
+        left = self.left.accept(visitor)
+        right = self.right.accept(visitor)
+        self.hits += 1
+        return is_plox_equal(left, right)
+
+
+class _Inequality(_Equality):
+    kind = 'any !='
+
+    def accept(self, visitor):
+        left = self.left.accept(visitor)
+        right = self.right.accept(visitor)
+        self.hits += 1
+        return not is_plox_equal(left, right)
+
+
+EQUALITIES = {
+    TokenType.EQUAL_EQUAL: _Equality,
+    TokenType.BANG_EQUAL: _Inequality,
+}
+
+
+class _CallFunction(Expr.Call):
+    category = 'call'
+    generic = Expr.Call
+    kind = 'lox function'
+
+    def accept(self, visitor):
+        func = self.callee.accept(visitor)
+        arguments = []
+        for argument in self.arguments:
+            arguments.append(argument.accept(visitor))
+        # Every closure of the same declaration shares its arity
+        if func.__class__ is LoxFunction and func.declaration is self.target:
+            self.hits += 1
+            return visitor._invoke(self, func, arguments)
+
+        visitor.stats.deoptimize(self)
+        return visitor._call(self, func, arguments)
+
+
+class _CallTarget(Expr.Call):
+    category = 'call'
+    generic = Expr.Call
+
+    def accept(self, visitor):
+        func = self.callee.accept(visitor)
+        arguments = []
+        for argument in self.arguments:
+            arguments.append(argument.accept(visitor))
+        if func is self.target:
+            self.hits += 1
+            return visitor._invoke(self, func, arguments)
+
+        visitor.stats.deoptimize(self)
+        return visitor._call(self, func, arguments)
+
+
+class _CallClass(_CallTarget):
+    kind = 'class'
+
+
+class _CallNative(_CallTarget):
+    kind = 'native'
+
+
+class _GetField(Expr.Get):
+    category = 'get'
+    generic = Expr.Get
+    kind = 'field'
+
+    def accept(self, visitor):
+        obj = self.objct.accept(visitor)
+        if obj.__class__ is LoxInstance:
+            fields = obj.fields
+            name = self.name.lexeme
+            if name in fields:
+                self.hits += 1
+                return fields[name]
+
+        visitor.stats.deoptimize(self)
+        return visitor._get(self, obj)
+
+
+class _GetMethod(Expr.Get):
+    category = 'get'
+    generic = Expr.Get
+    kind = 'method'
+
+    def accept(self, visitor):
+        obj = self.objct.accept(visitor)
+        if obj.__class__ is LoxInstance and obj.klass is self.target[0] and self.name.lexeme not in obj.fields:
+            self.hits += 1
+            method = self.target[1]
+            if method.is_getter:
+                return visitor._call_getter(self, method.bind(obj))
+            return method.bind(obj)
+
+        visitor.stats.deoptimize(self)
+        return visitor._get(self, obj)
+
+
+class AdaptiveInterpreter(Interpreter):
+    """Interpreter whose binary, call and get sites rewrite themselves into
+    type specialized nodes once warmed up, and fall back when a guard fails."""
+
+    def __init__(self, error, output=None):
+        super().__init__(error, output)
+        self.stats = AdaptiveStats()
+
+    def weaken(self):
+        super().weaken()
+        self.stats.sites = weakref.WeakSet(self.stats.sites)
+
+    def visit_binary_expr(self, expr: Expr.Binary) -> object:
+        left = self.evaluate(expr.left)
+        right = self.evaluate(expr.right)
+        result = self._binary(expr, left, right)
+
+        if self._warm(expr, Expr.Binary, 'binary'):
+            opt = expr.operator.type
+            if left.__class__ in _NUMBERS and right.__class__ in _NUMBERS and opt in NUMBER_BINARIES:
+                self.stats.specialize(expr, NUMBER_BINARIES[opt])
+            elif left.__class__ in _STRINGS and right.__class__ in _STRINGS and opt == TokenType.PLUS:
+                self.stats.specialize(expr, _StringAdd)
+            elif opt in EQUALITIES:
+                self.stats.specialize(expr, EQUALITIES[opt])
+            else:
+                back_off(expr)
+
+        return result
+
+    def visit_call_expr(self, expr: Expr.Call) -> object:
+        func = self.evaluate(expr.callee)
+        arguments = []
+        for argument in expr.arguments:
+            arguments.append(self.evaluate(argument))
+        result = self._call(expr, func, arguments)
+
+        if self._warm(expr, Expr.Call, 'call'):
+            if func.__class__ is LoxFunction:
+                self.stats.specialize(expr, _CallFunction, func.declaration)
+            elif func.__class__ is LoxClass:
+                self.stats.specialize(expr, _CallClass, func)
+            elif isinstance(func, LoxCallable):
+                self.stats.specialize(expr, _CallNative, func)
+            else:
+                back_off(expr)
+
+        return result
+
+    def visit_get_expr(self, expr: Expr.Get) -> object:
+        obj = self.evaluate(expr.objct)
+        result = self._get(expr, obj)
+
+        if self._warm(expr, Expr.Get, 'get'):
+            if obj.__class__ is LoxInstance and expr.name.lexeme in obj.fields:
+                self.stats.specialize(expr, _GetField)
+            elif obj.__class__ is LoxInstance:
+                method = obj.klass.find_method(expr.name.lexeme)
+                self.stats.specialize(expr, _GetMethod, (obj.klass, method))
+            else:
+                back_off(expr)
+
+        return result
+
+    def _warm(self, expr, generic, category):
+        self.stats.generic[category] += 1
+        # A recursive evaluation may already have specialized this site
+        if expr.__class__ is not generic:
+            return False
+        expr.warmup = getattr(expr, 'warmup', WARMUP) - 1
+        return expr.warmup <= 0
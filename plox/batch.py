@@ -0,0 +1,116 @@
+import gc
+import io
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import List
+
+from plox.lox import Lox
+
+
+class BatchResult(object):
+    def __init__(self, path: str, exit_code: int, stdout: str, elapsed: float):
+        self.path = path
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.elapsed = elapsed
+
+    def to_json(self):
+        return {
+            'path': self.path,
+            'exit_code': self.exit_code,
+            'elapsed': round(self.elapsed, 6),
+            'stdout': self.stdout,
+        }
+
+
+def read_manifest(path: str) -> List[str]:
+    """Read one script path per line, relative to the manifest.
+
+    Blank lines and lines starting with '#' are skipped.
+    """
+    directory = os.path.dirname(path)
+    scripts = []
+    with open(path, 'r') as mf:
+        for line in mf:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                scripts.append(os.path.join(directory, line))
+    return scripts
+
+
+def run_script(path: str, adaptive=False, memo_size=0) -> BatchResult:
+    start = time.perf_counter()
+    with io.StringIO() as buf, redirect_stdout(buf):
+        try:
+            with open(path, 'r') as lf:
+                data = lf.read()
+            lox = Lox(adaptive, memo_size)
+            lox.run(data)
+            exit_code = 65 if lox.had_error else 70 if lox.had_runtime_error else 0
+        except OSError as e:
+            print(f'Could not read {path}: {e.strerror}.')
+            exit_code = 66
+        except RecursionError:
+            print('RecursionError: maximum recursion depth exceeded')
+            exit_code = 70
+        except Exception:
+            # a bug in plox fails this script, not the whole batch
+            print(traceback.format_exc(), end='')
+            exit_code = 70
+        output = buf.getvalue()
+    return BatchResult(path, exit_code, output, time.perf_counter() - start)
+
+
+def _run_script(job):
+    return run_script(*job)
+
+
+def run_batch(paths: List[str], jobs=1, adaptive=False, memo_size=0) -> List[BatchResult]:
+    """Run every script in its own interpreter and return the results in order.
+
+    With more than one job the scripts are spread over a pool of worker
+    processes. The workers import plox once and then run script after
+    script, so only the first script in each worker pays for start-up.
+    """
+    work = [(path, adaptive, memo_size) for path in paths]
+    if jobs <= 1 or len(work) <= 1:
+        return [_run_script(job) for job in work]
+
+    # larger chunks cut the pickling overhead for thousands of small scripts
+    chunksize = max(1, len(work) // (jobs * 4))
+    # forked workers share the pages of what plox loaded as long as no
+    # collection writes to the objects on them
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(_run_script, work, chunksize=chunksize))
+    finally:
+        gc.unfreeze()
+
+
+def batch_exit_code(results: List[BatchResult]) -> int:
+    return max((result.exit_code for result in results), default=0)
+
+
+def batch_summary(results: List[BatchResult], jobs: int, elapsed: float):
+    return {
+        'jobs': jobs,
+        'elapsed': round(elapsed, 6),
+        'scripts': len(results),
+        'failed': sum(1 for result in results if result.exit_code),
+        'exit_code': batch_exit_code(results),
+        'results': [result.to_json() for result in results],
+    }
+
+
+def write_summary(path: str, summary):
+    if path == '-':
+        print(json.dumps(summary, indent=2))
+        return
+    with open(path, 'w') as jf:
+        json.dump(summary, jf, indent=2)
+        jf.write('\n')
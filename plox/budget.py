@@ -0,0 +1,64 @@
+import sys
+import time
+
+from plox.lox_instance import LoxInstance
+from plox.plox_errors import PloxRuntimeError
+from plox.token import Token
+
+# the deadline and memory limits are only looked at every CHECK_INTERVAL steps
+CHECK_INTERVAL = 1024
+
+# an instance and its empty field dict, fields added later are not charged
+INSTANCE_SIZE = sys.getsizeof(LoxInstance(None)) + sys.getsizeof({})
+
+
+class Budget(object):
+    """Limits on what a single run of a script may use.
+
+    A step is one loop iteration or one call, the points where a runaway
+    script has to pass through, so nothing is counted per expression.
+    memory limits the bytes allocated for instances and concatenated
+    strings during the run. Telling which of them are still alive would
+    need a finalizer on every object, so the budget counts them as they
+    are created, which can only overestimate the live size.
+    """
+
+    def __init__(self, steps=None, seconds=None, depth=None, memory=None):
+        self.max_steps = steps
+        self.seconds = seconds
+        self.max_depth = depth
+        self.max_memory = memory
+        self.start()
+
+    def start(self):
+        self.steps = 0
+        self.depth = 0
+        self.allocated = 0
+        self.deadline = None if self.seconds is None else time.perf_counter() + self.seconds
+        self._next_check = self._check_at()
+
+    def step(self, token: Token):
+        self.steps += 1
+        if self.steps >= self._next_check:
+            self._check(token)
+
+    def enter(self, token: Token):
+        self.step(token)
+        if self.max_depth is not None and self.depth >= self.max_depth:
+            raise PloxRuntimeError(token, f'Call depth budget of {self.max_depth} exceeded.')
+        self.depth += 1
+
+    def _check_at(self):
+        next_check = self.steps + CHECK_INTERVAL
+        if self.max_steps is not None:
+            next_check = min(next_check, self.max_steps + 1)
+        return next_check
+
+    def _check(self, token: Token):
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise PloxRuntimeError(token, f'Step budget of {self.max_steps} exceeded.')
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise PloxRuntimeError(token, f'Time budget of {self.seconds:g} s exceeded.')
+        if self.max_memory is not None and self.allocated > self.max_memory:
+            raise PloxRuntimeError(token, f'Memory budget of {self.max_memory} bytes exceeded.')
+        self._next_check = self._check_at()
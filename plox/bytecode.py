@@ -0,0 +1,663 @@
+import struct
+from enum import IntEnum
+
+import plox.expr as Expr
+import plox.stmt as Stmt
+from plox.token import Token
+from plox.token_type import TokenType as TT
+
+# the first bytes of a bytecode file, and the version of its layout, both
+# checked by the loader in clox/bytecode.c
+MAGIC = b'LOXC'
+VERSION = 1
+
+# tags of the constants in a bytecode file
+_NUMBER = 0
+_STRING = 1
+_FUNCTION = 2
+
+UINT8_COUNT = 256
+UINT16_MAX = 65535
+
+
+class OpCode(IntEnum):
+    """The instructions of clox, in the order of OpCode in clox/chunk.h."""
+    CONSTANT = 0
+    CONSTANT_LONG = 1
+    NIL = 2
+    TRUE = 3
+    FALSE = 4
+    POP = 5
+    GET_LOCAL = 6
+    SET_LOCAL = 7
+    DEFINE_GLOBAL = 8
+    GET_GLOBAL = 9
+    SET_GLOBAL = 10
+    GET_UPVALUE = 11
+    SET_UPVALUE = 12
+    GET_PROPERTY = 13
+    SET_PROPERTY = 14
+    GET_SUPER = 15
+    EQUAL = 16
+    GREATER = 17
+    LESS = 18
+    ADD = 19
+    SUBTRACT = 20
+    MULTIPLY = 21
+    DIVIDE = 22
+    NOT = 23
+    NEGATE = 24
+    PRINT = 25
+    JUMP = 26
+    JUMP_IF_FALSE = 27
+    LOOP = 28
+    CALL = 29
+    INVOKE = 30
+    SUPER_INVOKE = 31
+    CLOSURE = 32
+    CLOSE_UPVALUE = 33
+    RETURN = 34
+    CLASS = 35
+    INHERIT = 36
+    METHOD = 37
+    SUBSCRIPT = 38
+
+
+_BINARY = {
+    TT.BANG_EQUAL: (OpCode.EQUAL, OpCode.NOT),
+    TT.EQUAL_EQUAL: (OpCode.EQUAL,),
+    TT.GREATER: (OpCode.GREATER,),
+    TT.GREATER_EQUAL: (OpCode.LESS, OpCode.NOT),
+    TT.LESS: (OpCode.LESS,),
+    TT.LESS_EQUAL: (OpCode.GREATER, OpCode.NOT),
+    TT.PLUS: (OpCode.ADD,),
+    TT.MINUS: (OpCode.SUBTRACT,),
+    TT.STAR: (OpCode.MULTIPLY,),
+    TT.SLASH: (OpCode.DIVIDE,),
+}
+
+
+class Chunk(object):
+    def __init__(self):
+        self.code = bytearray()
+        self.lines = []
+        self.constants = []
+        self._indices = {}
+
+    def write(self, byte: int, line: int):
+        self.code.append(byte)
+        self.lines.append(line)
+
+    def add_constant(self, value) -> int:
+        """Index of value among the constants, equal numbers and strings share one."""
+        if isinstance(value, Function):
+            self.constants.append(value)
+            return len(self.constants) - 1
+        key = (value.__class__, struct.pack('<d', value) if value.__class__ is float else value)
+        index = self._indices.get(key)
+        if index is None:
+            index = self._indices[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+
+class Function(object):
+    """An ObjFunction of clox: its chunk, arity and the upvalues its closures capture."""
+
+    def __init__(self, name):
+        self.name = name
+        self.arity = 0
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __repr__(self):
+        return f'<fn {self.name}>' if self.name is not None else '<script>'
+
+
+class FunctionType(object):
+    FUNCTION = 'function'
+    INITIALIZER = 'initializer'
+    METHOD = 'method'
+    SCRIPT = 'script'
+
+
+class _Local(object):
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.captured = False
+
+
+class _Loop(object):
+    def __init__(self, local_count: int):
+        self.local_count = local_count
+        self.breaks = []
+
+
+class _FunctionState(object):
+    """What compiling one function keeps track of, the Compiler struct of clox/compiler.c."""
+
+    def __init__(self, enclosing, function: Function, kind):
+        self.enclosing = enclosing
+        self.function = function
+        self.kind = kind
+        # slot 0 holds the receiver of methods and the closure of functions
+        self.locals = [_Local('this' if kind != FunctionType.FUNCTION else '', 0)]
+        self.upvalues = []
+        self.scope_depth = 0
+        self.loops = []
+
+
+class _BytecodeError(Exception):
+    pass
+
+
+class BytecodeCompiler(Expr.ExprVisitor, Stmt.StmtVisitor):
+    """Lowers a resolved syntax tree to the bytecode of the clox VM.
+
+    The code is what clox/compiler.c emits for the same source: locals live
+    in stack slots, captured ones are closed over as upvalues and 'a.b()'
+    is a single invoke. A 'break' pops the locals of the loop body and jumps
+    past the loop, which clox has no syntax for. Getters, async functions,
+    range loops and assignments to subscripts have no instructions in clox
+    and are reported as errors, as are programs over the limits of its
+    chunks: 256 constants and locals per function and jumps of 65535 bytes.
+    """
+
+    def __init__(self, error):
+        self.error = error
+        self.had_error = False
+        self.state = None
+        self.line = 1
+        self.token = None
+
+    def compile(self, statements) -> Function:
+        """The script function of statements, or None when an error was reported."""
+        self.state = _FunctionState(None, Function(None), FunctionType.SCRIPT)
+        for statement in statements:
+            self._statement(statement)
+        function = self._end_function()
+        return None if self.had_error else function
+
+    def _statement(self, stmt):
+        try:
+            stmt.accept(self)
+        except _BytecodeError:
+            # carry on with the next statement to report every error
+            self.had_error = True
+
+    def _fail(self, token: Token, message: str):
+        self.error(token, message)
+        raise _BytecodeError()
+
+    def _at(self, token: Token):
+        self.token = token
+        self.line = token.line
+
+    @property
+    def _chunk(self) -> Chunk:
+        return self.state.function.chunk
+
+    def _emit(self, *instruction):
+        chunk = self._chunk
+        for byte in instruction:
+            chunk.write(byte, self.line)
+
+    def _emit_jump(self, op: OpCode) -> int:
+        self._emit(op, 0xff, 0xff)
+        return len(self._chunk.code) - 2
+
+    def _patch_jump(self, offset: int):
+        code = self._chunk.code
+        jump = len(code) - offset - 2
+        if jump > UINT16_MAX:
+            self._fail(self.token, 'Too much code to jump over.')
+        code[offset] = (jump >> 8) & 0xff
+        code[offset + 1] = jump & 0xff
+
+    def _emit_loop(self, loop_start: int):
+        self._emit(OpCode.LOOP)
+        offset = len(self._chunk.code) - loop_start + 2
+        if offset > UINT16_MAX:
+            self._fail(self.token, 'Loop body too large.')
+        self._emit((offset >> 8) & 0xff, offset & 0xff)
+
+    def _emit_return(self):
+        if self.state.kind == FunctionType.INITIALIZER:
+            self._emit(OpCode.GET_LOCAL, 0)
+        else:
+            self._emit(OpCode.NIL)
+        self._emit(OpCode.RETURN)
+
+    def _constant(self, value) -> int:
+        index = self._chunk.add_constant(value)
+        if index >= UINT8_COUNT:
+            self._fail(self.token, 'Too many constants in one chunk.')
+        return index
+
+    def _emit_constant(self, value):
+        self._emit(OpCode.CONSTANT, self._constant(value))
+
+    def _begin_scope(self):
+        self.state.scope_depth += 1
+
+    def _end_scope(self):
+        state = self.state
+        state.scope_depth -= 1
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            self._emit(OpCode.CLOSE_UPVALUE if state.locals[-1].captured else OpCode.POP)
+            state.locals.pop()
+
+    def _add_local(self, name: str):
+        locals = self.state.locals
+        if len(locals) == UINT8_COUNT:
+            self._fail(self.token, 'Too many local variables in function.')
+        locals.append(_Local(name, self.state.scope_depth))
+
+    def _declare(self, name: Token) -> int:
+        """Declare a variable, the constant of its name when it is a global."""
+        self._at(name)
+        if self.state.scope_depth > 0:
+            self._add_local(name.lexeme)
+            return 0
+        return self._constant(name.lexeme)
+
+    def _define(self, constant: int):
+        if self.state.scope_depth == 0:
+            self._emit(OpCode.DEFINE_GLOBAL, constant)
+
+    @staticmethod
+    def _resolve_local(state: _FunctionState, name: str) -> int:
+        for i in range(len(state.locals) - 1, -1, -1):
+            if state.locals[i].name == name:
+                return i
+        return -1
+
+    def _add_upvalue(self, state: _FunctionState, index: int, is_local: bool) -> int:
+        upvalue = (index, is_local)
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+        if len(state.upvalues) == UINT8_COUNT:
+            self._fail(self.token, 'Too many closure variables in function.')
+        state.upvalues.append(upvalue)
+        state.function.upvalue_count = len(state.upvalues)
+        return len(state.upvalues) - 1
+
+    def _resolve_upvalue(self, state: _FunctionState, name: str) -> int:
+        if state.enclosing is None:
+            return -1
+        local = self._resolve_local(state.enclosing, name)
+        if local != -1:
+            state.enclosing.locals[local].captured = True
+            return self._add_upvalue(state, local, True)
+        upvalue = self._resolve_upvalue(state.enclosing, name)
+        if upvalue != -1:
+            return self._add_upvalue(state, upvalue, False)
+        return -1
+
+    def _variable(self, name: str, value: Expr.Expr = None):
+        """Get the named variable, or set it to value."""
+        slot = self._resolve_local(self.state, name)
+        if slot != -1:
+            get_op, set_op = OpCode.GET_LOCAL, OpCode.SET_LOCAL
+        else:
+            slot = self._resolve_upvalue(self.state, name)
+            if slot != -1:
+                get_op, set_op = OpCode.GET_UPVALUE, OpCode.SET_UPVALUE
+            else:
+                slot = self._constant(name)
+                get_op, set_op = OpCode.GET_GLOBAL, OpCode.SET_GLOBAL
+
+        if value is None:
+            self._emit(get_op, slot)
+        else:
+            self._expression(value)
+            self._emit(set_op, slot)
+
+    def _expression(self, expr: Expr.Expr):
+        expr.accept(self)
+
+    def _arguments(self, arguments) -> int:
+        for argument in arguments:
+            self._expression(argument)
+        return len(arguments)
+
+    def _function(self, stmt: Stmt.Function, kind):
+        if stmt.getter:
+            self._fail(stmt.name, 'Getters cannot be compiled to clox bytecode.')
+        if stmt.is_async:
+            self._fail(stmt.name, 'Async functions cannot be compiled to clox bytecode.')
+
+        self._at(stmt.name)
+        function = Function(stmt.name.lexeme)
+        function.arity = len(stmt.params)
+        state = self.state = _FunctionState(self.state, function, kind)
+        self._begin_scope()
+        try:
+            for param in stmt.params:
+                self._at(param)
+                self._add_local(param.lexeme)
+            for statement in stmt.body:
+                self._statement(statement)
+            self._end_function()
+        finally:
+            self.state = state.enclosing
+
+        self._emit(OpCode.CLOSURE, self._constant(function))
+        for index, is_local in state.upvalues:
+            self._emit(1 if is_local else 0, index)
+
+    def _end_function(self) -> Function:
+        self._emit_return()
+        return self.state.function
+
+    def _loop_body(self, body: Stmt.Stmt):
+        self.state.loops.append(_Loop(len(self.state.locals)))
+        try:
+            self._statement(body)
+        finally:
+            loop = self.state.loops.pop()
+        return loop
+
+    def visit_block_stmt(self, stmt: Stmt.Block) -> object:
+        self._begin_scope()
+        for statement in stmt.statements:
+            self._statement(statement)
+        self._end_scope()
+        return None
+
+    def visit_break_stmt(self, stmt: Stmt.Break) -> object:
+        self._at(stmt.name)
+        state = self.state
+        loop = state.loops[-1]
+        # leave the scopes of the loop body without forgetting their locals
+        for local in reversed(state.locals[loop.local_count:]):
+            self._emit(OpCode.CLOSE_UPVALUE if local.captured else OpCode.POP)
+        loop.breaks.append(self._emit_jump(OpCode.JUMP))
+        return None
+
+    def visit_class_stmt(self, stmt: Stmt.Class) -> object:
+        name = stmt.name.lexeme
+        constant = self._declare(stmt.name)
+        name_constant = self._constant(name)
+        self._emit(OpCode.CLASS, name_constant)
+        self._define(constant)
+
+        if stmt.superclass is not None:
+            self._variable(stmt.superclass.name.lexeme)
+            self._at(stmt.superclass.name)
+            self._begin_scope()
+            self._add_local('super')
+            self._variable(name)
+            self._emit(OpCode.INHERIT)
+
+        self._variable(name)
+        for method in stmt.methods:
+            kind = FunctionType.INITIALIZER if method.name.lexeme == 'init' else FunctionType.METHOD
+            method_constant = self._constant(method.name.lexeme)
+            self._function(method, kind)
+            self._at(method.name)
+            self._emit(OpCode.METHOD, method_constant)
+        self._at(stmt.name)
+        self._emit(OpCode.POP)
+
+        if stmt.superclass is not None:
+            self._end_scope()
+        return None
+
+    def visit_expression_stmt(self, stmt: Stmt.Expression) -> object:
+        self._expression(stmt.expression)
+        self._emit(OpCode.POP)
+        return None
+
+    def visit_var_stmt(self, stmt: Stmt.Var) -> object:
+        if self.state.scope_depth > 0:
+            # the initializer runs before the new slot exists
+            if stmt.initializer is not None:
+                self._expression(stmt.initializer)
+            else:
+                self._emit(OpCode.NIL)
+            self._declare(stmt.name)
+            return None
+
+        constant = self._declare(stmt.name)
+        if stmt.initializer is not None:
+            self._expression(stmt.initializer)
+        else:
+            self._emit(OpCode.NIL)
+        self._at(stmt.name)
+        self._define(constant)
+        return None
+
+    def visit_forrange_stmt(self, stmt: Stmt.ForRange) -> object:
+        self._fail(stmt.keyword, 'Range loops cannot be compiled to clox bytecode.')
+
+    def visit_function_stmt(self, stmt: Stmt.Function) -> object:
+        if stmt.anonymous:
+            # a function expression leaves its closure on the stack
+            self._function(stmt, FunctionType.FUNCTION)
+            return None
+        constant = self._declare(stmt.name)
+        self._function(stmt, FunctionType.FUNCTION)
+        self._define(constant)
+        return None
+
+    def visit_if_stmt(self, stmt: Stmt.If) -> object:
+        self._expression(stmt.condition)
+        then_jump = self._emit_jump(OpCode.JUMP_IF_FALSE)
+        self._emit(OpCode.POP)
+        self._statement(stmt.then_branch)
+        else_jump = self._emit_jump(OpCode.JUMP)
+        self._patch_jump(then_jump)
+        self._emit(OpCode.POP)
+        if stmt.else_branch is not None:
+            self._statement(stmt.else_branch)
+        self._patch_jump(else_jump)
+        return None
+
+    def visit_print_stmt(self, stmt: Stmt.Print) -> object:
+        self._expression(stmt.expression)
+        self._emit(OpCode.PRINT)
+        return None
+
+    def visit_return_stmt(self, stmt: Stmt.Return) -> object:
+        self._at(stmt.keyword)
+        if stmt.value is None:
+            self._emit_return()
+        else:
+            self._expression(stmt.value)
+            self._at(stmt.keyword)
+            self._emit(OpCode.RETURN)
+        return None
+
+    def visit_while_stmt(self, stmt: Stmt.While) -> object:
+        loop_start = len(self._chunk.code)
+        self._expression(stmt.condition)
+        self._at(stmt.keyword)
+        exit_jump = self._emit_jump(OpCode.JUMP_IF_FALSE)
+        self._emit(OpCode.POP)
+        loop = self._loop_body(stmt.body)
+        self._at(stmt.keyword)
+        self._emit_loop(loop_start)
+        self._patch_jump(exit_jump)
+        self._emit(OpCode.POP)
+        for jump in loop.breaks:
+            self._patch_jump(jump)
+        return None
+
+    def visit_assign_expr(self, expr: Expr.Assign) -> object:
+        self._at(expr.name)
+        self._variable(expr.name.lexeme, expr.value)
+        return None
+
+    def visit_await_expr(self, expr: Expr.Await) -> object:
+        self._fail(expr.keyword, "'await' cannot be compiled to clox bytecode.")
+
+    def visit_binary_expr(self, expr: Expr.Binary) -> object:
+        self._expression(expr.left)
+        self._expression(expr.right)
+        self._at(expr.operator)
+        self._emit(*_BINARY[expr.operator.type])
+        return None
+
+    def visit_call_expr(self, expr: Expr.Call) -> object:
+        callee = expr.callee
+        if callee.__class__ is Expr.Get:
+            self._expression(callee.objct)
+            count = self._arguments(expr.arguments)
+            self._at(expr.paren)
+            self._emit(OpCode.INVOKE, self._constant(callee.name.lexeme), count)
+        elif callee.__class__ is Expr.Super:
+            self._at(callee.keyword)
+            self._variable('this')
+            count = self._arguments(expr.arguments)
+            self._at(callee.keyword)
+            self._variable('super')
+            self._at(expr.paren)
+            self._emit(OpCode.SUPER_INVOKE, self._constant(callee.method.lexeme), count)
+        else:
+            self._expression(callee)
+            count = self._arguments(expr.arguments)
+            self._at(expr.paren)
+            self._emit(OpCode.CALL, count)
+        return None
+
+    def visit_get_expr(self, expr: Expr.Get) -> object:
+        self._expression(expr.objct)
+        self._at(expr.name)
+        self._emit(OpCode.GET_PROPERTY, self._constant(expr.name.lexeme))
+        return None
+
+    def visit_grouping_expr(self, expr: Expr.Grouping) -> object:
+        self._expression(expr.expression)
+        return None
+
+    def visit_literal_expr(self, expr: Expr.Literal) -> object:
+        value = expr.value
+        if value is None:
+            self._emit(OpCode.NIL)
+        elif value is True:
+            self._emit(OpCode.TRUE)
+        elif value is False:
+            self._emit(OpCode.FALSE)
+        elif value.__class__ is str:
+            self._emit_constant(value)
+        else:
+            self._emit_constant(float(value))
+        return None
+
+    def visit_logical_expr(self, expr: Expr.Logical) -> object:
+        self._expression(expr.left)
+        self._at(expr.operator)
+        if expr.operator.type == TT.AND:
+            end_jump = self._emit_jump(OpCode.JUMP_IF_FALSE)
+        else:
+            else_jump = self._emit_jump(OpCode.JUMP_IF_FALSE)
+            end_jump = self._emit_jump(OpCode.JUMP)
+            self._patch_jump(else_jump)
+        self._emit(OpCode.POP)
+        self._expression(expr.right)
+        self._patch_jump(end_jump)
+        return None
+
+    def visit_set_expr(self, expr: Expr.Set) -> object:
+        self._expression(expr.objct)
+        self._expression(expr.value)
+        self._at(expr.name)
+        self._emit(OpCode.SET_PROPERTY, self._constant(expr.name.lexeme))
+        return None
+
+    def visit_subscript_expr(self, expr: Expr.Subscript) -> object:
+        self._expression(expr.objct)
+        self._expression(expr.index)
+        self._at(expr.bracket)
+        self._emit(OpCode.SUBSCRIPT)
+        return None
+
+    def visit_subscriptset_expr(self, expr: Expr.SubscriptSet) -> object:
+        self._fail(expr.bracket, 'Assignment to a subscript cannot be compiled to clox bytecode.')
+
+    def visit_super_expr(self, expr: Expr.Super) -> object:
+        self._at(expr.keyword)
+        self._variable('this')
+        self._variable('super')
+        self._emit(OpCode.GET_SUPER, self._constant(expr.method.lexeme))
+        return None
+
+    def visit_ternary_expr(self, expr: Expr.Ternary) -> object:
+        self._expression(expr.condition)
+        then_jump = self._emit_jump(OpCode.JUMP_IF_FALSE)
+        self._emit(OpCode.POP)
+        self._expression(expr.then_branch)
+        else_jump = self._emit_jump(OpCode.JUMP)
+        self._patch_jump(then_jump)
+        self._emit(OpCode.POP)
+        self._expression(expr.else_branch)
+        self._patch_jump(else_jump)
+        return None
+
+    def visit_this_expr(self, expr: Expr.This) -> object:
+        self._at(expr.keyword)
+        self._variable('this')
+        return None
+
+    def visit_unary_expr(self, expr: Expr.Unary) -> object:
+        self._expression(expr.right)
+        self._at(expr.operator)
+        self._emit(OpCode.NOT if expr.operator.type == TT.BANG else OpCode.NEGATE)
+        return None
+
+    def visit_variable_expr(self, expr: Expr.Variable) -> object:
+        self._at(expr.name)
+        self._variable(expr.name.lexeme)
+        return None
+
+
+def _write_string(out: bytearray, text: str):
+    data = text.encode('utf-8')
+    out += struct.pack('<I', len(data))
+    out += data
+
+
+def _write_function(out: bytearray, function: Function):
+    chunk = function.chunk
+    out += struct.pack('<BH', function.name is not None, function.arity)
+    if function.name is not None:
+        _write_string(out, function.name)
+    out += struct.pack('<HI', function.upvalue_count, len(chunk.code))
+    out += chunk.code
+    out += struct.pack(f'<{len(chunk.lines)}I', *chunk.lines)
+    out += struct.pack('<H', len(chunk.constants))
+    for constant in chunk.constants:
+        if isinstance(constant, Function):
+            out.append(_FUNCTION)
+            _write_function(out, constant)
+        elif constant.__class__ is str:
+            out.append(_STRING)
+            _write_string(out, constant)
+        else:
+            out.append(_NUMBER)
+            out += struct.pack('<d', constant)
+
+
+def dumps(script: Function) -> bytes:
+    """The bytecode file of a compiled script.
+
+    Every number is little endian. After the magic and the version comes
+    the script function, each function written as
+
+        u8 has name, u16 arity, [u32 length, UTF-8 name],
+        u16 upvalue count, u32 code length, code, u32 line per code byte,
+        u16 constant count, constants
+
+    and each constant as a u8 tag followed by a f64 number, a u32 length
+    and UTF-8 string, or a function.
+    """
+    out = bytearray(MAGIC)
+    out += struct.pack('<H', VERSION)
+    _write_function(out, script)
+    return bytes(out)
+
+
+def is_bytecode(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
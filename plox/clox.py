@@ -0,0 +1,155 @@
+import ctypes
+import os
+import sys
+import threading
+
+# the shared library built by the libclox target of CMakeLists.txt
+LIBRARY_ENV = 'PLOX_CLOX_LIBRARY'
+BUILD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cmake-build-debug')
+_LIBRARY_NAMES = {'darwin': 'libclox.dylib', 'win32': 'clox.dll'}
+
+# the first bytes of a bytecode file, MAGIC in plox/bytecode.py
+BYTECODE_MAGIC = b'LOXC'
+
+# InterpretResult in clox/vm.h to the exit codes of clox and plox
+INTERPRET_OK = 0
+INTERPRET_COMPILE_ERROR = 1
+INTERPRET_RUNTIME_ERROR = 2
+EXIT_CODES = {INTERPRET_OK: 0, INTERPRET_COMPILE_ERROR: 65, INTERPRET_RUNTIME_ERROR: 70}
+
+# buffering modes of setvbuf in stdio.h
+_IOFBF = 0
+_IOLBF = 1
+# stdout keeps using the buffer it is given, so it must never be freed
+_STDOUT_BUFFER = ctypes.create_string_buffer(8192)
+_stdout_mode = None
+
+
+def library_path() -> str:
+    path = os.environ.get(LIBRARY_ENV)
+    if path:
+        return path
+    return os.path.join(BUILD_DIR, _LIBRARY_NAMES.get(sys.platform, 'libclox.so'))
+
+
+def available(path=None) -> bool:
+    return os.path.exists(path or library_path())
+
+
+def _c_stdout(libc):
+    # the FILE *stdout of the C library, named __stdoutp on macOS
+    for name in ('stdout', '__stdoutp'):
+        try:
+            return ctypes.c_void_p.in_dll(libc, name)
+        except ValueError:
+            pass
+    return None
+
+
+def _drain(fd, chunks):
+    while True:
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return
+        chunks.append(chunk)
+
+
+class CloxResult(object):
+    def __init__(self, output, exit_code: int):
+        self.output = output
+        self.exit_code = exit_code
+
+    @property
+    def ok(self):
+        return self.exit_code == 0
+
+
+class Clox(object):
+    """The clox VM loaded into this process with ctypes.
+
+    Running a script this way skips starting a clox process, and loading
+    the library is paid once per process, not once per script. The VM
+    keeps its state in C globals, so a process has one VM: every run
+    starts from initVM() and ends with freeVM(), and no run sees the
+    globals of another.
+
+    clox prints with stdio, so capturing its output means pointing file
+    descriptors 1 and 2 at a pipe for the run, drained by a thread. The C stdout of
+    this process is buffered the way a clox process would buffer it, in
+    full unless it is a terminal, since Python may have changed it (with
+    PYTHONUNBUFFERED, say) and the order of stdout and stderr in the
+    output depends on it. A clox that exits on running out of memory takes
+    this process with it.
+    """
+
+    def __init__(self, path=None):
+        self.library = ctypes.CDLL(path or library_path())
+        self.library.interpret.argtypes = [ctypes.c_char_p]
+        self.library.interpret.restype = ctypes.c_int
+        self.library.interpretBytecode.argtypes = [ctypes.c_char_p, ctypes.c_size_t]
+        self.library.interpretBytecode.restype = ctypes.c_int
+        self._libc = ctypes.CDLL(None)
+        self._libc.setvbuf.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_size_t]
+        self._stdout = _c_stdout(self._libc)
+
+    def run(self, source: str, capture=True) -> CloxResult:
+        """Run source on a fresh VM, returning the output when capture is set."""
+        return self._run(self.library.interpret, source.encode('utf-8'), capture)
+
+    def run_bytecode(self, data: bytes, capture=True) -> CloxResult:
+        """Run a file written by plox --emit-bytecode on a fresh VM."""
+        return self._run(self._interpret_bytecode, data, capture)
+
+    def _interpret_bytecode(self, data: bytes) -> int:
+        return self.library.interpretBytecode(data, len(data))
+
+    def _run(self, interpret, data: bytes, capture) -> CloxResult:
+        if not capture:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            return CloxResult(None, self._interpret(interpret, data))
+
+        read_end, write_end = os.pipe()
+        chunks = []
+        reader = threading.Thread(target=_drain, args=(read_end, chunks), daemon=True)
+        reader.start()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved = os.dup(1), os.dup(2)
+        try:
+            os.dup2(write_end, 1)
+            os.dup2(write_end, 2)
+            os.close(write_end)
+            exit_code = self._interpret(interpret, data)
+        finally:
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+            reader.join()
+            os.close(read_end)
+        output = b''.join(chunks).decode('utf-8')
+        return CloxResult(output, exit_code)
+
+    def run_file(self, path: str, capture=True) -> CloxResult:
+        with open(path, 'rb') as lf:
+            data = lf.read()
+        if data[:len(BYTECODE_MAGIC)] == BYTECODE_MAGIC:
+            return self.run_bytecode(data, capture)
+        return self.run(data.decode('utf-8'), capture)
+
+    def _interpret(self, interpret, data: bytes) -> int:
+        global _stdout_mode
+        mode = _IOLBF if os.isatty(1) else _IOFBF
+        if self._stdout is not None and mode != _stdout_mode:
+            self._libc.setvbuf(self._stdout, _STDOUT_BUFFER, mode, len(_STDOUT_BUFFER))
+            _stdout_mode = mode
+        library = self.library
+        library.initVM()
+        try:
+            result = interpret(data)
+        finally:
+            library.freeVM()
+            # stdout is buffered by the C library, not by Python
+            self._libc.fflush(None)
+        return EXIT_CODES[result]
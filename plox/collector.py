@@ -0,0 +1,86 @@
+import gc
+import time
+
+
+def parse_thresholds(text: str):
+    """'700', '700,10' or '700,10,10' to the thresholds gc.set_threshold takes."""
+    thresholds = [int(part) for part in text.split(',')]
+    if not 1 <= len(thresholds) <= 3 or any(threshold < 0 for threshold in thresholds):
+        raise ValueError(text)
+    return tuple(thresholds)
+
+
+class Collector(object):
+    """How the cyclic garbage collector of CPython treats one run of a script.
+
+    CPython collects the youngest generation whenever allocations outnumber
+    deallocations by its threshold, and every collection scans the tracked
+    objects of the generations it collects. A script that builds large
+    structures triggers collections that find nothing: Lox values are freed
+    by reference counting as soon as they are dropped, unless the program
+    itself links them into a cycle.
+
+    Freezing once the program is compiled moves the syntax tree, the
+    interpreter and everything imported at start up into the permanent
+    generation, where no collection looks at them again. The command line
+    freezes unless told not to, other callers ask for it with freeze=True.
+    Larger thresholds make collections rarer, at the cost of cyclic
+    garbage living longer.
+    The callback counts the collections of the run and times the pauses.
+    """
+
+    def __init__(self, thresholds=None, freeze=False):
+        self.thresholds = thresholds
+        self.freeze = freeze
+        self.collections = [0, 0, 0]
+        self.collected = 0
+        self.uncollectable = 0
+        self.paused = 0.0
+        self.longest = 0.0
+        self.frozen = 0
+        self.active = None
+        self._previous = None
+        self._started = 0.0
+
+    def start(self):
+        if self.thresholds is not None:
+            self._previous = gc.get_threshold()
+            gc.set_threshold(*self.thresholds)
+        self.active = gc.get_threshold()
+        gc.callbacks.append(self._callback)
+
+    def compiled(self):
+        """The program is scanned, parsed and resolved and about to run."""
+        if self.freeze:
+            gc.freeze()
+            self.frozen = gc.get_freeze_count()
+
+    def stop(self):
+        gc.callbacks.remove(self._callback)
+        if self._previous is not None:
+            gc.set_threshold(*self._previous)
+            self._previous = None
+        if self.freeze:
+            gc.unfreeze()
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self._started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._started
+        self.paused += pause
+        self.longest = max(self.longest, pause)
+        self.collections[info['generation']] += 1
+        self.collected += info['collected']
+        self.uncollectable += info['uncollectable']
+
+    def report(self) -> str:
+        young, middle, old = self.collections
+        lines = [
+            f'gc: {young + middle + old} collections (generation 0: {young}, 1: {middle}, 2: {old}), '
+            f'{self.collected} objects collected, {self.uncollectable} uncollectable',
+            f'gc: {self.paused * 1000:.1f} ms paused, longest pause {self.longest * 1000:.2f} ms, '
+            f'thresholds {",".join(str(threshold) for threshold in self.active)}, '
+            f'{self.frozen} objects frozen',
+        ]
+        return '\n'.join(lines)
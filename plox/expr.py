@@ -1,5 +1,5 @@
+from __future__ import annotations
 from plox.token import Token
-from typing import List
 
 
 class Expr(object):
@@ -16,6 +16,15 @@ class Assign(Expr):
 		return visitor.visit_assign_expr(self)
 
 
+class Await(Expr):
+	def __init__(self, keyword: Token, value: Expr):
+		self.keyword = keyword
+		self.value = value
+
+	def accept(self, visitor):
+		return visitor.visit_await_expr(self)
+
+
 class Binary(Expr):
 	def __init__(self, left: Expr, operator: Token, right: Expr):
 		self.left = left
@@ -27,7 +36,7 @@ class Binary(Expr):
 
 
 class Call(Expr):
-	def __init__(self, callee: Expr, paren: Token, arguments: List[Expr]):
+	def __init__(self, callee: Expr, paren: Token, arguments: list[Expr]):
 		self.callee = callee
 		self.paren = paren
 		self.arguments = arguments
@@ -91,6 +100,17 @@ class Subscript(Expr):
 		return visitor.visit_subscript_expr(self)
 
 
+class SubscriptSet(Expr):
+	def __init__(self, objct: Expr, bracket: Token, index: Expr, value: Expr):
+		self.objct = objct
+		self.bracket = bracket
+		self.index = index
+		self.value = value
+
+	def accept(self, visitor):
+		return visitor.visit_subscriptset_expr(self)
+
+
 class Super(Expr):
 	def __init__(self, keyword: Token, method: Token):
 		self.keyword = keyword
@@ -140,6 +160,10 @@ class ExprVisitor(object):
 		print("[visit_assign_expr] Not implemented!")
 		return None
 
+	def visit_await_expr(self, expr: Await) -> object:
+		print("[visit_await_expr] Not implemented!")
+		return None
+
 	def visit_binary_expr(self, expr: Binary) -> object:
 		print("[visit_binary_expr] Not implemented!")
 		return None
@@ -172,6 +196,10 @@ class ExprVisitor(object):
 		print("[visit_subscript_expr] Not implemented!")
 		return None
 
+	def visit_subscriptset_expr(self, expr: SubscriptSet) -> object:
+		print("[visit_subscriptset_expr] Not implemented!")
+		return None
+
 	def visit_super_expr(self, expr: Super) -> object:
 		print("[visit_super_expr] Not implemented!")
 		return None
@@ -0,0 +1,258 @@
+import gc
+import sys
+import tracemalloc
+from collections import Counter
+
+from plox.environment import Environment
+from plox.lox_array import LoxArray
+from plox.lox_class import LoxClass
+from plox.lox_function import LoxFunction
+from plox.lox_instance import LoxInstance
+from plox.lox_map import LoxMap, _lox_key
+from plox.lox_string import Rope
+
+
+class ClassStats(object):
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.bytes = 0
+        # number of fields -> number of instances with that many
+        self.fields = Counter()
+
+
+class ClosureStats(object):
+    """The environments kept alive by the live closures of one function declaration."""
+
+    def __init__(self, name: str, line: int):
+        self.name = name
+        self.line = line
+        self.count = 0
+        self.environments = set()
+        self.bytes = 0
+        self.chain = 0
+
+
+class HeapSnapshot(object):
+    """The Lox values a program keeps alive.
+
+    The values are found by walking everything reachable from the
+    globals and from the environments the interpreter is executing in,
+    so only what the program can still reach is counted. Sizes come from
+    sys.getsizeof of the objects and their dicts and lists, not of the
+    values in them, so they approximate the memory of each value. Objects
+    the walk does not reach but gc still tracks are reported apart, they
+    are garbage waiting for a collection or belong to another interpreter.
+    """
+
+    def __init__(self):
+        self.classes = {}
+        self.closures = {}
+        self.environments = 0
+        self.environment_bytes = 0
+        self.strings = 0
+        self.string_bytes = 0
+        self.arrays = 0
+        self.array_bytes = 0
+        self.maps = 0
+        self.map_bytes = 0
+        self.unreachable = Counter()
+        self.traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+
+    @property
+    def instances(self):
+        return sum(stats.count for stats in self.classes.values())
+
+    @property
+    def instance_bytes(self):
+        return sum(stats.bytes for stats in self.classes.values())
+
+    @property
+    def bytes(self):
+        return (self.instance_bytes + self.environment_bytes + self.string_bytes
+                + self.array_bytes + self.map_bytes)
+
+    def totals(self):
+        """(count, bytes) of every kind of value, classes as 'instances of Name'."""
+        totals = {
+            'environments': (self.environments, self.environment_bytes),
+            'strings': (self.strings, self.string_bytes),
+            'arrays': (self.arrays, self.array_bytes),
+            'maps': (self.maps, self.map_bytes),
+        }
+        for stats in self.classes.values():
+            totals[f'instances of {stats.name}'] = (stats.count, stats.bytes)
+        return totals
+
+    def report(self, limit=10) -> str:
+        lines = [f'Lox heap: {self.bytes} bytes in {self.instances} instances, {self.environments} environments, '
+                 f'{self.strings} strings, {self.arrays} arrays and {self.maps} maps']
+        if self.traced is not None:
+            lines.append(f'tracemalloc: {self.traced[0]} bytes allocated now, {self.traced[1]} at peak')
+
+        lines.append('')
+        lines.append(f'{"class":<20}{"instances":>10}{"bytes":>12}  fields: instances')
+        for stats in sorted(self.classes.values(), key=lambda stats: -stats.bytes)[:limit]:
+            histogram = ', '.join(f'{fields}: {count}' for fields, count in sorted(stats.fields.items()))
+            lines.append(f'{stats.name:<20}{stats.count:>10}{stats.bytes:>12}  {histogram}')
+
+        lines.append('')
+        lines.append(f'{"kind":<20}{"count":>10}{"bytes":>12}')
+        lines.append(f'{"environments":<20}{self.environments:>10}{self.environment_bytes:>12}')
+        lines.append(f'{"strings":<20}{self.strings:>10}{self.string_bytes:>12}')
+        lines.append(f'{"arrays":<20}{self.arrays:>10}{self.array_bytes:>12}')
+        lines.append(f'{"maps":<20}{self.maps:>10}{self.map_bytes:>12}')
+
+        # functions declared at the top level only hold on to the globals
+        closures = [stats for stats in self.closures.values() if stats.chain > 0]
+        if closures:
+            lines.append('')
+            lines.append(f'{"closure":<20}{"live":>10}{"retains":>12}{"bytes":>12}{"depth":>7}')
+            for stats in sorted(closures, key=lambda stats: -stats.bytes)[:limit]:
+                name = f'{stats.name}:{stats.line}'
+                lines.append(f'{name:<20}{stats.count:>10}{len(stats.environments):>12}{stats.bytes:>12}'
+                             f'{stats.chain:>7}')
+
+        if self.unreachable:
+            lines.append('')
+            lines.append('tracked by gc but not reachable from the interpreter:')
+            for kind, count in self.unreachable.most_common(limit):
+                lines.append(f'{kind:<20}{count:>10}')
+        return '\n'.join(lines)
+
+    def diff(self, before: 'HeapSnapshot') -> str:
+        """What changed since the before snapshot, largest growth first."""
+        now = self.totals()
+        then = before.totals()
+        rows = []
+        for kind in set(now) | set(then):
+            count, size = now.get(kind, (0, 0))
+            old_count, old_size = then.get(kind, (0, 0))
+            if count != old_count or size != old_size:
+                rows.append((size - old_size, count - old_count, kind))
+
+        lines = [f'{"kind":<30}{"count":>10}{"bytes":>12}']
+        for size, count, kind in sorted(rows, key=lambda row: (-row[0], row[2])):
+            lines.append(f'{kind:<30}{count:>+10}{size:>+12}')
+        lines.append(f'{"total":<30}{"":>10}{self.bytes - before.bytes:>+12}')
+        return '\n'.join(lines)
+
+    def to_lox(self) -> LoxMap:
+        classes = LoxMap({stats.name: stats.count for stats in self.classes.values()})
+        return LoxMap({
+            'bytes': self.bytes,
+            'instances': self.instances,
+            'instanceBytes': self.instance_bytes,
+            'classes': classes,
+            'environments': self.environments,
+            'environmentBytes': self.environment_bytes,
+            'strings': self.strings,
+            'stringBytes': self.string_bytes,
+            'arrays': self.arrays,
+            'maps': self.maps,
+        })
+
+
+def _frame_roots():
+    """Environments the interpreter runs in, kept by callers on the Python stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        for value in frame.f_locals.values():
+            if value.__class__ is Environment:
+                yield value
+        frame = frame.f_back
+
+
+def take_snapshot(interpreter, unreachable=True) -> HeapSnapshot:
+    """Walk what interpreter keeps alive, in time proportional to the live Lox heap.
+
+    Looking for the objects gc tracks but the walk did not reach goes
+    through every object in the process instead, so it is only done when
+    unreachable is true.
+    """
+    snapshot = HeapSnapshot()
+    seen = set()
+    stack = [interpreter.globals, interpreter.env]
+    stack.extend(_frame_roots())
+    # recycled call frames, empty but owned by the interpreter
+    stack.extend(interpreter.frames)
+    functions = []
+
+    while stack:
+        value = stack.pop()
+        cls = value.__class__
+        if cls is int or cls is float or cls is bool or value is None or id(value) in seen:
+            continue
+        seen.add(id(value))
+
+        if cls is str:
+            snapshot.strings += 1
+            snapshot.string_bytes += sys.getsizeof(value)
+        elif cls is Rope:
+            # the halves of an unflattened rope are strings of their own
+            snapshot.strings += 1
+            snapshot.string_bytes += sys.getsizeof(value)
+            stack.extend(part for part in (value.left, value.right, value._flat) if part is not None)
+        elif cls is Environment:
+            snapshot.environments += 1
+            snapshot.environment_bytes += sys.getsizeof(value) + sys.getsizeof(value.values)
+            stack.extend(value.values.values())
+            if value.enclosing is not None:
+                stack.append(value.enclosing)
+        elif cls is LoxInstance:
+            stats = snapshot.classes.get(value.klass.name)
+            if stats is None:
+                stats = snapshot.classes[value.klass.name] = ClassStats(value.klass.name)
+            stats.count += 1
+            stats.bytes += sys.getsizeof(value) + sys.getsizeof(value.fields)
+            stats.fields[len(value.fields)] += 1
+            stack.extend(value.fields.values())
+            stack.append(value.klass)
+        elif cls is LoxArray:
+            snapshot.arrays += 1
+            snapshot.array_bytes += sys.getsizeof(value) + sys.getsizeof(value.values)
+            stack.extend(value.values)
+        elif cls is LoxMap:
+            snapshot.maps += 1
+            snapshot.map_bytes += sys.getsizeof(value) + sys.getsizeof(value.entries)
+            stack.extend(_lox_key(key) for key in value.entries)
+            stack.extend(value.entries.values())
+        elif cls is LoxClass:
+            stack.extend(value.methods.values())
+            if value.superclass is not None:
+                stack.append(value.superclass)
+        elif isinstance(value, LoxFunction):
+            functions.append(value)
+            stack.append(value.closure)
+
+    for function in functions:
+        _retain(snapshot, function, interpreter.globals)
+
+    if not unreachable:
+        return snapshot
+    reachable = seen
+    for obj in gc.get_objects():
+        cls = obj.__class__
+        if (cls is LoxInstance or cls is Environment) and id(obj) not in reachable:
+            snapshot.unreachable['environments' if cls is Environment else f'instances of {obj.klass.name}'] += 1
+    return snapshot
+
+
+def _retain(snapshot, function, globals):
+    """Count the environments between a closure and the globals for its declaration."""
+    declaration = function.declaration
+    key = (declaration.name.lexeme, declaration.name.line)
+    stats = snapshot.closures.get(key)
+    if stats is None:
+        stats = snapshot.closures[key] = ClosureStats(*key)
+    stats.count += 1
+
+    chain = 0
+    environment = function.closure
+    while environment is not None and environment is not globals:
+        chain += 1
+        if id(environment) not in stats.environments:
+            stats.environments.add(id(environment))
+            stats.bytes += sys.getsizeof(environment) + sys.getsizeof(environment.values)
+        environment = environment.enclosing
+    stats.chain = max(stats.chain, chain)
@@ -0,0 +1,172 @@
+import plox.expr as Expr
+import plox.stmt as Stmt
+from plox.interpreter import Interpreter
+from plox.lox_class import LoxClass
+from plox.lox_function import LoxFunction
+from plox.plox_errors import PloxRuntimeError
+from plox.profiler import node_line
+
+CALL = 'call'
+RETURN = 'return'
+LINE = 'line'
+ALLOC = 'alloc'
+ERROR = 'error'
+BACK_EDGE = 'backedge'
+
+EVENTS = (CALL, RETURN, LINE, ALLOC, ERROR, BACK_EDGE)
+
+# the interpreter attributes replaced while an event has callbacks
+_PATCHES = {
+    CALL: ('_invoke', '_call_getter'),
+    RETURN: ('_invoke', '_call_getter'),
+    ALLOC: ('_invoke',),
+    LINE: ('_execute',),
+    BACK_EDGE: ('visit_while_stmt', 'visit_forrange_stmt'),
+    ERROR: ('error',),
+}
+
+
+class Hooks(object):
+    """Runtime registration of callbacks for the execution events of an interpreter.
+
+    An event without callbacks costs nothing, the interpreter runs its
+    plain methods. Adding the first callback for an event sets an
+    instrumented method of this object on the interpreter instance,
+    shadowing the method of its class, and removing the last callback
+    deletes it again. Callbacks can be added and removed while a program
+    runs, the interpreter picks the change up the next time it dispatches
+    to the method.
+
+    The callbacks are called as
+
+        call(callee, arguments, line)
+        return(callee, value, line)     value is None when a runtime error unwinds the call
+        line(stmt, line)
+        alloc(instance, line)
+        error(runtime_error)
+        backedge(loop_stmt, line)
+
+    Calls are reported once their arity has been checked, also at the
+    call and get sites an AdaptiveInterpreter has specialized. Blocks have
+    no line of their own and no line event, and neither does the body of
+    a range loop that is a single statement instead of a block.
+    """
+
+    def __init__(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        self.callbacks = {event: [] for event in EVENTS}
+        self._installed = {}
+        self._lines = {}
+
+    def add(self, event: str, callback):
+        if event not in self.callbacks:
+            raise ValueError(f"Unknown event '{event}', expected one of {', '.join(EVENTS)}.")
+        # events fire over the list they started with, so a callback can add
+        # or remove callbacks without the list being copied for every event
+        self.callbacks[event] = self.callbacks[event] + [callback]
+        self._update(event)
+
+    def remove(self, event: str, callback):
+        callbacks = list(self.callbacks[event])
+        callbacks.remove(callback)
+        self.callbacks[event] = callbacks
+        self._update(event)
+
+    def clear(self):
+        for event in EVENTS:
+            self.callbacks[event] = []
+            self._update(event)
+
+    def _update(self, event):
+        interpreter = self.interpreter
+        for name in _PATCHES[event]:
+            wanted = any(self.callbacks[other] for other in EVENTS if name in _PATCHES[other])
+            if wanted and name not in self._installed:
+                # keep whatever the instance had, error is a plain attribute
+                self._installed[name] = vars(interpreter).get(name)
+                setattr(interpreter, name, getattr(self, '_hooked_' + name.lstrip('_')))
+            elif not wanted and name in self._installed:
+                previous = self._installed.pop(name)
+                if previous is None:
+                    delattr(interpreter, name)
+                else:
+                    setattr(interpreter, name, previous)
+
+    def _fire(self, event, *args):
+        for callback in self.callbacks[event]:
+            callback(*args)
+
+    def _line(self, node):
+        lines = self._lines
+        if node in lines:
+            return lines[node]
+        line = lines[node] = node_line(node)
+        return line
+
+    def _traced(self, callee, arguments, line, call, *args):
+        callbacks = self.callbacks
+        for callback in callbacks[CALL]:
+            callback(callee, arguments, line)
+        try:
+            value = call(*args)
+        except PloxRuntimeError:
+            for callback in callbacks[RETURN]:
+                callback(callee, None, line)
+            raise
+        for callback in callbacks[RETURN]:
+            callback(callee, value, line)
+        return value
+
+    def _hooked_error(self, error: PloxRuntimeError):
+        self._fire(ERROR, error)
+        self._installed['error'](error)
+
+    def _hooked_invoke(self, expr: Expr.Call, func, arguments):
+        interpreter = self.interpreter
+        line = expr.paren.line
+        value = self._traced(func, arguments, line, interpreter.__class__._invoke, interpreter, expr, func, arguments)
+        if func.__class__ is LoxClass and self.callbacks[ALLOC]:
+            self._fire(ALLOC, value, line)
+        return value
+
+    def _hooked_call_getter(self, expr: Expr.Get, getter: LoxFunction):
+        interpreter = self.interpreter
+        return self._traced(getter, [], expr.name.line, interpreter.__class__._call_getter, interpreter, expr, getter)
+
+    def _hooked_execute(self, stmt):
+        callbacks = self.callbacks[LINE]
+        if callbacks:
+            line = self._line(stmt)
+            if line is not None:
+                for callback in callbacks:
+                    callback(stmt, line)
+        # a profiling interpreter counts lines with an _execute of its own
+        execute = self._installed['_execute']
+        if execute is None:
+            stmt.accept(self.interpreter)
+        else:
+            execute(stmt)
+
+    def _back_edges(self, stmt):
+        """The per-iteration step of a loop, stepping the budget and firing a back edge before every iteration but the first."""
+        budget = self.interpreter.budget
+        back_edges = self.callbacks[BACK_EDGE]
+        line = stmt.keyword.line
+        first = True
+
+        def step(keyword):
+            nonlocal first
+            if budget is not None:
+                budget.step(keyword)
+            if first:
+                first = False
+            elif back_edges:
+                self._fire(BACK_EDGE, stmt, line)
+
+        return step
+
+    def _hooked_visit_while_stmt(self, stmt: Stmt.While) -> object:
+        return self.interpreter._while(stmt, self._back_edges(stmt))
+
+    def _hooked_visit_forrange_stmt(self, stmt: Stmt.ForRange) -> object:
+        return self.interpreter._for_range(stmt, self._back_edges(stmt))
@@ -1,14 +1,19 @@
-from typing import List
+import weakref
 
 from plox.environment import Environment
+from plox.lox_array import ARRAY_NATIVES, LoxArray
+from plox.lox_async import LoxAsyncFunction, Scheduler
 import plox.expr as Expr
 import plox.stmt as Stmt
-from plox.lox_bool import lox_false, lox_true, LoxBool
 from plox.lox_callable import LoxCallable
 from plox.lox_class import LoxClass
 from plox.lox_function import LoxFunction
 from plox.lox_instance import LoxInstance
-from plox.plox_errors import PloxRuntimeError, PloxTypeError, PloxReturnException
+from plox.lox_map import MAP_NATIVES, LoxMap
+from plox.lox_string import Rope, concat, lox_str, stringify
+from plox.memoize import MemoCache, MemoizedFunction
+from plox.output import StdoutOutput
+from plox.plox_errors import PloxRuntimeError, PloxTypeError, PloxReturnException, PloxNativeError
 from plox.stmt import Class
 from plox.token import Token
 from plox.token_type import TokenType, EQUALITY_TOKENS, COMPARISON_TOKENS
@@ -19,15 +24,14 @@ class _PloxBreakException(Exception):
 
 
 def is_plox_truthy(value):
-    if value is None:
-        return lox_false
-    if isinstance(value, LoxBool):
-        return value
-    if value is False:
-        return lox_false
-    elif value is True:
-        return lox_true
-    return lox_true
+    return value is not None and value is not False
+
+
+def is_plox_equal(left, right):
+    # Python considers True == 1, Lox booleans are only equal to themselves
+    if left.__class__ is bool or right.__class__ is bool:
+        return left is right
+    return left == right
 
 
 def is_plox_number(operand):
@@ -35,17 +39,7 @@ def is_plox_number(operand):
 
 
 def is_plox_string(operand):
-    return isinstance(operand, str)
-
-
-def stringify(value):
-    if value is None:
-        return 'nil'
-    if isinstance(value, (int, float)):
-        stringified = str(value)
-        if stringified.endswith('.0'):
-            return stringified[:len(stringified) - 2]
-    return str(value)
+    return isinstance(operand, (str, Rope))
 
 
 def check_number_operand(operator, operand):
@@ -65,12 +59,12 @@ BINARY_OPS = {
     TokenType.SLASH: lambda left, right: left / right,
     TokenType.STAR: lambda left, right: left * right,
     TokenType.PLUS: lambda left, right: left + right,
-    TokenType.GREATER: lambda left, right: is_plox_truthy(left > right),
-    TokenType.GREATER_EQUAL: lambda left, right: is_plox_truthy(left >= right),
-    TokenType.LESS: lambda left, right: is_plox_truthy(left < right),
-    TokenType.LESS_EQUAL: lambda left, right: is_plox_truthy(left <= right),
-    TokenType.BANG_EQUAL: lambda left, right: is_plox_truthy(left != right),
-    TokenType.EQUAL_EQUAL: lambda left, right: is_plox_truthy(left == right),
+    TokenType.GREATER: lambda left, right: left > right,
+    TokenType.GREATER_EQUAL: lambda left, right: left >= right,
+    TokenType.LESS: lambda left, right: left < right,
+    TokenType.LESS_EQUAL: lambda left, right: left <= right,
+    TokenType.BANG_EQUAL: lambda left, right: not is_plox_equal(left, right),
+    TokenType.EQUAL_EQUAL: is_plox_equal,
 }
 
 
@@ -87,13 +81,45 @@ class _Clock(LoxCallable):
         return "<native fn>"
 
 
+class _HeapStats(LoxCallable):
+    # gets the interpreter when called, a bound method in the globals would tie them into a cycle
+    def call(self, interpreter, arguments):
+        from plox.heap import take_snapshot
+        # every call walks the live heap, the map has no use for a scan of all gc objects
+        return take_snapshot(interpreter, unreachable=False).to_lox()
+
+    def arity(self):
+        return 0
+
+    def __str__(self) -> str:
+        return "<native fn>"
+
+
 class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
-    def __init__(self, error):
+    def __init__(self, error, output=None):
         self.error = error
+        self.output = output if output is not None else StdoutOutput()
+        self.scheduler = None
+        self._locals = {}
+        self._captured = set()
+        self._pooled = set()
+        self.frames = []
+        self.memo_caches = {}
+        self.budget = None
+        self.reset()
+
+    def reset(self):
+        """Start over with fresh globals and scheduler, keeping what the resolver found."""
+        if self.scheduler is not None:
+            # tasks and the event loop of the last run must not outlive it
+            self.scheduler.close(self)
+        self.scheduler = Scheduler()
         self.env = Environment()
         self.globals = self.env
         self.globals.define('clock', _Clock())
-        self._locals = {}
+        for native in ARRAY_NATIVES + MAP_NATIVES + self.scheduler.natives():
+            self.globals.define(native.name, native)
+        self.globals.define('heapStats', _HeapStats())
 
     def evaluate(self, expr: Expr.Expr):
         return expr.accept(self)
@@ -124,8 +150,7 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
         methods = {}
         for method in stmt.methods:
             is_initializer = method.name.lexeme == 'init'
-            is_getter = method.getter
-            function = LoxFunction(method, environment, is_initializer, is_getter)
+            function = self._function(method, environment, is_initializer, stmt.name.lexeme)
             methods[method.name.lexeme] = function
 
         klass = LoxClass(stmt.name.lexeme, superclass, methods)
@@ -140,17 +165,57 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
         self.evaluate(stmt.expression)
         return None
 
+    def visit_forrange_stmt(self, stmt: Stmt.ForRange) -> object:
+        budget = self.budget
+        return self._for_range(stmt, budget.step if budget is not None else None)
+
+    def _for_range(self, stmt: Stmt.ForRange, step):
+        """Run a range loop, calling step with the loop keyword before every iteration."""
+        start = self._range_bound(stmt.keyword, self.evaluate(stmt.start))
+        stop = self._range_bound(stmt.keyword, self.evaluate(stmt.stop))
+        increment = self._range_bound(stmt.keyword, self.evaluate(stmt.step))
+        if increment == 0:
+            raise PloxRuntimeError(stmt.keyword, 'Range step cannot be zero.')
+
+        name = stmt.name.lexeme
+        keyword = stmt.keyword
+        body = stmt.body
+        previous = self.env
+        try:
+            if stmt in self._captured:
+                # closures must see the value of their own iteration
+                for i in range(start, stop, increment):
+                    if step is not None:
+                        step(keyword)
+                    self.env = Environment(previous)
+                    self.env.values[name] = i
+                    body.accept(self)
+            else:
+                self.env = Environment(previous)
+                values = self.env.values
+                for i in range(start, stop, increment):
+                    if step is not None:
+                        step(keyword)
+                    values[name] = i
+                    body.accept(self)
+        except _PloxBreakException:
+            pass
+        finally:
+            self.env = previous
+        return None
+
     def visit_function_stmt(self, stmt: Stmt.Function) -> object:
+        function = self._function(stmt, self.env)
         if not stmt.anonymous:
-            function = LoxFunction(stmt, self.env, False)
             self.env.define(stmt.name.lexeme, function)
             return None
 
         # anonymous function from expression
-        return LoxFunction(stmt, self.env, False)
+        return function
 
     def visit_if_stmt(self, stmt: Stmt.If) -> object:
-        if is_plox_truthy(self.evaluate(stmt.condition)):
+        condition = self.evaluate(stmt.condition)
+        if condition is not None and condition is not False:
             self._execute(stmt.then_branch)
         elif stmt.else_branch is not None:
             self._execute(stmt.else_branch)
@@ -159,7 +224,12 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
 
     def visit_print_stmt(self, stmt: Stmt.Print) -> object:
         value = self.evaluate(stmt.expression)
-        print(stringify(value))
+        # Output.write_line() inlined, a method call per line costs more than print()
+        output = self.output
+        lines = output.lines
+        lines.append(stringify(value))
+        if len(lines) >= output.max_lines:
+            output.flush()
         return None
 
     def visit_return_stmt(self, stmt: Stmt.Return) -> object:
@@ -178,7 +248,19 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
         return None
 
     def visit_while_stmt(self, stmt: Stmt.While) -> object:
-        while is_plox_truthy(self.evaluate(stmt.condition)):
+        budget = self.budget
+        return self._while(stmt, budget.step if budget is not None else None)
+
+    def _while(self, stmt: Stmt.While, step):
+        """Run a while loop, calling step with the loop keyword before every test of the condition."""
+        condition = stmt.condition
+        keyword = stmt.keyword
+        while True:
+            if step is not None:
+                step(keyword)
+            value = self.evaluate(condition)
+            if value is None or value is False:
+                break
             try:
                 self._execute(stmt.body)
             except _PloxBreakException:
@@ -196,20 +278,24 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
 
         return value
 
+    def visit_await_expr(self, expr: Expr.Await) -> object:
+        return self.scheduler.wait(self, self.evaluate(expr.value))
+
     def visit_ternary_expr(self, expr: Expr.Ternary) -> object:
         condition = self.evaluate(expr.condition)
-        if is_plox_truthy(condition):
+        if condition is not None and condition is not False:
             return self.evaluate(expr.then_branch)
         else:
             return self.evaluate(expr.else_branch)
 
     def visit_logical_expr(self, expr: Expr.Logical) -> object:
         left = self.evaluate(expr.left)
+        truthy = left is not None and left is not False
         if expr.operator.type == TokenType.OR:
-            if is_plox_truthy(left):
+            if truthy:
                 return left
         else:
-            if not is_plox_truthy(left):
+            if not truthy:
                 return left
 
         return self.evaluate(expr.right)
@@ -221,15 +307,20 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
         return expr.value
 
     def visit_get_expr(self, expr: Expr.Get) -> object:
-        obj = self.evaluate(expr.objct)
+        return self._get(expr, self.evaluate(expr.objct))
+
+    def _get(self, expr: Expr.Get, obj):
         if isinstance(obj, LoxInstance):
             result = obj.get(expr.name)
             if isinstance(result, LoxFunction) and result.is_getter:
-                result = result.call(self, [])
+                result = self._call_getter(expr, result)
             return result
 
         raise PloxRuntimeError(expr.name, "Only instances have properties.")
 
+    def _call_getter(self, expr: Expr.Get, getter: LoxFunction):
+        return getter.call(self, [])
+
     def visit_grouping_expr(self, expr: Expr.Grouping) -> object:
         return self.evaluate(expr.expression)
 
@@ -244,8 +335,15 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
 
     def visit_subscript_expr(self, expr: Expr.Subscript) -> object:
         obj = self.evaluate(expr.objct)
-        if isinstance(obj, str):
+        if obj.__class__ is LoxMap:
+            return obj.get(self.evaluate(expr.index))
+        elif is_plox_string(obj):
             return obj[self.evaluate(expr.index)]
+        elif obj.__class__ is LoxArray:
+            try:
+                return obj.get(self.evaluate(expr.index))
+            except PloxNativeError as e:
+                raise PloxRuntimeError(expr.bracket, e.message)
         elif isinstance(obj, LoxInstance):
             subscript = obj.find_method('__get__')
             if subscript:
@@ -253,6 +351,19 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
 
         raise PloxRuntimeError(expr.bracket, "Subscript not supported.")
 
+    def visit_subscriptset_expr(self, expr: Expr.SubscriptSet) -> object:
+        obj = self.evaluate(expr.objct)
+        if obj.__class__ is not LoxArray and obj.__class__ is not LoxMap:
+            raise PloxRuntimeError(expr.bracket, "Subscript assignment not supported.")
+
+        index = self.evaluate(expr.index)
+        value = self.evaluate(expr.value)
+        try:
+            obj.set(index, value)
+        except PloxNativeError as e:
+            raise PloxRuntimeError(expr.bracket, e.message)
+        return value
+
     def visit_super_expr(self, expr: Expr.Super) -> object:
         distance = self._locals.get(expr)
         superclass = self.env.get_at(distance, "super")
@@ -277,22 +388,25 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
             check_number_operand(expr.operator, right)
             return -right
         elif opt == TokenType.BANG:
-            return is_plox_truthy(right).notify()
+            return right is None or right is False
 
         return None
 
     def visit_binary_expr(self, expr: Expr.Binary) -> object:
-        left = self.evaluate(expr.left)
-        right = self.evaluate(expr.right)
+        return self._binary(expr, self.evaluate(expr.left), self.evaluate(expr.right))
+
+    def _binary(self, expr: Expr.Binary, left, right):
         opt = expr.operator.type
 
         if opt == TokenType.PLUS:
             if is_plox_number(left) and is_plox_number(right):
                 return BINARY_OPS[opt](left, right)
             if is_plox_string(left) and is_plox_string(right):
-                return BINARY_OPS[opt](left, right)
-            if is_plox_string(left) or is_plox_string(right):
-                return BINARY_OPS[opt](str(left), str(right))
+                return self._concat(left, right)
+            if is_plox_string(left):
+                return self._concat(left, lox_str(right))
+            if is_plox_string(right):
+                return self._concat(lox_str(left), right)
             raise PloxTypeError(expr.operator, left, right)
 
         elif opt in EQUALITY_TOKENS:
@@ -320,6 +434,26 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
         for arg in expr.arguments:
             arguments.append(self.evaluate(arg))
 
+        return self._call(expr, func, arguments)
+
+    def _function(self, declaration: Stmt.Function, closure: Environment,
+                  is_initializer=False, class_name=None) -> LoxFunction:
+        pooled = declaration in self._pooled
+        # only methods act as getters
+        is_getter = class_name is not None and declaration.getter
+        if declaration.is_async:
+            return LoxAsyncFunction(declaration, closure, is_initializer, is_getter, pooled)
+        if declaration in self.memo_caches:
+            return MemoizedFunction(declaration, closure, self.memo_caches[declaration], pooled)
+        return LoxFunction(declaration, closure, is_initializer, is_getter, pooled)
+
+    def _concat(self, left, right):
+        result = concat(left, right)
+        if self.budget is not None:
+            self.budget.allocated += len(result)
+        return result
+
+    def _call(self, expr: Expr.Call, func, arguments):
         if not isinstance(func, LoxCallable):
             msg = "Can only call functions and classes."
             raise PloxRuntimeError(expr.paren, msg)
@@ -328,11 +462,26 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
             msg = f"Expected {func.arity()} arguments but got {len(arguments)}."
             raise PloxRuntimeError(expr.paren, msg)
 
-        return func.call(self, arguments)
+        return self._invoke(expr, func, arguments)
+
+    def _invoke(self, expr: Expr.Call, func, arguments):
+        """Call func, whose arity matches the arguments."""
+        try:
+            return func.call(self, arguments)
+        except PloxNativeError as e:
+            raise PloxRuntimeError(expr.paren, e.message)
 
     def _execute(self, stmt):
         stmt.accept(self)
 
+    def memoize(self, declarations, maxsize):
+        # earlier results may depend on globals the new code redefines
+        for cache in self.memo_caches.values():
+            cache.disable()
+
+        for declaration in declarations:
+            self.memo_caches[declaration] = MemoCache(declaration.name.lexeme, maxsize)
+
     def resolve(self, expr: Expr.Expr, depth: int):
         self._locals[expr] = depth
 
@@ -343,6 +492,40 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
         else:
             return self.globals.get(name)
 
+    def install(self, resolution):
+        """Take over the variable resolution of a program resolved elsewhere."""
+        self._locals.update(resolution.locals)
+        self._captured.update(resolution.captured)
+        self._pooled.update(resolution.pooled)
+
+    def weaken(self):
+        """Forget the resolution of syntax trees once nothing runs them any more.
+
+        A session resolves every evaluation into the same interpreter. With
+        plain dicts and sets the nodes of every line ever evaluated would stay
+        alive, weakly keyed ones let them go with the tree, while functions
+        declared by an evaluation keep their own nodes resolved. Lookups are
+        slower, which only matters for long running scripts.
+        """
+        self._locals = weakref.WeakKeyDictionary(self._locals)
+        self._captured = weakref.WeakSet(self._captured)
+        self._pooled = weakref.WeakSet(self._pooled)
+        self.memo_caches = weakref.WeakKeyDictionary(self.memo_caches)
+
+    def capture(self, stmt: Stmt.ForRange):
+        self._captured.add(stmt)
+
+    def pool(self, declaration: Stmt.Function):
+        self._pooled.add(declaration)
+
+    @staticmethod
+    def _range_bound(keyword: Token, value):
+        if value.__class__ is float and value.is_integer():
+            return int(value)
+        if value.__class__ is not int:
+            raise PloxRuntimeError(keyword, 'Range bounds must be integers.')
+        return value
+
     def _execute_block(self, statements, environment):
         previous = self.env
         try:
@@ -354,8 +537,15 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
             self.env = previous
 
     def interpret(self, statements):
+        if self.budget is not None:
+            self.budget.start()
         try:
             for statement in statements:
                 self._execute(statement)
+            self.scheduler.drain()
         except PloxRuntimeError as e:
+            self.scheduler.close(self)
+            self.output.flush()
             self.error(e)
+        finally:
+            self.output.flush()
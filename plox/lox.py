@@ -1,9 +1,12 @@
 import sys
+import time
 
-from plox.ast_printer import AstPrinter
+from plox.budget import Budget
+from plox.collector import Collector, parse_thresholds
 from plox.interpreter import Interpreter
+from plox.memoize import find_pure_functions, DEFAULT_MEMO_SIZE
+from plox.output import FileOutput, FlushPolicy, StdoutOutput
 from plox.parser import Parser
-from plox.plox_errors import PloxRuntimeError, PloxParserError
 from plox.resolver import Resolver
 from plox.scanner import Scanner
 from plox.token_type import TokenType
@@ -29,13 +32,61 @@ def yellow(text):
     return color(text, 226)
 
 
+class _RuntimeErrors(list):
+    """Prints and keeps the runtime errors the interpreter reports.
+
+    The interpreter holds on to its error callback, a bound method of Lox
+    would make every Lox and its interpreter a cycle only a full
+    collection frees.
+    """
+
+    def __call__(self, error):
+        print(red(f'[RuntimeError at line {error.token.line}] {error.message}'))
+        self.append(error)
+
+
 class Lox(object):
-    def __init__(self):
+    """Scans, parses, resolves and runs Lox source on one interpreter.
+
+    With session=True every run evaluates into the globals of the runs
+    before it, as the prompt does, the interpreter lets go of the syntax
+    trees no function refers to any more, so memory stays flat however
+    many runs there are, and a final expression without ';' prints its
+    value. A Collector made with freeze=True freezes what the compiler
+    built before it runs.
+
+    With engine='clox' every run goes to the clox VM library loaded into
+    this process instead, which compiles and runs the source on a fresh
+    VM. Its output, errors included, is printed to sys.stdout once the run
+    ends and clox_result keeps the output and exit code of the last run.
+    The options of the tree walker do not apply to it.
+    """
+
+    def __init__(self, adaptive=False, memo_size=0, output=None, budget=None, profiler=None, session=False,
+                 collector=None, engine='plox'):
+        if engine not in ('plox', 'clox'):
+            raise ValueError(f"Unknown engine '{engine}', expected plox or clox.")
+        self.engine = engine
+        self.clox = None
+        self.clox_result = None
         self.had_error = False
-        self.had_runtime_error = False
-        self.interpreter = Interpreter(self.runtime_error)
+        self.runtime_errors = _RuntimeErrors()
+        if profiler is not None:
+            from plox.profiler import ProfilingInterpreter
+            self.interpreter = ProfilingInterpreter(self.runtime_errors, output, profiler)
+        elif adaptive:
+            from plox.adaptive import AdaptiveInterpreter
+            self.interpreter = AdaptiveInterpreter(self.runtime_errors, output)
+        else:
+            self.interpreter = Interpreter(self.runtime_errors, output)
+        self.interpreter.budget = budget
+        self.collector = collector
         self.warning_count = 0
         self.error_count = 0
+        self.memo_size = memo_size
+        self.session = session
+        if session:
+            self.interpreter.weaken()
 
     def scanner_error(self, line, message):
         self._report(line, '', message, False)
@@ -48,12 +99,11 @@ class Lox(object):
         else:
             self._report(token.line, f' at \'{token.lexeme}\'', message, warning)
 
-    def prompt_error(self, token, message):
-        self.had_error = True
-
-    def runtime_error(self, error):
-        print(red(f'[RuntimeError at line {error.token.line}] {error.message}'))
-        self.had_runtime_error = True
+    @property
+    def had_runtime_error(self):
+        if self.clox_result is not None:
+            return self.clox_result.exit_code == 70
+        return len(self.runtime_errors) > 0
 
     def _report(self, line, where, message, warning):
         level = 'Error'
@@ -68,16 +118,47 @@ class Lox(object):
         else:
             self.warning_count += 1
 
-    def run(self, source, error_handler=None):
+    def run(self, source):
+        if self.engine == 'clox':
+            self._run_clox(source)
+            return
+
+        statements = self.compile(source)
+        if statements is None:
+            return
+
+        if self.memo_size:
+            self.interpreter.memoize(find_pure_functions(statements), self.memo_size)
+
+        if self.collector is not None:
+            self.collector.compiled()
+
+        self.interpreter.interpret(statements)
+
+    def _run_clox(self, source):
+        if self.clox is None:
+            from plox.clox import Clox
+            self.clox = Clox()
+        self.clox_result = self.clox.run(source)
+        self.had_error = self.clox_result.exit_code == 65
+        print(self.clox_result.output, end='')
+
+    def compile(self, source):
+        """Scan, parse and resolve source, the statements or None on an error."""
+        self.had_error = False
+        self.runtime_errors.clear()
+        self.warning_count = 0
+        self.error_count = 0
+
         scanner = Scanner(source, self.scanner_error)
-        parser = Parser(scanner.scan_tokens(), self.token_error)
+        parser = Parser(scanner.scan_tokens(), self.token_error, self.session)
         statements = parser.parse()
 
         if self.warning_count > 0 or self.error_count > 0:
             print(f'{self.error_count} error(s) and {self.warning_count} warning(s) occurred')
 
         if self.had_error:
-            return
+            return None
 
         resolver = Resolver(self.token_error, self.interpreter)
         resolver.resolve(statements)
@@ -86,17 +167,63 @@ class Lox(object):
             print(f'{self.error_count} error(s) and {self.warning_count} warning(s) occurred')
 
         if self.had_error:
-            return
-
-        self.interpreter.interpret(statements)
+            return None
+        return statements
 
 
-def run_file(path):
+def run_file(path, adaptive=False, adaptive_stats=False, memo_size=0, memo_stats=False, output=None, budget=None,
+             profiler=None, profile_out=None, profile_format='pstats', sampler=None, sample_out=None,
+             heap_report=False, collector=None, gc_stats=False, heap_diff=False):
     with open(path, 'r') as lf:
         data = lf.read()
 
-    lox = Lox()
-    lox.run(data)
+    if collector is None and gc_stats:
+        # only counting, the thresholds and freezing stay as the embedding program set them
+        collector = Collector()
+    lox = Lox(adaptive or adaptive_stats, memo_size, output, budget, profiler, collector=collector)
+    if heap_diff:
+        from plox.heap import take_snapshot
+        before = take_snapshot(lox.interpreter, unreachable=False)
+    if sampler is not None:
+        sampler.start(lox.interpreter)
+    if collector is not None:
+        collector.start()
+    try:
+        lox.run(data)
+    finally:
+        if collector is not None:
+            collector.stop()
+        if sampler is not None:
+            sampler.stop()
+        lox.interpreter.output.close()
+
+    if gc_stats:
+        print(collector.report(), file=sys.stderr)
+
+    if sampler is not None:
+        sampler.write_folded(sample_out)
+
+    if heap_report:
+        from plox.heap import take_snapshot
+        print(take_snapshot(lox.interpreter).report(), file=sys.stderr)
+
+    if heap_diff:
+        print(take_snapshot(lox.interpreter, unreachable=False).diff(before), file=sys.stderr)
+
+    if profiler is not None:
+        if profile_out is None:
+            profiler.report()
+        elif profile_format == 'callgrind':
+            profiler.dump_callgrind(profile_out)
+        else:
+            profiler.dump_stats(profile_out)
+
+    if adaptive_stats:
+        print(lox.interpreter.stats.report(), file=sys.stderr)
+
+    if memo_stats:
+        for cache in lox.interpreter.memo_caches.values():
+            print(cache, file=sys.stderr)
 
     if lox.had_error:
         sys.exit(65)
@@ -105,34 +232,211 @@ def run_file(path):
         sys.exit(70)
 
 
-def run_prompt():
+def run_clox(path):
+    """Run the script on the clox VM loaded into this process, exiting as clox does."""
+    from plox.clox import Clox
+    exit_code = Clox().run_file(path, capture=False).exit_code
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def emit_bytecode(path, out_path):
+    """Compile the script to a bytecode file for clox, exiting with 65 on any error."""
+    from plox.bytecode import BytecodeCompiler, dumps
+    with open(path, 'r') as lf:
+        data = lf.read()
+
     lox = Lox()
+    statements = lox.compile(data)
+    if statements is None:
+        sys.exit(65)
 
-    while True:
-        print('> ', end='')
-        data = input()
-        lox.run(data, lox.prompt_error)
+    script = BytecodeCompiler(lox.token_error).compile(statements)
+    if script is None:
+        print(f'{lox.error_count} error(s) and {lox.warning_count} warning(s) occurred')
+        sys.exit(65)
 
-        if lox.had_error:
-            lox.had_error = False
-            scanner = Scanner(data, lox.token_error)
-            parser = Parser(scanner.scan_tokens(), lox.error)
+    with open(out_path, 'wb') as bf:
+        bf.write(dumps(script))
 
-            try:
-                expr = parser._expression()
-                print(lox.interpreter.evaluate(expr))
-            except (PloxParserError, PloxRuntimeError) as e:
-                lox.runtime_error(e)
 
-        lox.had_error = False
-        lox.had_runtime_error = False
+def run_prompt(adaptive=False, memo_size=0):
+    lox = Lox(adaptive, memo_size, session=True)
+
+    while True:
+        try:
+            data = input('> ')
+        except KeyboardInterrupt:
+            print()
+            continue
+        except EOFError:
+            print()
+            return
+        lox.run(data)
+
+
+def run_batch(paths, jobs=1, adaptive=False, memo_size=0, json_path=None):
+    from plox.batch import batch_exit_code, batch_summary, run_batch as run_scripts, write_summary
+
+    start = time.perf_counter()
+    results = run_scripts(paths, jobs, adaptive, memo_size)
+    elapsed = time.perf_counter() - start
+
+    if json_path != '-':
+        for result in results:
+            sys.stdout.write(result.stdout)
+    if json_path:
+        write_summary(json_path, batch_summary(results, jobs, elapsed))
+
+    exit_code = batch_exit_code(results)
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def _argument_parser():
+    import argparse
+
+    class _ArgumentParser(argparse.ArgumentParser):
+        def error(self, message):
+            self.print_usage()
+            print(message)
+            sys.exit(64)
+
+    return _ArgumentParser(prog='plox')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 1 and not argv[0].startswith('-'):
+        # plox script.lox, the common case, does not need argparse
+        run_file(argv[0], collector=Collector(freeze=True))
+        return
+
+    parser = _argument_parser()
+    parser.add_argument('scripts', nargs='*', metavar='script')
+    parser.add_argument('--engine', choices=['plox', 'clox'], default='plox',
+                        help='run the script on the tree walker or on the clox VM library (default: plox)')
+    parser.add_argument('--emit-bytecode', metavar='FILE',
+                        help='compile the script to a bytecode file clox runs without compiling it, '
+                             'instead of running it')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='specialize hot binary, call and property sites')
+    parser.add_argument('--adaptive-stats', action='store_true',
+                        help='run adaptively and report specialization rates on stderr')
+    parser.add_argument('--memoize', action='store_true',
+                        help='cache results of functions proven to be pure')
+    parser.add_argument('--memo-size', type=int, default=DEFAULT_MEMO_SIZE,
+                        help=f'entries kept per memoized function (default: {DEFAULT_MEMO_SIZE})')
+    parser.add_argument('--memo-stats', action='store_true',
+                        help='report memoization hits and evictions on stderr')
+    parser.add_argument('--output', metavar='FILE',
+                        help='write printed values to FILE instead of stdout')
+    parser.add_argument('--flush', choices=[policy.name.lower() for policy in FlushPolicy],
+                        help='when printed values are written (default: line on a terminal, else block)')
+    parser.add_argument('--max-steps', type=int, metavar='N',
+                        help='stop after N loop iterations and calls')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='stop when the script runs longer than SECONDS')
+    parser.add_argument('--max-depth', type=int, metavar='N',
+                        help='stop when calls nest deeper than N')
+    parser.add_argument('--max-memory', type=int, metavar='BYTES',
+                        help='stop when instances and strings allocated exceed BYTES')
+    parser.add_argument('--profile', action='store_true',
+                        help='report time spent per Lox function on stderr')
+    parser.add_argument('--profile-lines', action='store_true',
+                        help='profile and also count how often each line runs')
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help='profile and save the result to FILE instead of reporting it')
+    parser.add_argument('--profile-format', choices=['pstats', 'callgrind'], default='pstats',
+                        help='format of the --profile-out file (default: pstats)')
+    parser.add_argument('--sample', metavar='FILE',
+                        help='sample the Lox call stack and write folded stacks for flame graphs to FILE')
+    parser.add_argument('--sample-rate', type=int, default=None, metavar='HZ',
+                        help='samples taken per second by --sample (default: 100)')
+    parser.add_argument('--heap-report', action='store_true',
+                        help='report on stderr what the script left alive on the Lox heap when it ends')
+    parser.add_argument('--heap-diff', action='store_true',
+                        help='report on stderr how the Lox heap grew from the start of the script to its end')
+    parser.add_argument('--gc-threshold', metavar='N[,N[,N]]',
+                        help='thresholds of the garbage collector generations while the script runs')
+    parser.add_argument('--gc-stats', action='store_true',
+                        help='report garbage collections and their pauses on stderr')
+    parser.add_argument('--no-gc-freeze', action='store_true',
+                        help='leave the compiled program to be scanned by every full garbage collection')
+    parser.add_argument('--jobs', type=int, default=None, metavar='N',
+                        help='run the scripts as a batch on N worker processes')
+    parser.add_argument('--manifest', metavar='FILE',
+                        help='add the scripts listed in FILE, one path per line, to the batch')
+    parser.add_argument('--json', metavar='FILE',
+                        help="write a JSON summary of the batch to FILE ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    memo_size = args.memo_size if args.memoize or args.memo_stats else 0
+    scripts = list(args.scripts)
+    if args.manifest:
+        from plox.batch import read_manifest
+        scripts.extend(read_manifest(args.manifest))
+
+    if args.emit_bytecode:
+        if len(scripts) != 1:
+            parser.error('--emit-bytecode compiles exactly one script')
+        emit_bytecode(scripts[0], args.emit_bytecode)
+    elif args.engine == 'clox':
+        if len(scripts) != 1:
+            parser.error('--engine clox runs exactly one script')
+        from plox.clox import available, library_path
+        if not available():
+            parser.error(f'--engine clox needs the clox library, {library_path()} has not been built')
+        run_clox(scripts[0])
+    elif len(scripts) > 1 or args.jobs is not None or args.manifest or args.json:
+        if args.adaptive_stats or args.memo_stats or args.profile or args.profile_lines or args.profile_out \
+                or args.sample or args.heap_report or args.heap_diff or args.gc_stats:
+            parser.error('statistics are not available in batch mode')
+        if args.output:
+            parser.error('--output is not available in batch mode')
+        if args.gc_threshold or args.no_gc_freeze:
+            parser.error('--gc-threshold and --no-gc-freeze are not available in batch mode')
+        jobs = args.jobs if args.jobs is not None else 1
+        if jobs < 1:
+            parser.error('--jobs must be at least 1')
+        run_batch(scripts, jobs, args.adaptive, memo_size, args.json)
+    elif scripts:
+        policy = FlushPolicy[args.flush.upper()] if args.flush else None
+        if args.output:
+            output = FileOutput(args.output, policy or FlushPolicy.BLOCK)
+        else:
+            output = StdoutOutput(policy)
+        budget = None
+        if any(limit is not None for limit in (args.max_steps, args.timeout, args.max_depth, args.max_memory)):
+            budget = Budget(args.max_steps, args.timeout, args.max_depth, args.max_memory)
+        profiler = None
+        if args.profile or args.profile_lines or args.profile_out:
+            if args.adaptive or args.adaptive_stats:
+                parser.error('--profile cannot be combined with --adaptive')
+            from plox.profiler import LoxProfiler
+            profiler = LoxProfiler(scripts[0], args.profile_lines)
+        sampler = None
+        if args.sample:
+            from plox.sampler import DEFAULT_SAMPLE_RATE, Sampler
+            rate = args.sample_rate if args.sample_rate is not None else DEFAULT_SAMPLE_RATE
+            if rate < 1:
+                parser.error('--sample-rate must be at least 1')
+            sampler = Sampler(rate)
+        elif args.sample_rate is not None:
+            parser.error('--sample-rate needs --sample')
+        thresholds = None
+        if args.gc_threshold:
+            try:
+                thresholds = parse_thresholds(args.gc_threshold)
+            except ValueError:
+                parser.error('--gc-threshold expects one to three non-negative integers separated by commas')
+        collector = Collector(thresholds, not args.no_gc_freeze)
+        run_file(scripts[0], args.adaptive, args.adaptive_stats, memo_size, args.memo_stats, output, budget,
+                 profiler, args.profile_out, args.profile_format, sampler, args.sample, args.heap_report,
+                 collector, args.gc_stats, args.heap_diff)
+    else:
+        run_prompt(args.adaptive, memo_size)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) > 2:
-        print('Usage: plox [script]')
-        sys.exit(64)
-    elif len(sys.argv) == 2:
-        run_file(sys.argv[1])
-    else:
-        run_prompt()
+    main()
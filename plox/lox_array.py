@@ -0,0 +1,158 @@
+import operator
+
+from plox.lox_native import LoxNative
+from plox.lox_string import Rope, stringify
+from plox.plox_errors import PloxNativeError
+
+_NUMBER_TYPES = frozenset((int, float))
+_STRING_TYPES = frozenset((str, Rope))
+
+
+def _check_integer(value, message):
+    if value.__class__ is float and value.is_integer():
+        return int(value)
+    if value.__class__ is not int:
+        raise PloxNativeError(message)
+    return value
+
+
+class LoxArray(object):
+    """A growable array of Lox values.
+
+    The values are kept in a plain list rather than array('d') so that
+    integers stay integers and any Lox value can be stored. The numeric
+    natives check the element types in bulk before they run.
+    """
+
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, index):
+        return self.values[self._index(index)]
+
+    def set(self, index, value):
+        self.values[self._index(index)] = value
+
+    def _index(self, index):
+        index = _check_integer(index, 'Array index must be an integer.')
+        if not 0 <= index < len(self.values):
+            raise PloxNativeError('Array index out of range.')
+        return index
+
+    def __str__(self):
+        return '[' + ', '.join(map(stringify, self.values)) + ']'
+
+
+def _check_array(value, name):
+    if value.__class__ is not LoxArray:
+        raise PloxNativeError(f'{name}() expects an array.')
+    return value.values
+
+
+def _check_numbers(array, name):
+    values = _check_array(array, name)
+    # map(type, ...) keeps the element check out of the interpreter loop
+    if not _NUMBER_TYPES.issuperset(map(type, values)):
+        raise PloxNativeError(f'{name}() expects an array of numbers.')
+    return values
+
+
+def _check_arrays(left, right, name):
+    left = _check_numbers(left, name)
+    right = _check_numbers(right, name)
+    if len(left) != len(right):
+        raise PloxNativeError(f'{name}() expects arrays of equal length.')
+    return left, right
+
+
+def _new_array(size):
+    size = _check_integer(size, 'Array size must be an integer.')
+    if size < 0:
+        raise PloxNativeError('Array size must not be negative.')
+    return LoxArray([0] * size)
+
+
+def _len(value):
+    if value.__class__ is LoxArray:
+        return len(value.values)
+    if value.__class__ is str or value.__class__ is Rope:
+        return len(value)
+    raise PloxNativeError('len() expects an array or a string.')
+
+
+def _push(array, value):
+    _check_array(array, 'push').append(value)
+    return None
+
+
+def _slice(array, start, end):
+    values = _check_array(array, 'slice')
+    start = _check_integer(start, 'slice() bounds must be integers.')
+    end = _check_integer(end, 'slice() bounds must be integers.')
+    if not 0 <= start <= end <= len(values):
+        raise PloxNativeError('slice() bounds out of range.')
+    return LoxArray(values[start:end])
+
+
+def _fill(array, value):
+    values = _check_array(array, 'fill')
+    values[:] = [value] * len(values)
+    return None
+
+
+def _sum(array):
+    return sum(_check_numbers(array, 'sum'))
+
+
+def _min(array):
+    values = _check_numbers(array, 'min')
+    if not values:
+        raise PloxNativeError('min() of an empty array.')
+    return min(values)
+
+
+def _max(array):
+    values = _check_numbers(array, 'max')
+    if not values:
+        raise PloxNativeError('max() of an empty array.')
+    return max(values)
+
+
+def _sort(array):
+    values = _check_array(array, 'sort')
+    types = set(map(type, values))
+    if not _NUMBER_TYPES.issuperset(types) and not _STRING_TYPES.issuperset(types):
+        raise PloxNativeError('sort() expects an array of numbers or of strings.')
+    values.sort()
+    return None
+
+
+def _dot(left, right):
+    left, right = _check_arrays(left, right, 'dot')
+    return sum(map(operator.mul, left, right))
+
+
+def _add(left, right):
+    left, right = _check_arrays(left, right, 'add')
+    return LoxArray(list(map(operator.add, left, right)))
+
+
+def _mul(left, right):
+    left, right = _check_arrays(left, right, 'mul')
+    return LoxArray(list(map(operator.mul, left, right)))
+
+
+ARRAY_NATIVES = (
+    LoxNative('Array', 1, _new_array),
+    LoxNative('len', 1, _len),
+    LoxNative('push', 2, _push),
+    LoxNative('slice', 3, _slice),
+    LoxNative('fill', 2, _fill),
+    LoxNative('sum', 1, _sum),
+    LoxNative('min', 1, _min),
+    LoxNative('max', 1, _max),
+    LoxNative('sort', 1, _sort),
+    LoxNative('dot', 2, _dot),
+    LoxNative('add', 2, _add),
+    LoxNative('mul', 2, _mul),
+)
@@ -0,0 +1,184 @@
+from plox.lox_array import LoxArray
+from plox.lox_function import LoxFunction
+from plox.lox_native import LoxNative
+from plox.plox_errors import PloxNativeError
+
+
+class LoxTask(object):
+    """The pending result of an async call, sleep() or gather()."""
+
+    def __init__(self, future: 'asyncio.Future'):
+        self.future = future
+
+    def __str__(self) -> str:
+        return '<task>'
+
+
+class LoxAsyncFunction(LoxFunction):
+    def bind(self, instance):
+        method = super().bind(instance)
+        return LoxAsyncFunction(method.declaration, method.closure, method.is_initializer,
+                                method.is_getter, method.pooled)
+
+    def call(self, interpreter, arguments):
+        return interpreter.scheduler.spawn(super().call, interpreter, arguments)
+
+    def __str__(self) -> str:
+        return f'<async {super().__str__()[1:]}'
+
+
+class _Coroutine(object):
+    """Runs one async call on a thread of its own.
+
+    The interpreter walks the tree with Python recursion, so a call cannot
+    be suspended half way through on the Python stack it is running on.
+    Each async call therefore gets its own thread, and control is passed
+    back and forth with the event loop through a pair of queues. Exactly
+    one side runs at a time: the loop blocks while Lox code runs, and the
+    thread blocks while the loop waits on timers, I/O and other tasks.
+    """
+
+    def __init__(self, scheduler, function, arguments):
+        self.scheduler = scheduler
+        self.function = function
+        self.arguments = arguments
+        import queue
+        self._to_lox = queue.SimpleQueue()
+        self._to_loop = queue.SimpleQueue()
+
+    async def drive(self):
+        import asyncio
+        import threading
+        threading.Thread(target=self._run, daemon=True).start()
+
+        kind, value = self._receive()
+        while kind == 'await':
+            try:
+                reply = ('value', await value)
+            except asyncio.CancelledError as e:
+                # let the suspended call unwind before the task goes away
+                self._to_lox.put(('error', e))
+                self._receive()
+                raise
+            except Exception as e:
+                reply = ('error', e)
+            self._to_lox.put(reply)
+            kind, value = self._receive()
+
+        if kind == 'error':
+            raise value
+        return value
+
+    def _receive(self):
+        message = self._to_loop.get()
+        # the loop runs outside of any coroutine, a call that finished or
+        # suspended must not be left behind as the current one
+        self.scheduler.current = None
+        return message
+
+    def suspend(self, future):
+        self._to_loop.put(('await', future))
+        kind, value = self._to_lox.get()
+        if kind == 'error':
+            raise value
+        return value
+
+    def _run(self):
+        self.scheduler.current = self
+        try:
+            result = ('return', self.function(*self.arguments))
+        except BaseException as e:
+            result = ('error', e)
+        self._to_loop.put(result)
+
+
+class Scheduler(object):
+    """Drives async Lox calls on an asyncio event loop.
+
+    The loop is only created once a script uses async code, and it only
+    runs while the main program awaits a task or when the program is done
+    and tasks are still outstanding. It is handed the interpreter when it
+    needs one instead of keeping it, the interpreter owns the scheduler.
+    """
+
+    def __init__(self):
+        self.current = None
+        self._loop = None
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            # asyncio takes longer to import than all of plox, so only
+            # scripts that use async code load it
+            import asyncio
+            self._loop = asyncio.new_event_loop()
+        return self._loop
+
+    def spawn(self, function, *arguments) -> LoxTask:
+        coroutine = _Coroutine(self, function, arguments)
+        return LoxTask(self.loop.create_task(coroutine.drive()))
+
+    def wait(self, interpreter, value):
+        if value.__class__ is not LoxTask:
+            return value
+
+        environment = interpreter.env
+        current = self.current
+        try:
+            if current is None:
+                return self.loop.run_until_complete(value.future)
+            return current.suspend(value.future)
+        finally:
+            # other calls ran in between and left their own state behind
+            interpreter.env = environment
+            self.current = current
+
+    def drain(self):
+        if self._loop is None:
+            return
+        import asyncio
+        pending = asyncio.all_tasks(self._loop)
+        while pending:
+            self._loop.run_until_complete(asyncio.gather(*pending))
+            pending = asyncio.all_tasks(self._loop)
+        self.current = None
+
+    def close(self, interpreter):
+        """Cancel the tasks left behind by a runtime error."""
+        if self._loop is None:
+            return
+        import asyncio
+        environment = interpreter.env
+        pending = asyncio.all_tasks(self._loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self._loop.close()
+        self._loop = None
+        interpreter.env = environment
+        self.current = None
+
+    def sleep(self, ms):
+        if (ms.__class__ is not int and ms.__class__ is not float) or ms < 0:
+            raise PloxNativeError('sleep() expects a non-negative number of milliseconds.')
+        import asyncio
+        return LoxTask(self.loop.create_task(asyncio.sleep(ms / 1000)))
+
+    def gather(self, array):
+        if array.__class__ is not LoxArray:
+            raise PloxNativeError('gather() expects an array.')
+        return LoxTask(self.loop.create_task(self._gather(list(array.values))))
+
+    @staticmethod
+    async def _gather(values):
+        import asyncio
+        futures = [value.future for value in values if value.__class__ is LoxTask]
+        results = iter(await asyncio.gather(*futures))
+        return LoxArray([next(results) if value.__class__ is LoxTask else value for value in values])
+
+    def natives(self):
+        return (
+            LoxNative('sleep', 1, self.sleep),
+            LoxNative('gather', 1, self.gather),
+        )
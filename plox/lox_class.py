@@ -1,12 +1,11 @@
-from typing import Dict
-
+from plox.budget import INSTANCE_SIZE
 from plox.lox_callable import LoxCallable
 from plox.lox_function import LoxFunction
 from plox.lox_instance import LoxInstance
 
 
 class LoxClass(LoxCallable):
-    def __init__(self, name: str, superclass: 'LoxClass', methods: Dict[str, LoxFunction]):
+    def __init__(self, name: str, superclass: 'LoxClass', methods: 'dict[str, LoxFunction]'):
         self.name = name
         self.superclass = superclass
         self.methods = methods
@@ -16,6 +15,8 @@ class LoxClass(LoxCallable):
 
     def call(self, interpreter, arguments):
         instance = LoxInstance(self)
+        if interpreter.budget is not None:
+            interpreter.budget.allocated += INSTANCE_SIZE
         initializer = self.find_method("init")
         if initializer:
             initializer.bind(instance).call(interpreter, arguments)
@@ -8,24 +8,36 @@ class LoxFunction(LoxCallable):
     def __init__(self, declaration: Function,
                  closure: Environment,
                  is_initializer: bool = False,
-                 is_getter: bool = False):
+                 is_getter: bool = False,
+                 pooled: bool = False):
         self.declaration = declaration
         self.closure = closure
         self.anonymous = declaration.anonymous
         self.is_initializer = is_initializer
         self.is_getter = is_getter
+        # no closure can outlive a call, so its frame is recycled
+        self.pooled = pooled
 
     def bind(self, instance):
         environment = Environment(self.closure)
         environment.define("this", instance)
-        return LoxFunction(self.declaration, environment, self.is_initializer, self.is_getter)
+        return LoxFunction(self.declaration, environment, self.is_initializer, self.is_getter, self.pooled)
 
     def call(self, interpreter, arguments):
-        environment = Environment(self.closure)
+        budget = interpreter.budget
+        if budget is not None:
+            budget.enter(self.declaration.name)
+
+        if self.pooled:
+            frames = interpreter.frames
+            environment = frames.pop() if frames else Environment()
+            environment.enclosing = self.closure
+        else:
+            environment = Environment(self.closure)
 
+        values = environment.values
         for param, arg in zip(self.declaration.params, arguments):
-            environment.define(param.lexeme, None)
-            environment.assign(param, arg)
+            values[param.lexeme] = arg
 
         try:
             interpreter._execute_block(self.declaration.body, environment)
@@ -33,6 +45,13 @@ class LoxFunction(LoxCallable):
             if self.is_initializer:
                 return self.closure.get_at(0, 'this')
             return return_value.value
+        finally:
+            if budget is not None:
+                budget.depth -= 1
+            if self.pooled:
+                values.clear()
+                environment.enclosing = None
+                frames.append(environment)
 
         if self.is_initializer:
             return self.closure.get_at(0, "this")
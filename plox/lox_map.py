@@ -0,0 +1,95 @@
+from plox.lox_array import LoxArray
+from plox.lox_instance import LoxInstance
+from plox.lox_native import LoxNative
+from plox.lox_string import Rope, stringify
+from plox.plox_errors import PloxNativeError
+
+
+class _BoolKey(object):
+    # Python hashes true like 1, Lox keeps them apart
+    def __init__(self, value):
+        self.value = value
+
+
+_BOOL_KEYS = {True: _BoolKey(True), False: _BoolKey(False)}
+
+_KEY_TYPES = frozenset((int, float, str, bool, type(None), LoxInstance))
+
+
+def _key(key):
+    if key.__class__ is bool:
+        return _BOOL_KEYS[key]
+    if key.__class__ is Rope:
+        return key.flatten()
+    return key
+
+
+def _lox_key(key):
+    if key.__class__ is _BoolKey:
+        return key.value
+    return key
+
+
+class LoxMap(object):
+    """A hash map keyed by numbers, strings, booleans, nil or instances.
+
+    Instances are compared by identity, everything else by value.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = {} if entries is None else entries
+
+    def get(self, key):
+        return self.entries.get(_key(key))
+
+    def set(self, key, value):
+        if key.__class__ not in _KEY_TYPES and key.__class__ is not Rope:
+            raise PloxNativeError('Map keys must be numbers, strings, booleans, nil or instances.')
+        self.entries[_key(key)] = value
+
+    def __str__(self):
+        items = [f'{stringify(_lox_key(key))}: {stringify(value)}' for key, value in self.entries.items()]
+        return '{' + ', '.join(items) + '}'
+
+
+def _check_map(value, name):
+    if value.__class__ is not LoxMap:
+        raise PloxNativeError(f'{name}() expects a map.')
+    return value.entries
+
+
+def _keys(lox_map):
+    return LoxArray(list(map(_lox_key, _check_map(lox_map, 'keys'))))
+
+
+def _values(lox_map):
+    return LoxArray(list(_check_map(lox_map, 'values').values()))
+
+
+def _has(lox_map, key):
+    return _key(key) in _check_map(lox_map, 'has')
+
+
+def _remove(lox_map, key):
+    return _check_map(lox_map, 'remove').pop(_key(key), None)
+
+
+def _size(lox_map):
+    return len(_check_map(lox_map, 'size'))
+
+
+def _merge(left, right):
+    entries = dict(_check_map(left, 'merge'))
+    entries.update(_check_map(right, 'merge'))
+    return LoxMap(entries)
+
+
+MAP_NATIVES = (
+    LoxNative('Map', 0, LoxMap),
+    LoxNative('keys', 1, _keys),
+    LoxNative('values', 1, _values),
+    LoxNative('has', 2, _has),
+    LoxNative('remove', 2, _remove),
+    LoxNative('size', 1, _size),
+    LoxNative('merge', 2, _merge),
+)
@@ -0,0 +1,17 @@
+from plox.lox_callable import LoxCallable
+
+
+class LoxNative(LoxCallable):
+    def __init__(self, name: str, arity: int, function):
+        self.name = name
+        self._arity = arity
+        self.function = function
+
+    def call(self, interpreter, arguments):
+        return self.function(*arguments)
+
+    def arity(self):
+        return self._arity
+
+    def __str__(self) -> str:
+        return "<native fn>"
@@ -0,0 +1,111 @@
+import sys
+
+# Shorter concatenations are cheaper to copy than to defer
+ROPE_MIN_LENGTH = 256
+
+
+def intern(text: str) -> str:
+    return sys.intern(text)
+
+
+class Rope(object):
+    """A lazily concatenated Lox string.
+
+    Building a string with repeated + copies the whole prefix each time.
+    A rope only records its two halves and joins them the first time the
+    text is needed, e.g. when it is printed, subscripted or compared.
+    """
+    __slots__ = ('left', 'right', 'length', '_flat')
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.length = len(left) + len(right)
+        self._flat = None
+
+    def flatten(self) -> str:
+        if self._flat is None:
+            parts = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if node.__class__ is not Rope:
+                    parts.append(node)
+                elif node._flat is not None:
+                    parts.append(node._flat)
+                else:
+                    stack.append(node.right)
+                    stack.append(node.left)
+            self._flat = ''.join(parts)
+            self.left = None
+            self.right = None
+        return self._flat
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return self.flatten()
+
+    def __getitem__(self, item):
+        return self.flatten()[item]
+
+    def __hash__(self):
+        return hash(self.flatten())
+
+    def __eq__(self, other):
+        if other.__class__ is Rope or other.__class__ is str:
+            return self.length == len(other) and self.flatten() == flatten(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        return self.flatten() < flatten(other)
+
+    def __le__(self, other):
+        return self.flatten() <= flatten(other)
+
+    def __gt__(self, other):
+        return self.flatten() > flatten(other)
+
+    def __ge__(self, other):
+        return self.flatten() >= flatten(other)
+
+
+def flatten(value):
+    if value.__class__ is Rope:
+        return value.flatten()
+    return value
+
+
+def concat(left, right):
+    if len(left) + len(right) < ROPE_MIN_LENGTH:
+        return flatten(left) + flatten(right)
+
+    # Grow the short tail of a rope instead of adding a node per piece
+    if left.__class__ is Rope and left._flat is None and right.__class__ is str:
+        tail = left.right
+        if tail.__class__ is str and len(tail) + len(right) < ROPE_MIN_LENGTH:
+            return Rope(left.left, tail + right)
+    return Rope(left, right)
+
+
+def lox_str(value):
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return str(value)
+
+
+def stringify(value):
+    if value is None:
+        return 'nil'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, (int, float)):
+        stringified = str(value)
+        if stringified.endswith('.0'):
+            return stringified[:len(stringified) - 2]
+    return str(value)
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+from collections import Counter, OrderedDict
+
+import plox.expr as Expr
+import plox.stmt as Stmt
+from plox.lox_function import LoxFunction
+
+DEFAULT_MEMO_SIZE = 1024
+
+MEMO_KEY_TYPES = (int, float, str, bool, type(None))
+
+_MISSING = object()
+
+
+def memo_key(arguments):
+    for argument in arguments:
+        if argument.__class__ not in MEMO_KEY_TYPES:
+            return None
+        # 0.0 and -0.0 hash alike but print differently
+        if argument.__class__ is float and argument == 0:
+            return None
+    # Python treats 1, 1.0 and true as the same key, Lox does not
+    return tuple(arguments), tuple(argument.__class__ for argument in arguments)
+
+
+class MemoCache(object):
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.enabled = True
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def disable(self):
+        self.enabled = False
+        self.entries.clear()
+
+    def __str__(self):
+        return (f'{self.name:<20} hits: {self.hits:<10} misses: {self.misses:<10} '
+                f'evictions: {self.evictions:<8} size: {len(self.entries)}/{self.maxsize}')
+
+
+class MemoizedFunction(LoxFunction):
+    def __init__(self, declaration: Stmt.Function, closure, cache: MemoCache, pooled: bool = False):
+        super().__init__(declaration, closure, pooled=pooled)
+        self.cache = cache
+
+    def call(self, interpreter, arguments):
+        cache = self.cache
+        key = memo_key(arguments) if cache.enabled else None
+        if key is None:
+            return super().call(interpreter, arguments)
+
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = super().call(interpreter, arguments)
+            cache.put(key, value)
+        return value
+
+
+class _FunctionInfo(object):
+    def __init__(self, declaration, candidate):
+        self.declaration = declaration
+        self.candidate = candidate
+        self.pure = True
+        self.dependencies = set()
+        self.scopes = [{param.lexeme for param in declaration.params}]
+
+    def is_local(self, name):
+        for scope in self.scopes:
+            if name in scope:
+                return True
+        return False
+
+
+class PurityAnalyzer(Expr.ExprVisitor, Stmt.StmtVisitor):
+    """Find named functions whose result only depends on their arguments.
+
+    A function is pure when it does not print, set fields, assign to
+    variables it did not declare itself, declare closures or classes, or
+    read any variable but its own locals and other pure functions. Names
+    that are declared more than once or assigned anywhere in the program
+    are never trusted to refer to a function.
+    """
+
+    def __init__(self):
+        self.declared = Counter()
+        self.assigned = set()
+        self.functions = []
+        self.current = None
+
+    def analyze(self, statements: list[Stmt.Stmt]):
+        self._walk(statements)
+
+        pure = {}
+        for info in self.functions:
+            name = info.declaration.name.lexeme
+            if info.candidate and info.pure and self.declared[name] == 1 and name not in self.assigned:
+                pure[name] = info
+
+        changed = True
+        while changed:
+            changed = False
+            for name, info in list(pure.items()):
+                if not info.dependencies.issubset(pure):
+                    del pure[name]
+                    changed = True
+
+        return [info.declaration for info in pure.values()]
+
+    def visit_block_stmt(self, stmt: Stmt.Block) -> object:
+        self._begin_scope()
+        self._walk(stmt.statements)
+        self._end_scope()
+        return None
+
+    def visit_break_stmt(self, stmt: Stmt.Break) -> object:
+        return None
+
+    def visit_class_stmt(self, stmt: Stmt.Class) -> object:
+        self._impure()
+        self._declare(stmt.name.lexeme)
+        if stmt.superclass:
+            self._evaluate(stmt.superclass)
+        for method in stmt.methods:
+            self._function(method, candidate=False)
+        return None
+
+    def visit_expression_stmt(self, stmt: Stmt.Expression) -> object:
+        self._evaluate(stmt.expression)
+        return None
+
+    def visit_forrange_stmt(self, stmt: Stmt.ForRange) -> object:
+        self._evaluate(stmt.start)
+        self._evaluate(stmt.stop)
+        self._evaluate(stmt.step)
+        self._begin_scope()
+        self._declare(stmt.name.lexeme)
+        self._execute(stmt.body)
+        self._end_scope()
+        return None
+
+    def visit_function_stmt(self, stmt: Stmt.Function) -> object:
+        # closures capture the enclosing frame, keep it simple and give up
+        self._impure()
+        if not stmt.anonymous:
+            self._declare(stmt.name.lexeme)
+        self._function(stmt, candidate=not stmt.anonymous and not stmt.is_async)
+        return None
+
+    def visit_if_stmt(self, stmt: Stmt.If) -> object:
+        self._evaluate(stmt.condition)
+        self._execute(stmt.then_branch)
+        if stmt.else_branch is not None:
+            self._execute(stmt.else_branch)
+        return None
+
+    def visit_print_stmt(self, stmt: Stmt.Print) -> object:
+        self._impure()
+        self._evaluate(stmt.expression)
+        return None
+
+    def visit_return_stmt(self, stmt: Stmt.Return) -> object:
+        if stmt.value is not None:
+            self._evaluate(stmt.value)
+        return None
+
+    def visit_var_stmt(self, stmt: Stmt.Var) -> object:
+        if stmt.initializer is not None:
+            self._evaluate(stmt.initializer)
+        self._declare(stmt.name.lexeme)
+        return None
+
+    def visit_while_stmt(self, stmt: Stmt.While) -> object:
+        self._evaluate(stmt.condition)
+        self._execute(stmt.body)
+        return None
+
+    def visit_assign_expr(self, expr: Expr.Assign) -> object:
+        self._evaluate(expr.value)
+        self.assigned.add(expr.name.lexeme)
+        if self.current and not self.current.is_local(expr.name.lexeme):
+            self._impure()
+        return None
+
+    def visit_await_expr(self, expr: Expr.Await) -> object:
+        self._impure()
+        self._evaluate(expr.value)
+        return None
+
+    def visit_binary_expr(self, expr: Expr.Binary) -> object:
+        self._evaluate(expr.left)
+        self._evaluate(expr.right)
+        return None
+
+    def visit_call_expr(self, expr: Expr.Call) -> object:
+        # only direct calls of named functions can be checked
+        callee = expr.callee
+        if not isinstance(callee, Expr.Variable) or (self.current and self.current.is_local(callee.name.lexeme)):
+            self._impure()
+        self._evaluate(callee)
+        for argument in expr.arguments:
+            self._evaluate(argument)
+        return None
+
+    def visit_get_expr(self, expr: Expr.Get) -> object:
+        self._evaluate(expr.objct)
+        return None
+
+    def visit_grouping_expr(self, expr: Expr.Grouping) -> object:
+        self._evaluate(expr.expression)
+        return None
+
+    def visit_literal_expr(self, expr: Expr.Literal) -> object:
+        return None
+
+    def visit_logical_expr(self, expr: Expr.Logical) -> object:
+        self._evaluate(expr.left)
+        self._evaluate(expr.right)
+        return None
+
+    def visit_set_expr(self, expr: Expr.Set) -> object:
+        self._impure()
+        self._evaluate(expr.objct)
+        self._evaluate(expr.value)
+        return None
+
+    def visit_subscript_expr(self, expr: Expr.Subscript) -> object:
+        self._evaluate(expr.objct)
+        self._evaluate(expr.index)
+        return None
+
+    def visit_subscriptset_expr(self, expr: Expr.SubscriptSet) -> object:
+        self._impure()
+        self._evaluate(expr.objct)
+        self._evaluate(expr.index)
+        self._evaluate(expr.value)
+        return None
+
+    def visit_super_expr(self, expr: Expr.Super) -> object:
+        self._impure()
+        return None
+
+    def visit_ternary_expr(self, expr: Expr.Ternary) -> object:
+        self._evaluate(expr.condition)
+        self._evaluate(expr.then_branch)
+        self._evaluate(expr.else_branch)
+        return None
+
+    def visit_this_expr(self, expr: Expr.This) -> object:
+        self._impure()
+        return None
+
+    def visit_unary_expr(self, expr: Expr.Unary) -> object:
+        self._evaluate(expr.right)
+        return None
+
+    def visit_variable_expr(self, expr: Expr.Variable) -> object:
+        if self.current and not self.current.is_local(expr.name.lexeme):
+            self.current.dependencies.add(expr.name.lexeme)
+        return None
+
+    def _function(self, declaration: Stmt.Function, candidate: bool):
+        for param in declaration.params:
+            self.declared[param.lexeme] += 1
+
+        enclosing = self.current
+        self.current = _FunctionInfo(declaration, candidate)
+        self.functions.append(self.current)
+        self._walk(declaration.body)
+        self.current = enclosing
+
+    def _impure(self):
+        if self.current:
+            self.current.pure = False
+
+    def _declare(self, name: str):
+        self.declared[name] += 1
+        if self.current:
+            self.current.scopes[-1].add(name)
+
+    def _begin_scope(self):
+        if self.current:
+            self.current.scopes.append(set())
+
+    def _end_scope(self):
+        if self.current:
+            self.current.scopes.pop()
+
+    def _walk(self, statements):
+        for stmt in statements:
+            if stmt is not None:
+                self._execute(stmt)
+
+    def _execute(self, stmt: Stmt.Stmt):
+        stmt.accept(self)
+
+    def _evaluate(self, expr: Expr.Expr):
+        expr.accept(self)
+
+
+def find_pure_functions(statements: list[Stmt.Stmt]) -> list[Stmt.Function]:
+    return PurityAnalyzer().analyze(statements)
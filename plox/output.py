@@ -0,0 +1,110 @@
+import sys
+from abc import ABC, abstractmethod
+from enum import Enum, auto
+
+DEFAULT_BUFFER_LINES = 512
+
+
+class FlushPolicy(Enum):
+    BLOCK = auto()
+    LINE = auto()
+    EXPLICIT = auto()
+
+
+class Output(ABC):
+    """Collects the text of Lox print statements before it is written.
+
+    BLOCK writes once buffer_lines lines are waiting, LINE writes every
+    line as it is printed and EXPLICIT only writes when flush() is called.
+    The interpreter flushes on runtime errors and when a program finishes,
+    whatever the policy.
+    """
+
+    def __init__(self, policy=FlushPolicy.BLOCK, buffer_lines=DEFAULT_BUFFER_LINES):
+        self.policy = policy
+        self.lines = []
+        if policy is FlushPolicy.LINE:
+            self.max_lines = 1
+        elif policy is FlushPolicy.BLOCK:
+            self.max_lines = buffer_lines
+        else:
+            self.max_lines = float('inf')
+
+    def write_line(self, text: str):
+        self.lines.append(text)
+        if len(self.lines) >= self.max_lines:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.lines.append('')
+            data = '\n'.join(self.lines)
+            self.lines.clear()
+            self._write(data)
+
+    def close(self):
+        self.flush()
+
+    @abstractmethod
+    def _write(self, data: str):
+        """Write data, whole lines of printed text, to the sink."""
+
+
+class StdoutOutput(Output):
+    def __init__(self, policy=None, buffer_lines=DEFAULT_BUFFER_LINES):
+        if policy is None:
+            policy = FlushPolicy.LINE if sys.stdout.isatty() else FlushPolicy.BLOCK
+        super().__init__(policy, buffer_lines)
+
+    def _write(self, data: str):
+        # looked up on every write so redirect_stdout keeps working
+        sys.stdout.write(data)
+        if self.policy is FlushPolicy.LINE:
+            sys.stdout.flush()
+
+
+class FileOutput(Output):
+    def __init__(self, path: str, policy=FlushPolicy.BLOCK, buffer_lines=DEFAULT_BUFFER_LINES):
+        super().__init__(policy, buffer_lines)
+        self.file = open(path, 'w')
+
+    def _write(self, data: str):
+        self.file.write(data)
+        if self.policy is FlushPolicy.LINE:
+            self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class StreamOutput(Output):
+    def __init__(self, stream, policy=FlushPolicy.BLOCK, buffer_lines=DEFAULT_BUFFER_LINES):
+        super().__init__(policy, buffer_lines)
+        self.stream = stream
+
+    def _write(self, data: str):
+        self.stream.write(data)
+        if self.policy is FlushPolicy.LINE:
+            self.stream.flush()
+
+
+class MemoryOutput(Output):
+    def __init__(self):
+        super().__init__(FlushPolicy.EXPLICIT)
+        self.chunks = []
+
+    def _write(self, data: str):
+        self.chunks.append(data)
+
+    def getvalue(self) -> str:
+        self.flush()
+        return ''.join(self.chunks)
+
+
+class NullOutput(Output):
+    def __init__(self):
+        super().__init__(FlushPolicy.BLOCK)
+
+    def _write(self, data: str):
+        pass
@@ -1,6 +1,5 @@
 import plox.expr as Expr
 import plox.stmt as Stmt
-from plox.lox_bool import lox_false, lox_true
 from plox.plox_errors import PloxParserError
 from plox.token import Token
 from plox.token_type import TokenType as TT, EQUALITY_TOKENS, COMPARISON_TOKENS
@@ -9,10 +8,12 @@ from plox.token_type import ADDITION_TOKENS, MULTIPLICATION_TOKENS, KEYWORD_TOKE
 
 class Parser(object):
 
-    def __init__(self, tokens, error):
+    def __init__(self, tokens, error, prompt=False):
         self.tokens = tokens
         self.error = error
         self.current = 0
+        # at the prompt a final expression without ';' prints its value
+        self.prompt = prompt
 
     def parse(self):
         statements = []
@@ -26,6 +27,9 @@ class Parser(object):
                 return self._class_declaration()
             if self._match(TT.FUN):
                 return self._function("function")
+            if self._match(TT.ASYNC):
+                self._consume(TT.FUN, "Expect 'fun' after 'async'.")
+                return self._function("function", is_async=True)
             if self._match(TT.VAR):
                 return self._var_declaration()
 
@@ -47,7 +51,7 @@ class Parser(object):
 
         methods = []
         while not self._check(TT.RIGHT_BRACE) and not self._is_at_end():
-            methods.append(self._function("method"))
+            methods.append(self._function("method", is_async=self._match(TT.ASYNC)))
 
         self._consume(TT.RIGHT_BRACE, "Expect '}' after class body.")
 
@@ -77,7 +81,12 @@ class Parser(object):
         return Stmt.Break(break_token)
 
     def _for_statement(self):
+        keyword = self._previous()
         self._consume(TT.LEFT_PAREN, "Expect '(' after 'for'.")
+        # 'in' and 'range' are contextual so they stay valid identifiers
+        if self._check(TT.IDENTIFIER) and self._peek_next().lexeme == 'in':
+            return self._range_statement()
+
         if self._match(TT.SEMICOLON):
             initializer = None
         elif self._match(TT.VAR):
@@ -104,13 +113,39 @@ class Parser(object):
 
         if condition is None:
             condition = Expr.Literal(True)
-        body = Stmt.While(condition, body)
+        body = Stmt.While(keyword, condition, body)
 
         if initializer is not None:
             body = Stmt.Block([initializer, body])
 
         return body
 
+    def _range_statement(self):
+        name = self._advance()
+        self._advance()  # in
+        keyword = self._consume(TT.IDENTIFIER, "Expect 'range' after 'in'.")
+        if keyword.lexeme != 'range':
+            raise self._error(keyword, "Expect 'range' after 'in'.")
+        self._consume(TT.LEFT_PAREN, "Expect '(' after 'range'.")
+
+        bounds = [self._expression()]
+        while self._match(TT.COMMA):
+            if len(bounds) >= 3:
+                self._error(self._peek(), "Cannot have more than 3 range arguments.")
+            bounds.append(self._expression())
+
+        self._consume(TT.RIGHT_PAREN, "Expect ')' after range arguments.")
+        self._consume(TT.RIGHT_PAREN, "Expect ')' after for clauses.")
+        body = self._statement()
+
+        if len(bounds) == 1:
+            bounds.insert(0, Expr.Literal(0))
+        if len(bounds) == 2:
+            bounds.append(Expr.Literal(1))
+        start, stop, step = bounds[:3]
+
+        return Stmt.ForRange(name, keyword, start, stop, step, body)
+
     def _if_statement(self):
         self._consume(TT.LEFT_PAREN, "Expect '(' after 'if'.")
         condition = self._expression()
@@ -124,12 +159,13 @@ class Parser(object):
         return Stmt.If(condition, then_branch, else_branch)
 
     def _while_statement(self):
+        keyword = self._previous()
         self._consume(TT.LEFT_PAREN, "Expect '(' after 'while'.")
         condition = self._expression()
         self._consume(TT.RIGHT_PAREN, "Expect ')' after condition.")
         body = self._statement()
 
-        return Stmt.While(condition, body)
+        return Stmt.While(keyword, condition, body)
 
     def _print_statement(self):
         value = self._expression()
@@ -164,10 +200,12 @@ class Parser(object):
 
     def _expression_statement(self):
         value = self._expression()
+        if self.prompt and self._is_at_end():
+            return Stmt.Print(value)
         self._consume(TT.SEMICOLON, "Expect ';' after expression.")
         return Stmt.Expression(value)
 
-    def _function(self, kind, anonymous=False):
+    def _function(self, kind, anonymous=False, is_async=False):
         getter = False
         if anonymous:
             token = self._previous()
@@ -194,7 +232,7 @@ class Parser(object):
 
         self._consume(TT.LEFT_BRACE, f"Expect '{{' before {kind} body.")
         body = self._block()
-        return Stmt.Function(name, parameters, body, anonymous, getter)
+        return Stmt.Function(name, parameters, body, anonymous, getter, is_async)
 
     def _binary_rule(self, next_rule, tokens):
         expr = next_rule()
@@ -219,6 +257,8 @@ class Parser(object):
                 return Expr.Assign(expr.name, value)
             elif isinstance(expr, Expr.Get):
                 return Expr.Set(expr.objct, expr.name, value)
+            elif isinstance(expr, Expr.Subscript):
+                return Expr.SubscriptSet(expr.objct, expr.bracket, expr.index, value)
             self._error(equals, 'Invalid assignment target.')
         return expr
 
@@ -266,6 +306,11 @@ class Parser(object):
             right = self._unary()
             return Expr.Unary(operator, right)
 
+        if self._match(TT.AWAIT):
+            keyword = self._previous()
+            value = self._unary()
+            return Expr.Await(keyword, value)
+
         return self._call()
 
     def _call(self):
@@ -300,14 +345,17 @@ class Parser(object):
 
     def _primary(self):
         if self._match(TT.FALSE):
-            return Expr.Literal(lox_false)
+            return Expr.Literal(False)
         if self._match(TT.TRUE):
-            return Expr.Literal(lox_true)
+            return Expr.Literal(True)
         if self._match(TT.NIL):
             return Expr.Literal(None)
 
         if self._match(TT.FUN):
             return self._function('anonymous function', anonymous=True)
+        if self._match(TT.ASYNC):
+            self._consume(TT.FUN, "Expect 'fun' after 'async'.")
+            return self._function('anonymous function', anonymous=True, is_async=True)
 
         if self._match(TT.NUMBER, TT.STRING):
             return Expr.Literal(self._previous().literal)
@@ -355,6 +403,9 @@ class Parser(object):
     def _peek(self):
         return self.tokens[self.current]
 
+    def _peek_next(self):
+        return self.tokens[self.current + 1]
+
     def _previous(self):
         return self.tokens[self.current - 1]
 
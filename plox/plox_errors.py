@@ -1,3 +1,16 @@
+from plox.lox_string import Rope
+
+
+def _type_name(operand):
+    # Lox booleans are native Python bools but keep their historical name
+    if operand.__class__ is bool:
+        return 'LoxBool'
+    # ropes are an implementation detail of Lox strings
+    if operand.__class__ is Rope:
+        return 'str'
+    return operand.__class__.__name__
+
+
 class PloxParserError(Exception):
     def __init__(self, token, message):
         super(PloxParserError, self).__init__(message)
@@ -15,11 +28,18 @@ class PloxRuntimeError(Exception):
 class PloxTypeError(PloxRuntimeError):
     def __init__(self, token, *operands):
         operator = token.lexeme
-        ops = ' and '.join(["'%s'" % o.__class__.__name__ for o in operands])
+        ops = ' and '.join(["'%s'" % _type_name(o) for o in operands])
         msg = f'Unsupported operand type(s) for {operator}: {ops}'
         super().__init__(token, msg)
 
 
 class PloxReturnException(Exception):
     def __init__(self, value):
-        self.value = value
\ No newline at end of file
+        self.value = value
+
+
+class PloxNativeError(Exception):
+    # raised by natives, the interpreter reports it at the call site
+    def __init__(self, message):
+        super(PloxNativeError, self).__init__(message)
+        self.message = message
@@ -0,0 +1,192 @@
+import marshal
+import pstats
+import sys
+import time
+from collections import Counter
+
+import plox.expr as Expr
+import plox.stmt as Stmt
+from plox.environment import Environment
+from plox.interpreter import Interpreter
+from plox.lox_function import LoxFunction
+from plox.token import Token
+
+SCRIPT = '<script>'
+
+
+class _Frame(object):
+    __slots__ = ('key', 'start', 'children', 'recursive')
+
+    def __init__(self, key, start, recursive):
+        self.key = key
+        self.start = start
+        self.children = 0.0
+        self.recursive = recursive
+
+
+class LoxProfiler(object):
+    """Collects call counts and timings per Lox function.
+
+    The numbers are kept in the layout of cProfile, so pstats can sort,
+    print and save them. Inclusive time only counts the outermost call
+    of a recursive function, like cProfile does.
+    """
+
+    def __init__(self, filename=SCRIPT, lines=False):
+        self.filename = filename
+        self.timer = time.perf_counter
+        self.functions = {}
+        self.edges = {}
+        self.active = Counter()
+        self.stack = []
+        self.lines = Counter() if lines else None
+        self.stats = {}
+
+    def key(self, declaration: Stmt.Function, class_name=None):
+        name = declaration.name.lexeme
+        if class_name is not None:
+            name = f'{class_name}.{name}'
+        return self.filename, declaration.name.line, name
+
+    def enter(self, key):
+        active = self.active[key]
+        self.active[key] = active + 1
+        self.stack.append(_Frame(key, self.timer(), active > 0))
+
+    def leave(self):
+        now = self.timer()
+        frame = self.stack.pop()
+        key = frame.key
+        self.active[key] -= 1
+        elapsed = now - frame.start
+        own = elapsed - frame.children
+        cumulative = 0.0 if frame.recursive else elapsed
+        primitive = 0 if frame.recursive else 1
+
+        self._add(self.functions, key, primitive, own, cumulative)
+        if self.stack:
+            caller = self.stack[-1]
+            caller.children += elapsed
+            self._add(self.edges, (caller.key, key), primitive, own, cumulative)
+
+    @staticmethod
+    def _add(table, key, primitive, own, cumulative):
+        calls, primitive_calls, total, inclusive = table.get(key, (0, 0, 0.0, 0.0))
+        table[key] = (calls + 1, primitive_calls + primitive, total + own, inclusive + cumulative)
+
+    def create_stats(self):
+        """Fill self.stats the way cProfile.Profile does, for pstats.Stats."""
+        callers = {key: {} for key in self.functions}
+        for (caller, callee), (calls, primitive_calls, total, inclusive) in self.edges.items():
+            callers[callee][caller] = (calls, primitive_calls, total, inclusive)
+
+        self.stats = {}
+        for key, (calls, primitive_calls, total, inclusive) in self.functions.items():
+            self.stats[key] = (primitive_calls, calls, total, inclusive, callers[key])
+
+    def report(self, stream=None, sort='tottime', limit=30):
+        if stream is None:
+            stream = sys.stderr
+        self.create_stats()
+        pstats.Stats(self, stream=stream).sort_stats(sort).print_stats(limit)
+        if self.lines:
+            print('   hits  line', file=stream)
+            for line, hits in sorted(self.lines.items(), key=lambda item: (-item[1], item[0]))[:limit]:
+                print(f'{hits:>7}  {self.filename}:{line}', file=stream)
+
+    def dump_stats(self, path: str):
+        self.create_stats()
+        with open(path, 'wb') as pf:
+            marshal.dump(self.stats, pf)
+
+    def dump_callgrind(self, path: str):
+        """Write the profile in the format read by KCachegrind and callgrind_annotate."""
+        callees = {}
+        for (caller, callee), edge in self.edges.items():
+            callees.setdefault(caller, []).append((callee, edge))
+
+        with open(path, 'w') as cf:
+            cf.write('# callgrind format\nevents: Microseconds\n\n')
+            for key, (calls, primitive_calls, total, inclusive) in self.functions.items():
+                filename, line, name = key
+                cf.write(f'fl={filename}\nfn={name}\n{line} {round(total * 1e6)}\n')
+                for callee, edge in callees.get(key, ()):
+                    cf.write(f'cfl={callee[0]}\ncfn={callee[2]}\n')
+                    cf.write(f'calls={edge[0]} {callee[1]}\n{line} {round(edge[3] * 1e6)}\n')
+                cf.write('\n')
+
+
+class ProfiledFunction(LoxFunction):
+    def __init__(self, declaration, closure, is_initializer, is_getter, pooled, profiler, key):
+        super().__init__(declaration, closure, is_initializer, is_getter, pooled)
+        self.profiler = profiler
+        self.key = key
+
+    def bind(self, instance):
+        method = super().bind(instance)
+        return ProfiledFunction(method.declaration, method.closure, method.is_initializer,
+                                method.is_getter, method.pooled, self.profiler, self.key)
+
+    def call(self, interpreter, arguments):
+        profiler = self.profiler
+        profiler.enter(self.key)
+        try:
+            return super().call(interpreter, arguments)
+        finally:
+            profiler.leave()
+
+
+def node_line(node):
+    for value in vars(node).values():
+        if value.__class__ is Token:
+            return value.line
+    for value in vars(node).values():
+        if isinstance(value, (Expr.Expr, Stmt.Stmt)):
+            line = node_line(value)
+            if line is not None:
+                return line
+    return None
+
+
+class ProfilingInterpreter(Interpreter):
+    """Interpreter that times every Lox function, method and getter call.
+
+    Profiling lives entirely in this subclass and the functions it
+    creates, so the plain interpreter does not pay anything for it.
+    Memoized and async functions are left unprofiled, and a range loop
+    whose body is a single statement, not a block, runs that statement
+    without it being counted in the line hits.
+    """
+
+    def __init__(self, error, output=None, profiler: LoxProfiler = None):
+        super().__init__(error, output)
+        self.profiler = profiler if profiler is not None else LoxProfiler()
+        self._statement_lines = {}
+        if self.profiler.lines is not None:
+            self._execute = self._execute_counted
+
+    def interpret(self, statements):
+        profiler = self.profiler
+        profiler.enter((profiler.filename, 0, SCRIPT))
+        try:
+            super().interpret(statements)
+        finally:
+            profiler.leave()
+
+    def _function(self, declaration: Stmt.Function, closure: Environment,
+                  is_initializer=False, class_name=None) -> LoxFunction:
+        function = super()._function(declaration, closure, is_initializer, class_name)
+        if function.__class__ is not LoxFunction:
+            return function
+        return ProfiledFunction(declaration, closure, is_initializer, function.is_getter, function.pooled,
+                                self.profiler, self.profiler.key(declaration, class_name))
+
+    def _execute_counted(self, stmt):
+        lines = self._statement_lines
+        if stmt in lines:
+            line = lines[stmt]
+        else:
+            line = lines[stmt] = node_line(stmt)
+        if line is not None:
+            self.profiler.lines[line] += 1
+        stmt.accept(self)
@@ -0,0 +1,180 @@
+import inspect
+from typing import List
+
+from plox.interpreter import Interpreter
+from plox.lox_callable import LoxCallable
+from plox.lox_native import LoxNative
+from plox.output import MemoryOutput, StreamOutput
+from plox.parser import Parser
+from plox.resolver import Resolver
+from plox.scanner import Scanner
+from plox.token_type import TokenType
+
+
+class Diagnostic(object):
+    """An error or warning reported while compiling or running a program."""
+
+    def __init__(self, kind: str, line: int, message: str, where: str = '', warning: bool = False):
+        self.kind = kind
+        self.line = line
+        self.message = message
+        self.where = where
+        self.warning = warning
+
+    def to_json(self):
+        return {
+            'kind': self.kind,
+            'line': self.line,
+            'message': self.message,
+            'where': self.where,
+            'warning': self.warning,
+        }
+
+    def __str__(self):
+        if self.kind == 'runtime':
+            return f'[RuntimeError at line {self.line}] {self.message}'
+        if self.kind == 'internal':
+            return f'[InternalError] {self.message}'
+        level = 'Warning' if self.warning else 'Error'
+        return f'[line {self.line}] {level}{self.where}: {self.message}'
+
+    def __repr__(self):
+        return f'<Diagnostic {self}>'
+
+
+class CompileError(Exception):
+    def __init__(self, errors: List[Diagnostic], warnings: List[Diagnostic]):
+        super().__init__('\n'.join(str(error) for error in errors))
+        self.errors = errors
+        self.warnings = warnings
+
+
+class _Resolution(object):
+    """What the resolver works out about a program, for any interpreter to install."""
+
+    def __init__(self):
+        self.locals = {}
+        self.captured = set()
+        self.pooled = set()
+
+    def resolve(self, expr, depth: int):
+        self.locals[expr] = depth
+
+    def capture(self, stmt):
+        self.captured.add(stmt)
+
+    def pool(self, declaration):
+        self.pooled.add(declaration)
+
+
+class _Diagnostics(object):
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+
+    def scanner_error(self, line, message):
+        self.errors.append(Diagnostic('scan', line, message))
+
+    def token_error(self, token, message, warning=False, after=False):
+        if token.type == TokenType.EOF:
+            where = ' at end'
+        elif after:
+            where = f' after \'{token.lexeme}\''
+        else:
+            where = f' at \'{token.lexeme}\''
+        diagnostic = Diagnostic('compile', token.line, message, where, warning)
+        (self.warnings if warning else self.errors).append(diagnostic)
+
+
+class RunResult(object):
+    def __init__(self, output, error: Diagnostic, globals):
+        self.output = output
+        self.error = error
+        self.globals = globals
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _lox_value(value):
+    if isinstance(value, LoxCallable) or not callable(value):
+        return value
+    arity = len(inspect.signature(value).parameters)
+    return LoxNative(getattr(value, '__name__', 'native'), arity, value)
+
+
+class Program(object):
+    """A scanned, parsed and resolved Lox program that can be run many times.
+
+    The syntax tree and the resolver's results are shared by every run and
+    never modified. Each run gets an interpreter of its own: with
+    reuse=True it comes from a pool kept by the program, so the resolution
+    is only installed once per interpreter and only the globals and the
+    scheduler of async calls are reset.
+    """
+
+    def __init__(self, statements, resolution: _Resolution, warnings: List[Diagnostic]):
+        self.statements = statements
+        self.resolution = resolution
+        self.warnings = warnings
+        self._idle = []
+
+    def run(self, globals=None, stdout=None, reuse=True, budget=None) -> RunResult:
+        """Run the program.
+
+        globals maps names to values defined before the program starts,
+        plain Python callables become natives. Output goes to the stdout
+        stream when given, else it is collected in RunResult.output. A
+        Budget limits the steps, time, call depth and memory of the run.
+        Errors come back in RunResult.error, a Python error the program
+        causes, such as running out of recursion, as an 'internal' one.
+        """
+        output = MemoryOutput() if stdout is None else StreamOutput(stdout)
+        errors = []
+
+        interpreter = self._acquire(reuse)
+        interpreter.error = lambda error: errors.append(Diagnostic('runtime', error.token.line, error.message))
+        interpreter.output = output
+        interpreter.budget = budget
+        try:
+            for name, value in (globals or {}).items():
+                interpreter.globals.define(name, _lox_value(value))
+            try:
+                interpreter.interpret(self.statements)
+            except RecursionError:
+                errors.append(Diagnostic('internal', 0, 'RecursionError: maximum recursion depth exceeded'))
+            except Exception as e:
+                # a bug in plox, reported like any error of the program
+                errors.append(Diagnostic('internal', 0, f'{e.__class__.__name__}: {e}'))
+            result = RunResult(output.getvalue() if stdout is None else None,
+                               errors[0] if errors else None,
+                               interpreter.globals.values)
+        finally:
+            if reuse:
+                interpreter.reset()
+                self._idle.append(interpreter)
+        return result
+
+    def _acquire(self, reuse):
+        if reuse:
+            try:
+                return self._idle.pop()
+            except IndexError:
+                pass
+        interpreter = Interpreter(None)
+        interpreter.install(self.resolution)
+        return interpreter
+
+
+def compile(source: str) -> Program:
+    """Scan, parse and resolve source, raising CompileError on any error."""
+    diagnostics = _Diagnostics()
+    statements = Parser(Scanner(source, diagnostics.scanner_error).scan_tokens(), diagnostics.token_error).parse()
+    if not diagnostics.errors:
+        resolution = _Resolution()
+        Resolver(diagnostics.token_error, resolution).resolve(statements)
+
+    if diagnostics.errors:
+        raise CompileError(diagnostics.errors, diagnostics.warnings)
+    return Program(statements, resolution, diagnostics.warnings)
@@ -1,6 +1,7 @@
+from __future__ import annotations
+
 from collections import deque
 from enum import Enum, auto
-from typing import List
 
 import plox.expr as Expr
 import plox.stmt as Stmt
@@ -66,10 +67,19 @@ class Resolver(Expr.ExprVisitor, Stmt.StmtVisitor):
         self.loop_scopes.push(LoopType.NONE)
         self.function_scopes = Scope()
         self.function_scopes.push(FunctionType.NONE)
+        # top-level code may await, it runs the event loop itself
+        self.async_scopes = Scope()
+        self.async_scopes.push(True)
         self.class_scopes = Scope()
         self.class_scopes.push(ClassType.NONE)
         self.return_scopes = Scope()
         self.return_scopes.push(None)
+        # index of the first scope that belongs to the current function
+        self.function_starts = Scope()
+        self.function_starts.push(0)
+        # functions whose frames a nested function or method closes over
+        self.enclosing_functions = []
+        self.escaping = set()
 
     def visit_block_stmt(self, stmt: Stmt.Block) -> object:
         self._begin_scope()
@@ -128,6 +138,28 @@ class Resolver(Expr.ExprVisitor, Stmt.StmtVisitor):
         self._define(stmt.name)
         return None
 
+    def visit_forrange_stmt(self, stmt: Stmt.ForRange) -> object:
+        self._resolve_expression(stmt.start)
+        self._resolve_expression(stmt.stop)
+        self._resolve_expression(stmt.step)
+
+        self._begin_scope()
+        self._declare(stmt.name)
+        self._define(stmt.name)
+        state = self.scopes.current()[stmt.name.lexeme]
+        state['accessed'] = True
+
+        self.loop_scopes.push(LoopType.FOR)
+        self.return_scopes.push(None)
+        self._resolve_statement(stmt.body)
+        self.return_scopes.pop()
+        self.loop_scopes.pop()
+
+        if state.get('captured'):
+            self.interpreter.capture(stmt)
+        self._end_scope()
+        return None
+
     def visit_function_stmt(self, stmt: Stmt.Function) -> object:
         if not stmt.anonymous:
             self._declare(stmt.name)
@@ -187,6 +219,12 @@ class Resolver(Expr.ExprVisitor, Stmt.StmtVisitor):
         self._resolve_local(expr, expr.name)
         return None
 
+    def visit_await_expr(self, expr: Expr.Await) -> object:
+        if not self.async_scopes.current():
+            self.error(expr.keyword, "Cannot use 'await' outside an async function.")
+        self._resolve_expression(expr.value)
+        return None
+
     def visit_binary_expr(self, expr: Expr.Binary) -> object:
         self._resolve_expression(expr.left)
         self._resolve_expression(expr.right)
@@ -224,6 +262,12 @@ class Resolver(Expr.ExprVisitor, Stmt.StmtVisitor):
         self._resolve_expression(expr.index)
         return None
 
+    def visit_subscriptset_expr(self, expr: Expr.SubscriptSet) -> object:
+        self._resolve_expression(expr.value)
+        self._resolve_expression(expr.objct)
+        self._resolve_expression(expr.index)
+        return None
+
     def visit_super_expr(self, expr: Expr.Super) -> object:
         if self.class_scopes.current() == ClassType.NONE:
             self.error(expr.keyword, "Cannot use 'super' outside of a class.")
@@ -251,7 +295,7 @@ class Resolver(Expr.ExprVisitor, Stmt.StmtVisitor):
         self._resolve_expression(expr.right)
         return None
 
-    def _resolve_statements(self, statements: List[Stmt.Stmt]):
+    def _resolve_statements(self, statements: list[Stmt.Stmt]):
         unreachable_warning = False
         for stmt in statements:
             ret_scp = self.return_scopes[-1]
@@ -271,10 +315,19 @@ class Resolver(Expr.ExprVisitor, Stmt.StmtVisitor):
             if name.lexeme in scope:
                 self.interpreter.resolve(expr, index)
                 self._mark_as_accessed(name, scope)
+                if len(self.scopes) - 1 - index < self.function_starts.current():
+                    scope[name.lexeme]['captured'] = True
                 return
 
     def _resolve_function(self, function: Stmt.Function, func_type: FunctionType):
+        if func_type == FunctionType.INITIALIZER and function.is_async:
+            self.error(function.name, "An initializer cannot be async.")
+
         self.function_scopes.push(func_type)
+        self.async_scopes.push(function.is_async)
+        self.function_starts.push(len(self.scopes))
+        self.escaping.update(self.enclosing_functions)
+        self.enclosing_functions.append(function)
         self._begin_scope()
         for param in function.params:
             self._declare(param)
@@ -284,6 +337,11 @@ class Resolver(Expr.ExprVisitor, Stmt.StmtVisitor):
         if func_type == FunctionType.GETTER and not self.return_scopes.current():
             self.error(function.name, f'Property getter without return statement.', warning=True)
         self._end_scope()
+        self.enclosing_functions.pop()
+        if function not in self.escaping:
+            self.interpreter.pool(function)
+        self.function_starts.pop()
+        self.async_scopes.pop()
         self.function_scopes.pop()
 
     def _begin_scope(self):
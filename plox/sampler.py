@@ -0,0 +1,114 @@
+import threading
+import weakref
+from collections import Counter
+
+from plox.hooks import CALL, LINE, RETURN, Hooks
+from plox.interpreter import Interpreter
+from plox.lox_class import LoxClass
+from plox.lox_function import LoxFunction
+from plox.lox_native import LoxNative
+from plox.profiler import SCRIPT
+
+DEFAULT_SAMPLE_RATE = 100
+
+
+def _function_name(function: LoxFunction):
+    name = function.declaration.name.lexeme
+    this = function.closure.values.get('this')
+    if this is not None:
+        name = f'{this.klass.name}.{name}'
+    return name
+
+
+def _frame_name(callee):
+    if isinstance(callee, LoxFunction):
+        return _function_name(callee)
+    if callee.__class__ is LoxNative:
+        return f'{callee.name} (native)'
+    if callee.__class__ is LoxClass:
+        return callee.name
+    return str(callee)
+
+
+class Sampler(object):
+    """Samples the Lox call stack of a running interpreter from a timer thread.
+
+    While it runs, the sampler keeps a shadow stack of the Lox program
+    through the call, return and line events of the interpreter's hooks:
+    one [name, line] entry per Lox call, with the line that frame is
+    executing. The timer thread only copies the stack of the code that is
+    running, the main program or the async call the scheduler is in, and
+    folds it into a 'script:line;caller:line;callee:line' string for
+    flame graphs. An async call is the root of a stack of its own.
+    """
+
+    def __init__(self, rate=DEFAULT_SAMPLE_RATE):
+        self.interval = 1.0 / rate
+        self.stacks = Counter()
+        self.samples = 0
+        self.interpreter = None
+        self._hooks = None
+        self._main = [[SCRIPT, None]]
+        self._async = weakref.WeakKeyDictionary()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        self._hooks = Hooks(interpreter)
+        self._hooks.add(CALL, self._on_call)
+        self._hooks.add(RETURN, self._on_return)
+        self._hooks.add(LINE, self._on_line)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='plox-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._hooks is not None:
+            self._hooks.clear()
+            self._hooks = None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def _stack(self):
+        current = self.interpreter.scheduler.current
+        if current is None:
+            return self._main
+        stack = self._async.get(current)
+        if stack is None:
+            # the coroutine runs the bound call of the async function
+            stack = self._async[current] = [[f'{_frame_name(current.function.__self__)} (async)', None]]
+        return stack
+
+    def _on_call(self, callee, arguments, line):
+        stack = self._stack()
+        stack[-1][1] = line
+        stack.append([_frame_name(callee), None])
+
+    def _on_return(self, callee, value, line):
+        self._stack().pop()
+
+    def _on_line(self, stmt, line):
+        self._stack()[-1][1] = line
+
+    def sample(self):
+        current = self.interpreter.scheduler.current
+        stack = self._main if current is None else self._async.get(current)
+        if stack is None:
+            return
+        # the entries change under the timer thread, copy them before folding
+        frames = [(name, line) for name, line in list(stack)]
+        self.stacks[';'.join(f'{name}:{line}' if line else name for name, line in frames)] += 1
+        self.samples += 1
+
+    def write_folded(self, path: str):
+        """Write one 'frame;frame;frame count' line per distinct stack, as flamegraph.pl expects."""
+        with open(path, 'w') as ff:
+            for stack, count in sorted(self.stacks.items()):
+                ff.write(f'{stack} {count}\n')
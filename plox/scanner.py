@@ -1,3 +1,4 @@
+from plox.lox_string import intern
 from plox.token import Token
 from plox.token_type import TokenType
 
@@ -25,6 +26,8 @@ TOKEN_TYPES = {
     '>': TokenType.GREATER,
     '>=': TokenType.GREATER_EQUAL,
     'and': TokenType.AND,
+    'async': TokenType.ASYNC,
+    'await': TokenType.AWAIT,
     'break': TokenType.BREAK,
     'class': TokenType.CLASS,
     'else': TokenType.ELSE,
@@ -101,9 +104,9 @@ class Scanner(object):
         while self._is_alpha_numeric(self._peek()):
             self._advance()
 
-        text = self.source[self.start:self.current]
+        text = intern(self.source[self.start:self.current])
         token_type = TOKEN_TYPES.get(text, TokenType.IDENTIFIER)
-        self._add_token(token_type)
+        self.tokens.append(Token(token_type, text, None, self.line))
 
     def _number(self):
         formatter = int
@@ -132,7 +135,7 @@ class Scanner(object):
 
         self._advance()  # the ending quote
 
-        value = self.source[self.start + 1: self.current - 1]
+        value = intern(self.source[self.start + 1: self.current - 1])
         self._add_token(TokenType.STRING, value)
 
     def _add_token(self, token_type, literal=None):
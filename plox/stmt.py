@@ -1,6 +1,6 @@
+from __future__ import annotations
 from plox.expr import Expr, Variable
 from plox.token import Token
-from typing import List
 
 
 class Stmt(object):
@@ -9,7 +9,7 @@ class Stmt(object):
 
 
 class Block(Stmt):
-	def __init__(self, statements: List[Stmt]):
+	def __init__(self, statements: list[Stmt]):
 		self.statements = statements
 
 	def accept(self, visitor):
@@ -25,19 +25,20 @@ class Break(Stmt):
 
 
 class Function(Stmt):
-	def __init__(self, name: Token, params: List[Token], body: List[Stmt], anonymous: bool, getter: bool):
+	def __init__(self, name: Token, params: list[Token], body: list[Stmt], anonymous: bool, getter: bool, is_async: bool):
 		self.name = name
 		self.params = params
 		self.body = body
 		self.anonymous = anonymous
 		self.getter = getter
+		self.is_async = is_async
 
 	def accept(self, visitor):
 		return visitor.visit_function_stmt(self)
 
 
 class Class(Stmt):
-	def __init__(self, name: Token, superclass: Variable, methods: List[Function]):
+	def __init__(self, name: Token, superclass: Variable, methods: list[Function]):
 		self.name = name
 		self.superclass = superclass
 		self.methods = methods
@@ -54,6 +55,19 @@ class Expression(Stmt):
 		return visitor.visit_expression_stmt(self)
 
 
+class ForRange(Stmt):
+	def __init__(self, name: Token, keyword: Token, start: Expr, stop: Expr, step: Expr, body: Stmt):
+		self.name = name
+		self.keyword = keyword
+		self.start = start
+		self.stop = stop
+		self.step = step
+		self.body = body
+
+	def accept(self, visitor):
+		return visitor.visit_forrange_stmt(self)
+
+
 class If(Stmt):
 	def __init__(self, condition: Expr, then_branch: Stmt, else_branch: Stmt):
 		self.condition = condition
@@ -91,7 +105,8 @@ class Var(Stmt):
 
 
 class While(Stmt):
-	def __init__(self, condition: Expr, body: Stmt):
+	def __init__(self, keyword: Token, condition: Expr, body: Stmt):
+		self.keyword = keyword
 		self.condition = condition
 		self.body = body
 
@@ -120,6 +135,10 @@ class StmtVisitor(object):
 		print("[visit_expression_stmt] Not implemented!")
 		return None
 
+	def visit_forrange_stmt(self, stmt: ForRange) -> object:
+		print("[visit_forrange_stmt] Not implemented!")
+		return None
+
 	def visit_if_stmt(self, stmt: If) -> object:
 		print("[visit_if_stmt] Not implemented!")
 		return None
@@ -40,6 +40,8 @@ class TokenType(Enum):
 
     # Keywords.
     AND = auto()
+    ASYNC = auto()
+    AWAIT = auto()
     BREAK = auto()
     CLASS = auto()
     ELSE = auto()
@@ -84,6 +86,7 @@ MULTIPLICATION_TOKENS = (
 )
 
 KEYWORD_TOKENS = (
+    TokenType.ASYNC,
     TokenType.BREAK,
     TokenType.CLASS,
     TokenType.FUN,
@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = 'test/benchmark/'
+TWIN_DIR = 'tool/'
+CLOX = 'cmake-build-debug/clox'
+CPYTHON = 'cpython'
+# clox loaded into this process, timed without starting a process
+CLOX_LIBRARY = 'clox-library'
+DEFAULT_THRESHOLD = 0.10
+
+# the startup benchmark is print 1;, its median on plox may not exceed this
+STARTUP = 'startup'
+DEFAULT_STARTUP_BUDGET = 0.100
+
+# how each engine runs a benchmark script
+ENGINES = {
+    'plox': lambda script: [sys.executable, '-m', 'plox', script],
+    'plox-adaptive': lambda script: [sys.executable, '-m', 'plox', '--adaptive', script],
+    'plox-memoize': lambda script: [sys.executable, '-m', 'plox', '--memoize', script],
+    'clox': lambda script: [CLOX, script],
+    # the Python twin of the benchmark, the yardstick for the ratios
+    CPYTHON: lambda script: [sys.executable, twin(script)],
+}
+ENGINE_NAMES = list(ENGINES) + [CLOX_LIBRARY]
+
+
+def twin(script):
+    return TWIN_DIR + os.path.basename(script)[:-4] + '.py'
+
+
+def red(text):
+    return color(text, 1)
+
+
+def color(text, value=0):
+    return '\u001b[38;5;%im%s\u001b[0m' % (value, text)
+
+
+def green(text):
+    return color(text, 2)
+
+
+def yellow(text):
+    return color(text, 226)
+
+
+def list_benchmarks(directory, names=None):
+    benchmarks = [item[:-4] for item in sorted(os.listdir(directory)) if item.endswith('.lox')]
+    if names:
+        unknown = set(names) - set(benchmarks)
+        if unknown:
+            raise SystemExit(f'Unknown benchmark(s): {", ".join(sorted(unknown))}')
+        benchmarks = [name for name in benchmarks if name in names]
+    return benchmarks
+
+
+def available_engines(names):
+    engines = []
+    for name in names:
+        if name == 'clox' and not os.access(CLOX, os.X_OK):
+            print(yellow(f'Skipping clox, {CLOX} has not been built'))
+            continue
+        if name == CLOX_LIBRARY:
+            from plox.clox import available, library_path
+            if not available():
+                print(yellow(f'Skipping {CLOX_LIBRARY}, {library_path()} has not been built'))
+                continue
+        engines.append(name)
+    return engines
+
+
+def time_run(command, timeout):
+    """Wall time of one run of command, process start up included."""
+    start = time.perf_counter()
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        output = result.stdout.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(f'exit code {result.returncode}: {output[-1] if output else ""}')
+    return elapsed
+
+
+def time_library_run(vm, source):
+    """Wall time of one run of source on the clox library, the timeout is not enforced."""
+    start = time.perf_counter()
+    result = vm.run(source)
+    elapsed = time.perf_counter() - start
+    if not result.ok:
+        output = result.output.strip().splitlines()
+        raise RuntimeError(f'exit code {result.exit_code}: {output[-1] if output else ""}')
+    return elapsed
+
+
+def summarize(times):
+    if len(times) > 1:
+        q1, _, q3 = statistics.quantiles(times, n=4, method='inclusive')
+    else:
+        q1 = q3 = times[0]
+    return {
+        'times': times,
+        'median': statistics.median(times),
+        'iqr': q3 - q1,
+        'min': min(times),
+        'max': max(times),
+    }
+
+
+def run_benchmark(script, engine, warmup, repeat, timeout):
+    if engine == CLOX_LIBRARY:
+        from plox.clox import Clox
+        vm = Clox()
+        with open(script, 'r') as lf:
+            source = lf.read()
+        run = lambda: time_library_run(vm, source)
+    else:
+        command = ENGINES[engine](script)
+        run = lambda: time_run(command, timeout)
+    try:
+        for _ in range(warmup):
+            run()
+        times = [run() for _ in range(repeat)]
+    except subprocess.TimeoutExpired:
+        return {'error': f'timed out after {timeout:g} s'}
+    except RuntimeError as e:
+        return {'error': str(e)}
+    return summarize(times)
+
+
+def run_benchmarks(directory, benchmarks, engines, warmup, repeat, timeout):
+    results = {}
+    for benchmark in benchmarks:
+        script = f'{directory}{benchmark}.lox'
+        results[benchmark] = {}
+        for engine in engines:
+            if engine == CPYTHON and not os.path.exists(twin(script)):
+                print(yellow(f'Skipping: {benchmark} on {engine}, {twin(script)} does not exist'))
+                continue
+            print(f'Running: {benchmark} on {engine} ... ', end='', flush=True)
+            result = run_benchmark(script, engine, warmup, repeat, timeout)
+            results[benchmark][engine] = result
+            if 'error' in result:
+                print(red(result['error']))
+            else:
+                print(f'median {result["median"]:.3f} s, iqr {result["iqr"]:.3f} s')
+    return results
+
+
+def metadata(warmup, repeat):
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'warmup': warmup,
+        'repeat': repeat,
+    }
+
+
+def print_table(results, engines):
+    width = max([len(benchmark) for benchmark in results] + [9])
+    print(f'{"benchmark":<{width}}  {"engine":<14}{"median":>9}{"iqr":>9}{"min":>9}{"max":>9}')
+    for benchmark, by_engine in results.items():
+        for engine in engines:
+            result = by_engine.get(engine)
+            if result is None:
+                continue
+            if 'error' in result:
+                print(f'{benchmark:<{width}}  {engine:<14}  {result["error"]}')
+                continue
+            print(f'{benchmark:<{width}}  {engine:<14}{result["median"]:>9.3f}{result["iqr"]:>9.3f}'
+                  f'{result["min"]:>9.3f}{result["max"]:>9.3f}')
+
+
+def overhead_ratios(results):
+    """Median of every engine divided by the median of the CPython twin of the benchmark.
+
+    Absolute times depend on the machine, how much slower than the same
+    program in CPython an interpreter is mostly does not.
+    """
+    ratios = {}
+    for benchmark, by_engine in results.items():
+        reference = by_engine.get(CPYTHON)
+        if reference is None or 'error' in reference:
+            continue
+        ratios[benchmark] = {engine: result['median'] / reference['median']
+                             for engine, result in by_engine.items()
+                             if engine != CPYTHON and 'error' not in result}
+    return ratios
+
+
+def print_ratios(ratios, engines):
+    engines = [engine for engine in engines if engine != CPYTHON]
+    width = max([len(benchmark) for benchmark in ratios] + [9])
+    print(f'{"benchmark":<{width}}  ' + ''.join(f'{engine + "/" + CPYTHON:>24}' for engine in engines))
+    for benchmark, by_engine in ratios.items():
+        cells = [f'{by_engine[engine]:>23.1f}x' if engine in by_engine else f'{"-":>24}' for engine in engines]
+        print(f'{benchmark:<{width}}  ' + ''.join(cells))
+
+
+def medians(results):
+    return {benchmark: {engine: result['median'] for engine, result in by_engine.items() if 'error' not in result}
+            for benchmark, by_engine in results.items()}
+
+
+def compare(current, baseline, threshold, unit=' s'):
+    """Return the (benchmark, engine, before, now) that grew by more than threshold.
+
+    Both arguments map a benchmark to the number measured per engine.
+    """
+    regressions = []
+    for benchmark, by_engine in current.items():
+        for engine, now in by_engine.items():
+            before = baseline.get(benchmark, {}).get(engine)
+            if before is None:
+                continue
+            change = now / before - 1
+            if change > threshold:
+                regressions.append((benchmark, engine, before, now))
+                print(red(f'Regression: {benchmark} on {engine} {before:.3f}{unit} -> {now:.3f}{unit} ({change:+.1%})'))
+            elif change < -threshold:
+                print(green(f'Improvement: {benchmark} on {engine} {before:.3f}{unit} -> {now:.3f}{unit} '
+                            f'({change:+.1%})'))
+    return regressions
+
+
+def over_budget(results, budget):
+    """The plox engines whose median time to run the startup benchmark exceeds budget."""
+    failures = []
+    for engine, result in results.get(STARTUP, {}).items():
+        if not engine.startswith('plox') or 'error' in result:
+            continue
+        if result['median'] > budget:
+            failures.append(engine)
+            print(red(f'Startup budget exceeded: {engine} took {result["median"] * 1000:.1f} ms '
+                      f'to run {STARTUP}, the budget is {budget * 1000:.0f} ms'))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the Lox benchmarks on plox and clox.')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f'names of the benchmarks in {BENCHMARK_DIR} to run (default: all)')
+    parser.add_argument('--engine', action='append', choices=ENGINE_NAMES, dest='engines',
+                        help='engine to run the benchmarks on, can be repeated (default: all)')
+    parser.add_argument('--ratios', action='store_true',
+                        help=f'report each engine relative to the CPython twins in {TWIN_DIR}, '
+                             'and compare those ratios with --baseline instead of the times')
+    parser.add_argument('--warmup', type=int, default=1, metavar='N',
+                        help='untimed runs before the timed ones (default: 1)')
+    parser.add_argument('--repeat', type=int, default=5, metavar='N',
+                        help='timed runs per benchmark and engine (default: 5)')
+    parser.add_argument('--timeout', type=float, default=600, metavar='SECONDS',
+                        help='give up on a run after this long (default: 600)')
+    parser.add_argument('--json', metavar='FILE',
+                        help='write the results as JSON to FILE')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='compare against the JSON results in FILE, written by --json on the same machine, '
+                             'and fail on regressions (default: no regression check)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, metavar='FRACTION',
+                        help=f'slow down of the median counted as a regression (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--startup-budget', type=float, default=DEFAULT_STARTUP_BUDGET, metavar='SECONDS',
+                        help=f'fail when plox takes longer to run the {STARTUP} benchmark '
+                             f'(default: {DEFAULT_STARTUP_BUDGET:g})')
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+    if args.baseline and not os.path.isfile(args.baseline):
+        # found out before the benchmarks ran, not after
+        parser.error(f'--baseline {args.baseline} does not exist, write one with --json FILE')
+
+    benchmarks = list_benchmarks(BENCHMARK_DIR, args.benchmarks)
+    engines = args.engines or list(ENGINE_NAMES)
+    if args.ratios and CPYTHON not in engines:
+        engines.append(CPYTHON)
+    engines = available_engines(engines)
+    results = run_benchmarks(BENCHMARK_DIR, benchmarks, engines, args.warmup, args.repeat, args.timeout)
+    print('')
+    print_table(results, engines)
+
+    ratios = overhead_ratios(results)
+    if args.ratios:
+        print('')
+        print_ratios(ratios, engines)
+
+    if args.json:
+        with open(args.json, 'w') as jf:
+            json.dump({'meta': metadata(args.warmup, args.repeat), 'results': results, 'ratios': ratios},
+                      jf, indent=2)
+
+    failed = over_budget(results, args.startup_budget)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as bf:
+            baseline = json.load(bf)
+        print('')
+        if args.ratios:
+            regressions = compare(ratios, baseline.get('ratios', {}), args.threshold, unit='x')
+        else:
+            regressions = compare(medians(results), medians(baseline['results']), args.threshold)
+        print(f'{len(regressions)} regression(s) above {args.threshold:.0%}')
+        failed.extend(regressions)
+    else:
+        # the numbers depend on the machine, so the repository has no baseline of its own
+        print('')
+        print(yellow('Skipping the regression check, no --baseline given (write one with --json FILE)'))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,16 @@
+import argparse
+import glob
+import hashlib
+import json
 import os
 import io
 import subprocess
 import sys
-from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, redirect_stdout
 
+import plox.clox as clox
 import plox.lox as lox
 
 
@@ -50,8 +57,27 @@ def run_plox_test(interpreter, test_file):
     return output
 
 
+CLOX = 'cmake-build-debug/clox'
+CACHE_FILE = '.test_cache.json'
+
+# run clox in the test process through its shared library when it is built,
+# every worker process is told by _init_worker
+clox_in_process = clox.available()
+_clox_vm = None
+
+
+def _init_worker(in_process):
+    global clox_in_process
+    clox_in_process = in_process
+
+
 def run_clox_test(interpreter, test_file):
-    result = subprocess.run(['cmake-build-debug/clox', test_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    global _clox_vm
+    if clox_in_process:
+        if _clox_vm is None:
+            _clox_vm = clox.Clox()
+        return _clox_vm.run_file(test_file).output
+    result = subprocess.run([CLOX, test_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     return result.stdout.decode('utf-8')
 
 
@@ -61,13 +87,12 @@ def compare_to_expected(result, expected_file):
         return test_output == result, test_output
 
 
-def run_test(test_file, directory, fail_hard=False):
-    print(f'Running: {test_file[len(directory):-4]} ... ', end='')
+def check_test(test_file):
+    """Run a test on plox and clox, return (passed, failure report, plox output, clox output)."""
     interpreter = lox.Lox()
 
     if not os.path.exists(test_file + '.out'):
-        print(red(f'missing test output!'))
-        return False
+        return False, '', None, None
 
     output = run_plox_test(interpreter, test_file)
     plox_state, plox_expct = compare_to_expected(output, test_file + '.out')
@@ -78,100 +103,208 @@ def run_test(test_file, directory, fail_hard=False):
     else:
         clox_state, clox_expct = compare_to_expected(c_output, test_file + '.out')
 
-    if plox_state and clox_state:
-        print(green(f'success!'))
-        return True
-
-    if not plox_state or not clox_state:
-        print(red(f'failed!'))
-
+    report = []
     if not plox_state:
-        print('plox:')
-        print(output)
-        print('---')
-        print('Expected:')
-        print(plox_expct)
-        print('---')
+        report.extend(['plox:', output, '---', 'Expected:', plox_expct, '---'])
 
     if not clox_state:
-        print('clox:')
-        print(c_output)
-        print('---')
-        print('Expected:')
-        print(clox_expct)
-        print('---')
-
-        # hex_output = [hex(ord(x))[2:] for x in output]
-        # hex_c_output = [hex(ord(x))[2:] for x in c_output]
-        #
-        # for i, (a, b) in enumerate(zip(hex_output, hex_c_output)):
-        #     if a != b:
-        #         print(i, a, b)
-        #
-        # print(':'.join(hex_output))
-        # print(':'.join(hex_c_output))
-
-    if fail_hard:
-        test_output_file = test_file + '.out'
-        dump_output(test_output_file + '.pdump', output)
-        dump_output(test_output_file + '.cdump', c_output)
-    return False
-
-
-def run_tests(directory, fail_hard=True, exclude=None):
-    print(f'Running tests in {directory}')
+        report.extend(['clox:', c_output, '---', 'Expected:', clox_expct, '---'])
+
+    return plox_state and clox_state, '\n'.join(report), output, c_output
 
+
+def collect_tests(directory, exclude):
+    """The tests below directory in reporting order, the files of a directory before its subdirectories."""
     if directory in exclude:
-        print('Skipping...\n')
-        return 0, 0, []
+        return []
+
+    dirs, files = list_directory(directory)
+    tests = [f for f in files if f.endswith('.lox') and f not in exclude]
+    for d in dirs:
+        tests.extend(collect_tests(d, exclude))
+    return tests
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def interpreter_digest():
+    """Hash of everything that decides how the tests run: the plox sources and the clox builds."""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob('plox/*.py')) + [CLOX, clox.library_path()]:
+        digest.update(path.encode())
+        digest.update(file_digest(path).encode() if os.path.exists(path) else b'missing')
+    return digest.hexdigest()
+
+
+def test_key(test_file, interpreter_key):
+    digest = hashlib.sha256(interpreter_key.encode())
+    for path in (test_file, test_file + '.out', test_file + '.cout'):
+        digest.update(file_digest(path).encode() if os.path.exists(path) else b'missing')
+    return digest.hexdigest()
+
+
+def load_cache():
+    try:
+        with open(CACHE_FILE, 'r') as cf:
+            return json.load(cf)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    with open(CACHE_FILE, 'w') as cf:
+        json.dump(cache, cf, indent=0, sort_keys=True)
+
+
+def changed_tests(tests):
+    """The tests whose source or expected output differs from what git has committed."""
+    result = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=all', '--', 'test/'],
+                            stdout=subprocess.PIPE, check=True)
+    changed = set()
+    for line in result.stdout.decode('utf-8').splitlines():
+        path = line[3:].split(' -> ')[-1]
+        for suffix in ('.out', '.cout'):
+            if path.endswith('.lox' + suffix):
+                path = path[:-len(suffix)]
+        changed.add(path)
+    return [test for test in tests if test in changed]
+
+
+def run_tests(tests, jobs=1, cache=None, dump=False):
+    """Run tests on a pool of jobs workers and report them in order.
+
+    A test whose key is in cache passed before with the same source,
+    expected output and interpreters and is not run again. Passing tests
+    are added to the cache.
+    """
+    interpreter_key = interpreter_digest()
+    keys = {test: test_key(test, interpreter_key) for test in tests}
+    pending = [test for test in tests if cache is None or cache.get(test) != keys[test]]
 
     success_count = 0
     fail_count = 0
+    cached_count = 0
     failed_tests = []
-    dirs, files = list_directory(directory)
+    with ExitStack() as stack:
+        results = _check_tests(stack, pending, jobs, clox_in_process)
+        checked = 0
+
+        current_directory = None
+        for test_file in tests:
+            directory = os.path.dirname(test_file) + '/'
+            if directory != current_directory:
+                if current_directory is not None:
+                    print('')
+                print(f'Running tests in {directory}')
+                current_directory = directory
+            print(f'Running: {test_file[len(directory):-4]} ... ', end='')
+
+            if test_file not in pending:
+                print(green('success!') + ' (cached)')
+                success_count += 1
+                cached_count += 1
+                continue
+
+            try:
+                passed, report, output, c_output = next(results)
+            except BrokenProcessPool:
+                # clox took a worker down with it, which of the tests it ran did is unknown
+                print(yellow('a worker process died, running the remaining tests with clox processes'))
+                print(f'Running: {test_file[len(directory):-4]} ... ', end='')
+                results = _check_tests(stack, pending[checked:], jobs, False)
+                passed, report, output, c_output = next(results)
+            checked += 1
+            if passed:
+                print(green('success!'))
+                success_count += 1
+                if cache is not None:
+                    cache[test_file] = keys[test_file]
+                continue
+
+            fail_count += 1
+            failed_tests.append(test_file)
+            if cache is not None:
+                cache.pop(test_file, None)
+            if output is None:
+                print(red('missing test output!'))
+                continue
+            print(red('failed!'))
+            print(report)
+
+            if dump:
+                test_output_file = test_file + '.out'
+                dump_output(test_output_file + '.pdump', output)
+                dump_output(test_output_file + '.cdump', c_output)
 
-    for f in files:
-        if f in exclude:
-            print(f'Skipped: {f[len(directory):-4]}')
-            continue
+    print('')
+    return success_count, fail_count, cached_count, failed_tests
 
-        if f.endswith('.lox'):
-            test_succeeded = run_test(f, directory, fail_hard)
-            if test_succeeded:
-                success_count += 1
-            else:
-                fail_count += 1
-                failed_tests.append(f)
 
-            if not test_succeeded and fail_hard:
-                return success_count, fail_count, failed_tests
+def _check_tests(stack, tests, jobs, in_process):
+    """The results of check_test for tests in order, run on jobs workers entered into stack."""
+    if jobs > 1 and len(tests) > 1:
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                                           initargs=(in_process,)))
+    else:
+        _init_worker(in_process)
+        executor = _InProcess()
+    chunksize = max(1, len(tests) // (jobs * 4))
+    return executor.map(check_test, tests, chunksize=chunksize)
 
-    print('')
-    for d in dirs:
-        s, f, failed = run_tests(d, fail_hard, exclude)
-        success_count += s
-        fail_count += f
-        failed_tests.extend(failed)
-        if len(failed) > 0 and fail_hard:
-            break
 
-    return success_count, fail_count, failed_tests
+class _InProcess(object):
+    """Stands in for the worker pool when there is nothing to run in parallel."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @staticmethod
+    def map(function, items, chunksize=1):
+        return map(function, items)
 
 
 if __name__ == '__main__':
-    test_path = 'test/'
-    if len(sys.argv) > 2:
-        print('Usage: run_tests [directory]')
-        sys.exit(13)
-    elif len(sys.argv) == 2:
-        test_path = sys.argv[1]
-        if not test_path.endswith('/'):
-            test_path += '/'
+    parser = argparse.ArgumentParser(description='Run the Lox tests on plox and clox.')
+    parser.add_argument('directory', nargs='?', default='test/')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, metavar='N',
+                        help='number of worker processes (default: one per cpu)')
+    parser.add_argument('--changed', action='store_true',
+                        help='only run the tests that git reports as changed or new')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'run every test, even those {CACHE_FILE} records as passing unchanged')
+    parser.add_argument('--dump', action='store_true',
+                        help='write the plox and clox output of failed tests next to them')
+    parser.add_argument('--spawn-clox', action='store_true',
+                        help=f'run every clox test as a {CLOX} process, even when the clox library is built. '
+                             'A clox that crashes in a worker is rerun this way, but with a single job it '
+                             'takes the whole run down')
+    args = parser.parse_args()
+    if args.spawn_clox:
+        clox_in_process = False
+
+    test_path = args.directory
+    if not test_path.endswith('/'):
+        test_path += '/'
 
     excludes = ['test/benchmark/']
-    success, failed, failed_tests = run_tests(test_path, fail_hard=False, exclude=excludes)
-    print(f'{success} test(s) succeeded and {failed} test(s) failed')
-
-    #print("Overview of failed test(s):")
-    #for test in failed_tests:
-    #    print(test)
+    tests = collect_tests(test_path, excludes)
+    if args.changed:
+        tests = changed_tests(tests)
+
+    cache = None if args.no_cache else load_cache()
+    success, failed, cached, failed_tests = run_tests(tests, max(1, args.jobs), cache, args.dump)
+    if cache is not None:
+        save_cache(cache)
+    print(f'{success} test(s) succeeded ({cached} cached) and {failed} test(s) failed')
+
+    if failed_tests:
+        print('Overview of failed test(s):')
+        for test in failed_tests:
+            print(test)
+        sys.exit(1)
@@ -0,0 +1,88 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from plox.adaptive import WARMUP
+from plox.hooks import CALL, Hooks
+from plox.lox import Lox, main
+
+# enough executions for any site to specialize
+WARM = WARMUP * 3
+
+
+def run(lox, source):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        lox.run(source)
+    return output.getvalue()
+
+
+class AdaptiveTest(unittest.TestCase):
+    def setUp(self):
+        self.lox = Lox(adaptive=True)
+        self.stats = self.lox.interpreter.stats
+
+    def test_number_add_deoptimizes_on_strings(self):
+        output = run(self.lox, f'fun add(a, b) {{ return a + b; }}\n'
+                               f'for (i in range({WARM})) add(i, 1);\n'
+                               f'print add(1, 2);\nprint add("a", "b");\nprint add(3, 4);')
+        self.assertEqual(output, '3\nab\n7\n')
+        self.assertEqual(self.stats.deopts['number +'], 1)
+
+    def test_swapped_call_target(self):
+        output = run(self.lox, f'fun one() {{ return 1; }}\nfun two() {{ return 2; }}\n'
+                               f'fun call(f) {{ return f(); }}\nvar total = 0;\n'
+                               f'for (i in range({WARM})) total = total + call(one);\n'
+                               f'print total + call(two);\nprint call(one);')
+        self.assertEqual(output, f'{WARM + 2}\n1\n')
+        self.assertEqual(self.stats.deopts['lox function'], 1)
+
+    def test_swapped_native_and_class(self):
+        output = run(self.lox, f'class A {{}}\nfun call(f) {{ return f(); }}\n'
+                               f'for (i in range({WARM})) call(A);\nprint call(clock) > 0;')
+        self.assertEqual(output, 'true\n')
+        self.assertEqual(self.stats.deopts['class'], 1)
+
+    def test_field_that_becomes_a_method(self):
+        output = run(self.lox, f'class A {{ init() {{ this.x = 1; }} }}\n'
+                               f'class B {{ x() {{ return 2; }} }}\n'
+                               f'fun get(o) {{ return o.x; }}\nvar a = A();\n'
+                               f'for (i in range({WARM})) get(a);\n'
+                               f'print get(B())();\nprint get(a);')
+        self.assertEqual(output, '2\n1\n')
+        self.assertEqual(self.stats.specializations['field'], 1)
+        self.assertEqual(self.stats.deopts['field'], 1)
+
+    def test_specialized_getter(self):
+        output = run(self.lox, f'class A {{ size {{ return 3; }} }}\nvar a = A();\nvar total = 0;\n'
+                               f'for (i in range({WARM})) total = total + a.size;\nprint total;')
+        self.assertEqual(output, f'{WARM * 3}\n')
+        self.assertEqual(self.stats.specializations['method'], 1)
+
+    def test_specialized_sites_report_calls(self):
+        calls = []
+        Hooks(self.lox.interpreter).add(CALL, lambda callee, arguments, line: calls.append(callee))
+        run(self.lox, f'fun f() {{ return 1; }}\nclass A {{ size {{ return 2; }} }}\nvar a = A();\n'
+                      f'for (i in range({WARM})) f() + a.size;')
+        self.assertEqual(self.stats.specializations['lox function'], 1)
+        self.assertEqual(len(calls), 1 + 2 * WARM)
+
+    def test_stats_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'script.lox')
+            with open(path, 'w') as lf:
+                lf.write(f'fun add(a, b) {{ return a + b; }}\n'
+                         f'for (i in range({WARM})) add(i, 1);\nadd("a", "b");')
+            errors = io.StringIO()
+            with redirect_stdout(io.StringIO()), redirect_stderr(errors):
+                main(['--adaptive-stats', path])
+        report = errors.getvalue().splitlines()
+        self.assertTrue(report[0].startswith('binary: '))
+        self.assertEqual(report[1].split(), ['number', '+', 'hits:', str(WARM - WARMUP), 'sites:', '1', 'deopts:', '1'])
+        self.assertTrue(any(line.startswith('call: ') for line in report))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import io
+import threading
+import unittest
+from contextlib import redirect_stdout
+
+from plox.lox import Lox
+
+TIMEOUT = 10
+
+
+def run_lines(lines):
+    """Run lines on one Lox, the output or None when a line hangs."""
+    lox = Lox()
+    output = io.StringIO()
+
+    def run():
+        with redirect_stdout(output):
+            for line in lines:
+                lox.run(line)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    return None if thread.is_alive() else output.getvalue()
+
+
+class AwaitAfterDrainTest(unittest.TestCase):
+    def test_await_after_drained_call(self):
+        output = run_lines(['async fun f() { return 1; } var t = f();', 'print await sleep(1);'])
+        self.assertEqual(output, 'nil\n')
+
+    def test_await_task_of_earlier_run(self):
+        output = run_lines(['async fun f() { return 1; } var t = f();', 'print await t;'])
+        self.assertEqual(output, '1\n')
+
+    def test_await_after_suspended_call(self):
+        output = run_lines([
+            'async fun f() { await sleep(1); return 2; } var t = f();',
+            'print await f();',
+            'print await t;',
+        ])
+        self.assertEqual(output, '2\n2\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
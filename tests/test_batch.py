@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from plox.batch import batch_exit_code, read_manifest, run_batch
+from plox.lox import main
+
+SCRIPTS = {
+    'one.lox': 'print 1;',
+    'two.lox': 'print 2;',
+    'compile_error.lox': 'print ;',
+    'runtime_error.lox': 'print 3;\nprint -"a";',
+}
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for name, source in SCRIPTS.items():
+            with open(self.path(name), 'w') as lf:
+                lf.write(source)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def run_main(self, argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            try:
+                main(argv)
+                exit_code = 0
+            except SystemExit as e:
+                exit_code = e.code
+        return exit_code, output.getvalue()
+
+    def test_results_in_order(self):
+        names = ['two.lox', 'one.lox'] * 4
+        for jobs in (1, 2):
+            results = run_batch([self.path(name) for name in names], jobs)
+            self.assertEqual([result.stdout for result in results], ['2\n', '1\n'] * 4)
+            self.assertEqual(batch_exit_code(results), 0)
+
+    def test_exit_codes(self):
+        results = run_batch([self.path(name) for name in ('one.lox', 'compile_error.lox', 'runtime_error.lox',
+                                                          'missing.lox')])
+        self.assertEqual([result.exit_code for result in results], [0, 65, 70, 66])
+        self.assertEqual(batch_exit_code(results), 70)
+        self.assertEqual(batch_exit_code(results[:2]), 65)
+        self.assertEqual(batch_exit_code([]), 0)
+
+    def test_python_error_fails_one_script(self):
+        with mock.patch('plox.batch.Lox.run', side_effect=[None, ValueError('broken'), None]):
+            results = run_batch([self.path('one.lox')] * 3)
+        self.assertEqual([result.exit_code for result in results], [0, 70, 0])
+        self.assertIn('Traceback', results[1].stdout)
+        self.assertTrue(results[1].stdout.endswith('ValueError: broken\n'))
+
+    def test_manifest(self):
+        with open(self.path('manifest.txt'), 'w') as mf:
+            mf.write('# smoke tests\none.lox\n\n  two.lox  \n')
+        self.assertEqual(read_manifest(self.path('manifest.txt')), [self.path('one.lox'), self.path('two.lox')])
+
+        exit_code, output = self.run_main(['--manifest', self.path('manifest.txt'), self.path('one.lox')])
+        self.assertEqual((exit_code, output), (0, '1\n1\n2\n'))
+
+    def test_json_summary(self):
+        exit_code, output = self.run_main(['--json', '-', '--jobs', '1', self.path('one.lox'),
+                                           self.path('runtime_error.lox')])
+        self.assertEqual(exit_code, 70)
+        summary = json.loads(output)
+        self.assertEqual((summary['jobs'], summary['scripts'], summary['failed'], summary['exit_code']),
+                         (1, 2, 1, 70))
+        self.assertEqual([(result['path'], result['exit_code']) for result in summary['results']],
+                         [(self.path('one.lox'), 0), (self.path('runtime_error.lox'), 70)])
+        self.assertEqual(summary['results'][0]['stdout'], '1\n')
+
+    def test_json_file(self):
+        exit_code, output = self.run_main(['--json', self.path('summary.json'), self.path('one.lox'),
+                                           self.path('two.lox')])
+        self.assertEqual((exit_code, output), (0, '1\n2\n'))
+        with open(self.path('summary.json')) as jf:
+            summary = json.load(jf)
+        self.assertEqual([result['stdout'] for result in summary['results']], ['1\n', '2\n'])
+
+
+if __name__ == '__main__':
+    unittest.main()
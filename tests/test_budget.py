@@ -0,0 +1,73 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from plox.budget import Budget
+from plox.lox import main, red
+from plox.program import compile
+
+LOOP = 'var i = 0;\nwhile (true) i = i + 1;'
+
+
+class BudgetTest(unittest.TestCase):
+    def run_script(self, source, *options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'script.lox')
+            with open(path, 'w') as lf:
+                lf.write(source)
+            output = io.StringIO()
+            with redirect_stdout(output):
+                try:
+                    main(list(options) + [path])
+                    exit_code = 0
+                except SystemExit as e:
+                    exit_code = e.code
+        return exit_code, output.getvalue()
+
+    def assert_exceeded(self, result, line, message):
+        self.assertEqual(result, (70, red(f'[RuntimeError at line {line}] {message}') + '\n'))
+
+    def test_steps(self):
+        self.assert_exceeded(self.run_script(LOOP, '--max-steps', '100'), 2, 'Step budget of 100 exceeded.')
+
+    def test_calls_are_steps(self):
+        result = self.run_script('fun f() {}\nfor (i in range(10)) f();', '--max-steps', '15')
+        self.assert_exceeded(result, 1, 'Step budget of 15 exceeded.')
+
+    def test_timeout(self):
+        self.assert_exceeded(self.run_script(LOOP, '--timeout', '0.05'), 2, 'Time budget of 0.05 s exceeded.')
+
+    def test_depth(self):
+        result = self.run_script('fun down(n) {\n  return down(n + 1);\n}\ndown(0);', '--max-depth', '50')
+        self.assert_exceeded(result, 1, 'Call depth budget of 50 exceeded.')
+
+    def test_depth_is_released_by_returns(self):
+        source = 'fun down(n) { if (n > 0) down(n - 1); }\nfor (i in range(100)) down(40);\nprint "done";'
+        self.assertEqual(self.run_script(source, '--max-depth', '50'), (0, 'done\n'))
+
+    def test_memory_of_instances(self):
+        result = self.run_script('class A {}\nwhile (true) A();', '--max-memory', '100000')
+        self.assert_exceeded(result, 2, 'Memory budget of 100000 bytes exceeded.')
+
+    def test_memory_of_strings(self):
+        result = self.run_script('var s = "a";\nwhile (true) s = s + "a";', '--max-memory', '100000')
+        self.assert_exceeded(result, 2, 'Memory budget of 100000 bytes exceeded.')
+
+    def test_within_budget(self):
+        result = self.run_script('var i = 0;\nwhile (i < 10) i = i + 1;\nprint i;',
+                                 '--max-steps', '100', '--timeout', '10', '--max-depth', '5', '--max-memory', '1000')
+        self.assertEqual(result, (0, '10\n'))
+
+    def test_budget_restarts_every_run(self):
+        program = compile('var i = 0; while (i < 50) i = i + 1;')
+        budget = Budget(steps=100)
+        for _ in range(3):
+            self.assertTrue(program.run(budget=budget).ok)
+        result = compile(LOOP).run(budget=budget)
+        self.assertEqual((result.error.line, result.error.message), (2, 'Step budget of 100 exceeded.'))
+
+
+if __name__ == '__main__':
+    unittest.main()
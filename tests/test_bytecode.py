@@ -0,0 +1,132 @@
+import io
+import struct
+import unittest
+from contextlib import redirect_stdout
+
+from plox import clox
+from plox.bytecode import MAGIC, VERSION, BytecodeCompiler, OpCode, dumps, is_bytecode
+from plox.lox import Lox
+
+
+def compile_script(source):
+    """The script function of source and what compiling it printed."""
+    lox = Lox()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        statements = lox.compile(source)
+        script = BytecodeCompiler(lox.token_error).compile(statements)
+    return script, output.getvalue()
+
+
+class BytecodeCompilerTest(unittest.TestCase):
+    def test_print_constant(self):
+        script, _ = compile_script('print 1;')
+        self.assertEqual(list(script.chunk.code),
+                         [OpCode.CONSTANT, 0, OpCode.PRINT, OpCode.NIL, OpCode.RETURN])
+        self.assertEqual(script.chunk.constants, [1.0])
+
+    def test_equal_constants_share_a_slot(self):
+        script, _ = compile_script('print "a"; print "a"; print 2; print 2.0;')
+        self.assertEqual(script.chunk.constants, ['a', 2.0])
+
+    def test_unsupported_features_are_errors(self):
+        for source in ('for (i in range(3)) print i;', 'var a = Array(1); a[0] = 1;',
+                       'class A { g { return 1; } }', 'async fun f() {}'):
+            script, output = compile_script(source)
+            self.assertIsNone(script, source)
+            self.assertIn('cannot be compiled to clox bytecode', output)
+
+    def test_file_header(self):
+        script, _ = compile_script('print 1;')
+        data = dumps(script)
+        self.assertTrue(is_bytecode(data))
+        self.assertEqual(data[:6], MAGIC + struct.pack('<H', VERSION))
+
+
+@unittest.skipUnless(clox.available(), f'{clox.library_path()} has not been built')
+class BytecodeRoundTripTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.vm = clox.Clox()
+
+    def run_script(self, script):
+        return self.vm.run_bytecode(dumps(script))
+
+    def test_round_trip(self):
+        source = '''
+class A {
+  init(n) { this.n = n; }
+  get() { return this.n; }
+}
+class B < A {
+  get() { return super.get() * 2; }
+}
+fun counter() {
+  var i = 0;
+  fun next() { i = i + 1; return i; }
+  return next;
+}
+var c = counter();
+c();
+print c();
+print B(21).get();
+for (var i = 0; i < 10; i = i + 1) {
+  if (i == 3) break;
+  print i;
+}
+'''
+        script, _ = compile_script(source)
+        result = self.run_script(script)
+        self.assertEqual((result.output, result.exit_code), ('2\n42\n0\n1\n2\n', 0))
+
+    def test_runtime_error_line(self):
+        script, _ = compile_script('print 1;\nprint -"a";')
+        result = self.run_script(script)
+        self.assertEqual(result.exit_code, 70)
+        self.assertIn('[RuntimeError at line 2] Operand must be a number.', result.output)
+
+    def assertRejected(self, data, message):
+        result = self.vm.run_bytecode(data)
+        self.assertEqual(result.exit_code, 65)
+        self.assertIn(message, result.output)
+
+    def test_rejects_bad_constant(self):
+        script, _ = compile_script('print 1;')
+        script.chunk.code[1] = 200
+        self.assertRejected(dumps(script), 'bad constant 200')
+
+    def test_rejects_bad_jump(self):
+        script, _ = compile_script('if (true) print 1;')
+        code = script.chunk.code
+        jump = code.index(OpCode.JUMP_IF_FALSE)
+        code[jump + 1:jump + 3] = b'\x10\x00'
+        self.assertRejected(dumps(script), 'continues outside the code')
+
+    def test_rejects_bad_local(self):
+        script, _ = compile_script('{ var a = 1; print a; }')
+        code = script.chunk.code
+        code[code.index(OpCode.GET_LOCAL) + 1] = 9
+        self.assertRejected(dumps(script), 'bad local slot 9')
+
+    def test_rejects_stack_underflow(self):
+        script, _ = compile_script('print 1;')
+        script.chunk.code[:2] = bytes([OpCode.NIL, OpCode.POP])
+        self.assertRejected(dumps(script), 'stack underflow')
+
+    def test_rejects_unknown_instruction(self):
+        script, _ = compile_script('print 1;')
+        script.chunk.code[2] = 250
+        self.assertRejected(dumps(script), 'unknown instruction 250')
+
+    def test_rejects_other_version(self):
+        script, _ = compile_script('print 1;')
+        data = dumps(script)
+        self.assertRejected(MAGIC + struct.pack('<H', VERSION + 1) + data[6:], 'is not supported')
+
+    def test_rejects_truncated_file(self):
+        script, _ = compile_script('print 1;')
+        self.assertRejected(dumps(script)[:-3], 'truncated')
+
+
+if __name__ == '__main__':
+    unittest.main()
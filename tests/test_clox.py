@@ -0,0 +1,52 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from plox import clox
+from plox.lox import Lox
+
+
+def run(lox, source):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        lox.run(source)
+    return output.getvalue()
+
+
+class EngineTest(unittest.TestCase):
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            Lox(engine='jvm')
+
+
+@unittest.skipUnless(clox.available(), f'{clox.library_path()} has not been built')
+class CloxEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.lox = Lox(engine='clox')
+
+    def test_output(self):
+        self.assertEqual(run(self.lox, 'var a = 1; print a + 2;'), '3\n')
+        self.assertTrue(self.lox.clox_result.ok)
+        self.assertFalse(self.lox.had_error or self.lox.had_runtime_error)
+
+    def test_runs_do_not_share_globals(self):
+        run(self.lox, 'var a = 1;')
+        self.assertIn("Undefined variable 'a'.", run(self.lox, 'print a;'))
+        self.assertTrue(self.lox.had_runtime_error)
+
+    def test_compile_error(self):
+        self.assertIn('Expect expression.', run(self.lox, 'print ;'))
+        self.assertEqual(self.lox.clox_result.exit_code, 65)
+        self.assertTrue(self.lox.had_error)
+        self.assertFalse(self.lox.had_runtime_error)
+
+    def test_runtime_error(self):
+        output = run(self.lox, 'print 1;\nprint -"a";')
+        self.assertIn('1\n', output)
+        self.assertIn('[RuntimeError at line 2] Operand must be a number.', output)
+        self.assertEqual(self.lox.clox_result.exit_code, 70)
+        self.assertFalse(self.lox.had_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
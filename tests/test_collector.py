@@ -0,0 +1,114 @@
+import gc
+import io
+import os
+import re
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+from plox.collector import Collector, parse_thresholds
+from plox.lox import main, run_file
+
+
+class ThresholdsTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_thresholds('700'), (700,))
+        self.assertEqual(parse_thresholds('5000,20'), (5000, 20))
+        self.assertEqual(parse_thresholds('0,10,10'), (0, 10, 10))
+
+    def test_invalid(self):
+        for text in ('', 'a', '1,2,3,4', '-1', '700,,10', '1.5'):
+            with self.assertRaises(ValueError, msg=text):
+                parse_thresholds(text)
+
+
+class CollectorTest(unittest.TestCase):
+    def setUp(self):
+        self.thresholds = gc.get_threshold()
+        self.callbacks = list(gc.callbacks)
+
+    def test_start_and_stop(self):
+        collector = Collector((5000, 20))
+        collector.start()
+        try:
+            self.assertEqual(gc.get_threshold(), (5000, 20, self.thresholds[2]))
+            gc.collect()
+        finally:
+            collector.stop()
+        self.assertEqual(gc.get_threshold(), self.thresholds)
+        self.assertEqual(gc.callbacks, self.callbacks)
+        self.assertEqual(collector.collections[2], 1)
+        self.assertEqual(collector.active, (5000, 20, self.thresholds[2]))
+
+    def test_freeze_is_opt_in(self):
+        collector = Collector()
+        collector.start()
+        collector.compiled()
+        self.assertEqual(gc.get_freeze_count(), 0)
+        collector.stop()
+
+        collector = Collector(freeze=True)
+        collector.start()
+        collector.compiled()
+        self.assertGreater(gc.get_freeze_count(), 0)
+        collector.stop()
+        self.assertEqual(gc.get_freeze_count(), 0)
+        self.assertGreater(collector.frozen, 0)
+
+
+class CollectorOptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'script.lox')
+        with open(self.path, 'w') as lf:
+            lf.write('class A {}\nfor (i in range(1000)) { var a = A(); a.self = a; }\nprint "done";')
+
+    def run_main(self, *options):
+        errors = io.StringIO()
+        with redirect_stdout(io.StringIO()) as output, redirect_stderr(errors):
+            main(list(options) + [self.path])
+        self.assertEqual(output.getvalue(), 'done\n')
+        return errors.getvalue()
+
+    def test_run_file_leaves_gc_alone(self):
+        callbacks = list(gc.callbacks)
+        with mock.patch('plox.collector.gc.freeze') as freeze, redirect_stdout(io.StringIO()):
+            run_file(self.path)
+        freeze.assert_not_called()
+        self.assertEqual(gc.callbacks, callbacks)
+
+    def test_cli_freezes(self):
+        for options in ([], ['--gc-stats']):
+            with mock.patch('plox.collector.gc.freeze') as freeze:
+                self.run_main(*options)
+            freeze.assert_called_once_with()
+
+    def test_gc_stats(self):
+        thresholds = gc.get_threshold()
+        report = self.run_main('--gc-threshold', '100,5', '--gc-stats')
+        self.assertEqual(gc.get_threshold(), thresholds)
+        first, second = report.splitlines()
+        collections, young = re.match(r'gc: (\d+) collections \(generation 0: (\d+), 1: \d+, 2: \d+\), '
+                                      r'\d+ objects collected, 0 uncollectable$', first).groups()
+        # 1000 instances in cycles go past a threshold of 100
+        self.assertGreater(int(young), 0)
+        self.assertGreaterEqual(int(collections), int(young))
+        frozen, = re.match(rf'gc: [\d.]+ ms paused, longest pause [\d.]+ ms, '
+                           rf'thresholds 100,5,{thresholds[2]}, (\d+) objects frozen$', second).groups()
+        self.assertGreater(int(frozen), 0)
+
+    def test_no_gc_freeze(self):
+        report = self.run_main('--gc-stats', '--no-gc-freeze')
+        self.assertTrue(report.rstrip().endswith(', 0 objects frozen'))
+
+    def test_invalid_threshold(self):
+        with redirect_stdout(io.StringIO()) as output, self.assertRaises(SystemExit) as raised:
+            main(['--gc-threshold', '1,2,3,4', self.path])
+        self.assertEqual(raised.exception.code, 64)
+        self.assertIn('--gc-threshold expects one to three non-negative integers', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+from plox.heap import take_snapshot
+from plox.lox import Lox, main
+
+LIST = 'class Node { init(next) { this.next = next; } }\nvar head = nil;\nfor (i in range(100)) head = Node(head);\n'
+
+
+def run(lox, source):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        lox.run(source)
+    return output.getvalue()
+
+
+class HeapTest(unittest.TestCase):
+    def test_snapshot(self):
+        lox = Lox()
+        run(lox, LIST + 'var a = Array(2);\nvar m = Map();')
+        snapshot = take_snapshot(lox.interpreter)
+        self.assertEqual(snapshot.classes['Node'].count, 100)
+        self.assertEqual(snapshot.classes['Node'].fields, {1: 100})
+        self.assertEqual((snapshot.arrays, snapshot.maps), (1, 1))
+        self.assertIn('Node                       100', snapshot.report())
+
+    def test_heap_stats(self):
+        output = run(Lox(), LIST + 'var stats = heapStats();\n'
+                                   'print stats["instances"];\nprint stats["classes"]["Node"];')
+        self.assertEqual(output, '100\n100\n')
+
+    def test_heap_stats_only_walks_the_live_heap(self):
+        with mock.patch('plox.heap.gc.get_objects') as get_objects:
+            run(Lox(), 'print heapStats()["instances"];')
+        get_objects.assert_not_called()
+
+    def test_unreachable(self):
+        lox = Lox()
+        run(lox, 'class A {}\nvar a = A();')
+        other = Lox()
+        run(other, 'class B {}\nvar b = B();')
+        self.assertEqual(take_snapshot(lox.interpreter).unreachable['instances of B'], 1)
+        self.assertEqual(take_snapshot(lox.interpreter, unreachable=False).unreachable, {})
+
+    def test_diff(self):
+        lox = Lox()
+        run(lox, 'var keep = nil;')
+        before = take_snapshot(lox.interpreter)
+        run(lox, LIST)
+        rows = [line.split() for line in take_snapshot(lox.interpreter).diff(before).splitlines()]
+        self.assertEqual(rows[0], ['kind', 'count', 'bytes'])
+        self.assertEqual(rows[1][:4], ['instances', 'of', 'Node', '+100'])
+        self.assertEqual(rows[-1][0], 'total')
+
+    def test_heap_options(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'script.lox')
+            with open(path, 'w') as lf:
+                lf.write(LIST)
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()) as errors:
+                main(['--heap-report', '--heap-diff', path])
+        report, diff = errors.getvalue().split('\nkind                               count')
+        self.assertTrue(report.startswith('Lox heap: '))
+        self.assertIn('instances of Node                   +100', diff)
+
+
+if __name__ == '__main__':
+    unittest.main()
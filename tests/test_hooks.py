@@ -0,0 +1,110 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from plox.budget import Budget
+from plox.hooks import ALLOC, BACK_EDGE, CALL, ERROR, LINE, RETURN, Hooks
+from plox.lox import Lox
+
+PATCHED = ('_invoke', '_call_getter', '_execute', 'visit_while_stmt', 'visit_forrange_stmt')
+
+
+def run(lox, source):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        lox.run(source)
+    return output.getvalue()
+
+
+class HooksTest(unittest.TestCase):
+    def setUp(self):
+        self.lox = Lox()
+        self.hooks = Hooks(self.lox.interpreter)
+        self.events = []
+
+    def record(self, event):
+        def callback(*args):
+            self.events.append((event,) + args)
+        self.hooks.add(event, callback)
+        return callback
+
+    def test_call_and_return(self):
+        self.record(CALL)
+        self.record(RETURN)
+        run(self.lox, 'fun f(a) { return a + 1; }\nprint f(1);')
+        self.assertEqual([(event, args, line) for event, _, args, line in self.events],
+                         [(CALL, [1], 2), (RETURN, 2, 2)])
+
+    def test_return_on_runtime_error(self):
+        self.record(RETURN)
+        run(self.lox, 'fun f() { return -"a"; }\nf();')
+        self.assertEqual(self.events[0][2:], (None, 2))
+
+    def test_getter_calls(self):
+        self.record(CALL)
+        output = run(self.lox, 'class A { size { return 3; } }\nvar a = A();\nprint a.size;')
+        self.assertEqual(output, '3\n')
+        _, getter, arguments, line = self.events[-1]
+        self.assertEqual((getter.declaration.name.lexeme, arguments, line), ('size', [], 3))
+
+    def test_alloc(self):
+        self.record(ALLOC)
+        run(self.lox, 'class A {}\nvar a = A();')
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0][2], 2)
+
+    def test_line(self):
+        self.record(LINE)
+        run(self.lox, 'var a = 1;\nprint a;')
+        self.assertEqual([line for _, _, line in self.events], [1, 2])
+
+    def test_error(self):
+        self.record(ERROR)
+        run(self.lox, 'print -"a";')
+        self.assertEqual(self.events[0][1].message, "Unsupported operand type(s) for -: 'str'")
+
+    def test_back_edges(self):
+        self.record(BACK_EDGE)
+        output = run(self.lox, 'var i = 0;\nwhile (i < 3) i = i + 1;\nfor (j in range(3)) { if (j == 2) break; print j; }')
+        self.assertEqual(output, '0\n1\n')
+        self.assertEqual([(stmt.keyword.lexeme, line) for _, stmt, line in self.events],
+                         [('while', 2), ('while', 2), ('while', 2), ('range', 3), ('range', 3)])
+
+    def test_budget_still_steps(self):
+        self.lox.interpreter.budget = Budget(steps=100)
+        self.record(BACK_EDGE)
+        run(self.lox, 'var i = 0; while (i < 10) i = i + 1; for (j in range(10)) {}')
+        self.assertEqual(self.lox.interpreter.budget.steps, 21)
+
+    def test_remove_restores_plain_path(self):
+        interpreter = self.lox.interpreter
+        error = interpreter.error
+        callbacks = {event: self.record(event) for event in (CALL, RETURN, ALLOC, LINE, ERROR, BACK_EDGE)}
+        self.assertTrue(all(name in vars(interpreter) for name in PATCHED))
+
+        for event, callback in callbacks.items():
+            self.hooks.remove(event, callback)
+        self.assertFalse(any(name in vars(interpreter) for name in PATCHED))
+        self.assertIs(interpreter.error, error)
+
+        output = run(self.lox, 'class A { size { return 1; } }\nfun f() { return A().size; }\n'
+                               'var i = 0; while (i < 2) i = i + f();\nfor (j in range(2)) print j;\nprint -"a";')
+        self.assertTrue(output.startswith('0\n1\n'))
+        self.assertEqual(self.events, [])
+        self.assertTrue(self.lox.had_runtime_error)
+
+    def test_clear(self):
+        self.record(CALL)
+        self.record(ERROR)
+        self.hooks.clear()
+        self.assertFalse(any(name in vars(self.lox.interpreter) for name in PATCHED))
+        run(self.lox, 'fun f() {} f();')
+        self.assertEqual(self.events, [])
+
+    def test_unknown_event(self):
+        with self.assertRaises(ValueError):
+            self.hooks.add('jump', print)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from plox.lox import Lox
+from plox.lox_map import LoxMap
+from plox.lox_string import ROPE_MIN_LENGTH, Rope, concat, flatten
+from plox.scanner import Scanner
+
+LONG = 'a' * ROPE_MIN_LENGTH
+
+
+def rope(*parts):
+    result = parts[0]
+    for part in parts[1:]:
+        result = concat(result, part)
+    return result
+
+
+class RopeTest(unittest.TestCase):
+    def test_short_concatenation_is_flat(self):
+        self.assertIs(concat('ab', 'c').__class__, str)
+
+    def test_long_concatenation_is_a_rope(self):
+        value = rope(LONG, 'b', 'c')
+        self.assertIs(value.__class__, Rope)
+        self.assertEqual(len(value), ROPE_MIN_LENGTH + 2)
+        # the short pieces grow the tail instead of nesting
+        self.assertEqual(value.right, 'bc')
+
+    def test_flatten(self):
+        value = Rope(Rope(LONG, 'b'), Rope('c', LONG))
+        self.assertEqual(value.flatten(), LONG + 'bc' + LONG)
+        self.assertIs(value.flatten(), value.flatten())
+        self.assertIsNone(value.left)
+        self.assertEqual(str(value), LONG + 'bc' + LONG)
+        self.assertEqual(value[ROPE_MIN_LENGTH], 'b')
+
+    def test_flatten_deep_rope(self):
+        value = LONG
+        for _ in range(100000):
+            value = Rope(value, 'x')
+        self.assertEqual(flatten(value), LONG + 'x' * 100000)
+
+    def test_equality_with_flat_strings(self):
+        value = rope(LONG, 'b')
+        self.assertEqual(value, LONG + 'b')
+        self.assertEqual(LONG + 'b', value)
+        self.assertEqual(value, Rope(LONG[:10], LONG[10:] + 'b'))
+        self.assertNotEqual(value, LONG + 'c')
+        self.assertNotEqual(value, LONG)
+        self.assertNotEqual(value, 1)
+        self.assertLess(value, LONG + 'c')
+        self.assertGreater(value, LONG)
+
+    def test_hash_matches_flat_string(self):
+        value = rope(LONG, 'b')
+        self.assertEqual(hash(value), hash(LONG + 'b'))
+        self.assertEqual({LONG + 'b': 1}[value], 1)
+        self.assertEqual({value: 1}[LONG + 'b'], 1)
+
+    def test_map_key(self):
+        lox_map = LoxMap()
+        lox_map.set(rope(LONG, 'b'), 1)
+        self.assertEqual(lox_map.get(LONG + 'b'), 1)
+        lox_map.set(LONG + 'b', 2)
+        self.assertEqual(list(lox_map.entries.items()), [(LONG + 'b', 2)])
+        self.assertIs(next(iter(lox_map.entries)).__class__, str)
+
+    def test_map_key_in_lox(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            Lox().run(f'var m = Map();\nvar s = "";\n'
+                      f'for (i in range({ROPE_MIN_LENGTH})) s = s + "a";\n'
+                      f'm[s + "b"] = 1;\nprint m["{LONG}b"];\nprint has(m, "{LONG}" + "b");\n'
+                      f'print size(m);\nprint keys(m)[0] == s + "b";')
+        self.assertEqual(output.getvalue(), '1\ntrue\n1\ntrue\n')
+
+
+class InternTest(unittest.TestCase):
+    def test_literals_and_identifiers_are_interned(self):
+        tokens = Scanner('"some text" name "some text" name', print).scan_tokens()
+        self.assertIs(tokens[0].literal, tokens[2].literal)
+        self.assertIs(tokens[1].lexeme, tokens[3].lexeme)
+        self.assertIs(tokens[1].lexeme, 'name')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from plox.lox import Lox, main
+from plox.memoize import find_pure_functions
+
+
+def pure(source):
+    """The names of the functions in source found to be pure."""
+    statements = Lox().compile(source)
+    return sorted(declaration.name.lexeme for declaration in find_pure_functions(statements))
+
+
+class PurityTest(unittest.TestCase):
+    def test_pure_functions(self):
+        self.assertEqual(pure('fun square(x) { return x * x; }\n'
+                              'fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }\n'
+                              'fun sum(n) { var total = 0; for (var i = 0; i < n; i = i + 1) total = total + square(i);'
+                              ' return total; }'),
+                         ['fib', 'square', 'sum'])
+
+    def test_print_is_impure(self):
+        self.assertEqual(pure('fun show(x) { print x; return x; }'), [])
+
+    def test_globals_are_impure(self):
+        self.assertEqual(pure('var offset = 1;\nfun read(x) { return x + offset; }\n'
+                              'fun write(x) { offset = x; return x; }'), [])
+
+    def test_reassigned_function_is_impure(self):
+        self.assertEqual(pure('fun square(x) { return x * x; }\nfun twice(x) { return x + x; }\nsquare = twice;'),
+                         ['twice'])
+
+    def test_instance_mutation_is_impure(self):
+        self.assertEqual(pure('fun mark(o) { o.seen = true; return o; }'), [])
+
+    def test_closures_and_classes_are_impure(self):
+        self.assertEqual(pure('fun counter() { var n = 0; fun inc() { n = n + 1; return n; } return inc; }\n'
+                              'fun make() { class A {} return A; }'), [])
+
+    def test_impure_callees_are_impure(self):
+        self.assertEqual(pure('fun show(x) { print x; return x; }\n'
+                              'fun twice(x) { return show(x) + show(x); }\n'
+                              'fun outer(x) { return twice(x); }\n'
+                              'fun now() { return clock(); }'), [])
+
+
+class MemoCacheTest(unittest.TestCase):
+    SOURCE = ('fun square(x) { return x * x; }\n'
+              'print square(1) + square(2) + square(3) + square(1) + square(3);')
+
+    def test_lru_eviction(self):
+        lox = Lox(memo_size=2)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            lox.run(self.SOURCE)
+        self.assertEqual(output.getvalue(), '24\n')
+        cache, = lox.interpreter.memo_caches.values()
+        # square(1) was the least recently used when square(3) came in
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 4, 2))
+        self.assertEqual(list(cache.entries), [((1,), (int,)), ((3,), (int,))])
+
+    def test_memo_size_option(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'script.lox')
+            with open(path, 'w') as lf:
+                lf.write(self.SOURCE)
+            errors = io.StringIO()
+            with redirect_stdout(io.StringIO()), redirect_stderr(errors):
+                main(['--memoize', '--memo-size', '2', '--memo-stats', path])
+        self.assertEqual(errors.getvalue().split(),
+                         ['square', 'hits:', '1', 'misses:', '4', 'evictions:', '2', 'size:', '2/2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from plox.lox import Lox, main
+from plox.output import FlushPolicy, MemoryOutput, NullOutput, Output, StdoutOutput, StreamOutput
+
+
+class _Stream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        super().flush()
+
+
+class OutputTest(unittest.TestCase):
+    def test_policies(self):
+        self.assertEqual([policy.value for policy in FlushPolicy], [1, 2, 3])
+
+    def test_output_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Output()
+
+    def test_block_writes_full_buffers(self):
+        stream = _Stream()
+        output = StreamOutput(stream, FlushPolicy.BLOCK, buffer_lines=3)
+        output.write_line('1')
+        output.write_line('2')
+        self.assertEqual(stream.getvalue(), '')
+        output.write_line('3')
+        self.assertEqual(stream.getvalue(), '1\n2\n3\n')
+        output.write_line('4')
+        output.close()
+        self.assertEqual(stream.getvalue(), '1\n2\n3\n4\n')
+        self.assertEqual(stream.flushes, 0)
+
+    def test_line_writes_and_flushes_every_line(self):
+        stream = _Stream()
+        output = StreamOutput(stream, FlushPolicy.LINE)
+        output.write_line('1')
+        self.assertEqual((stream.getvalue(), stream.flushes), ('1\n', 1))
+        output.write_line('2')
+        self.assertEqual((stream.getvalue(), stream.flushes), ('1\n2\n', 2))
+
+    def test_explicit_waits_for_flush(self):
+        stream = _Stream()
+        output = StreamOutput(stream, FlushPolicy.EXPLICIT, buffer_lines=1)
+        for line in range(1000):
+            output.write_line(str(line))
+        self.assertEqual(stream.getvalue(), '')
+        output.flush()
+        self.assertEqual(stream.getvalue(), ''.join(f'{line}\n' for line in range(1000)))
+
+    def test_memory_and_null_outputs(self):
+        memory = MemoryOutput()
+        memory.write_line('a')
+        memory.write_line('b')
+        self.assertEqual(memory.lines, ['a', 'b'])
+        self.assertEqual(memory.getvalue(), 'a\nb\n')
+
+        null = NullOutput()
+        for line in range(10000):
+            null.write_line(str(line))
+        null.close()
+        self.assertEqual(null.lines, [])
+
+
+class InterpreterOutputTest(unittest.TestCase):
+    def run_lox(self, source, policy, buffer_lines=512):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            lox = Lox(output=StdoutOutput(policy, buffer_lines))
+            lox.run(source)
+        return output.getvalue()
+
+    def test_buffered_print(self):
+        stream = io.StringIO()
+        lox = Lox(output=StreamOutput(stream, FlushPolicy.BLOCK, buffer_lines=2))
+        statements = lox.compile('print 1; print 2; print 3;')
+        interpreter = lox.interpreter
+        interpreter.visit_print_stmt(statements[0])
+        self.assertEqual(stream.getvalue(), '')
+        interpreter.visit_print_stmt(statements[1])
+        self.assertEqual(stream.getvalue(), '1\n2\n')
+        interpreter.visit_print_stmt(statements[2])
+        self.assertEqual(stream.getvalue(), '1\n2\n')
+
+    def test_flush_at_exit(self):
+        for policy in FlushPolicy:
+            self.assertEqual(self.run_lox('print 1; print 2;', policy), '1\n2\n')
+
+    def test_flush_on_runtime_error(self):
+        # printed values come out before the error that stopped the script
+        for policy in FlushPolicy:
+            output = self.run_lox('print 1;\nprint -"a";\nprint 2;', policy)
+            self.assertTrue(output.startswith('1\n'))
+            self.assertIn('[RuntimeError at line 2]', output)
+            self.assertNotIn('2\n', output)
+
+    def test_output_and_flush_options(self):
+        with tempfile.TemporaryDirectory() as directory:
+            script = os.path.join(directory, 'script.lox')
+            with open(script, 'w') as lf:
+                lf.write('for (i in range(3)) print i;')
+            path = os.path.join(directory, 'out.txt')
+            with redirect_stdout(io.StringIO()) as stdout:
+                main(['--output', path, '--flush', 'explicit', script])
+            with open(path) as of:
+                self.assertEqual(of.read(), '0\n1\n2\n')
+            self.assertEqual(stdout.getvalue(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
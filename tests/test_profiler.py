@@ -0,0 +1,142 @@
+import io
+import itertools
+import os
+import pstats
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from plox.lox import Lox, main
+from plox.profiler import SCRIPT, LoxProfiler
+
+SOURCE = '''fun square(x) { return x * x; }
+fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+class A { get() { return square(3); } }
+print fib(5) + A().get();
+'''
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.script = self.path('script.lox')
+        with open(self.script, 'w') as lf:
+            lf.write(SOURCE)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def profile(self, timer=None):
+        profiler = LoxProfiler(self.script)
+        if timer is not None:
+            profiler.timer = timer
+        with redirect_stdout(io.StringIO()):
+            Lox(profiler=profiler).run(SOURCE)
+        return profiler
+
+    def test_pstats_file(self):
+        out = self.path('profile.pstats')
+        with redirect_stdout(io.StringIO()) as output:
+            main(['--profile-out', out, self.script])
+        self.assertEqual(output.getvalue(), '14\n')
+
+        stats = pstats.Stats(out).stats
+        script, fib, square, get = ((self.script, line, name) for line, name in
+                                    ((0, SCRIPT), (2, 'fib'), (1, 'square'), (6, 'A.get')))
+        self.assertEqual(set(stats), {script, fib, square, get})
+        self.assertEqual(stats[fib][:2], (1, 15))
+        self.assertEqual(stats[square][:2], (1, 1))
+        # recursive calls count as callers, but only the outermost is primitive
+        self.assertEqual({caller: edge[:2] for caller, edge in stats[fib][4].items()},
+                         {script: (1, 1), fib: (14, 0)})
+        self.assertEqual(list(stats[square][4]), [get])
+        self.assertEqual(stats[script][4], {})
+
+    def test_times_add_up(self):
+        # a timer that ticks once per reading makes every call take time
+        profiler = self.profile(itertools.count().__next__)
+        profiler.create_stats()
+        stats = profiler.stats
+        script = stats[(self.script, 0, SCRIPT)]
+        self.assertEqual(script[3], sum(entry[2] for entry in stats.values()))
+        fib = stats[(self.script, 2, 'fib')]
+        self.assertEqual(fib[3], sum(edge[3] for edge in fib[4].values()))
+        # fib only calls itself, so all of its time is its own
+        self.assertEqual(fib[3], fib[2])
+        get = stats[(self.script, 6, 'A.get')]
+        self.assertGreater(get[3], get[2])
+
+    def test_report(self):
+        stream = io.StringIO()
+        self.profile().report(stream)
+        report = stream.getvalue()
+        self.assertIn('18 function calls (4 primitive calls)', report)
+        self.assertIn('15/1', report)
+        self.assertIn(f'{self.script}:2(fib)', report)
+
+    def test_callgrind_file(self):
+        out = self.path('profile.callgrind')
+        self.profile(lambda: 0.0).dump_callgrind(out)
+        with open(out) as cf:
+            content = cf.read()
+        self.assertEqual(content, f'''# callgrind format
+events: Microseconds
+
+fl={self.script}
+fn=fib
+2 0
+cfl={self.script}
+cfn=fib
+calls=14 2
+2 0
+
+fl={self.script}
+fn=square
+1 0
+
+fl={self.script}
+fn=A.get
+6 0
+cfl={self.script}
+cfn=square
+calls=1 1
+6 0
+
+fl={self.script}
+fn={SCRIPT}
+0 0
+cfl={self.script}
+cfn=fib
+calls=1 2
+0 0
+cfl={self.script}
+cfn=A.get
+calls=1 6
+0 0
+
+''')
+
+    def test_callgrind_option(self):
+        out = self.path('profile.callgrind')
+        with redirect_stdout(io.StringIO()):
+            main(['--profile-out', out, '--profile-format', 'callgrind', self.script])
+        with open(out) as cf:
+            lines = cf.read().splitlines()
+        self.assertEqual([line for line in lines if line.startswith(('fn=', 'cfn=', 'calls='))],
+                         ['fn=fib', 'cfn=fib', 'calls=14 2', 'fn=square', 'fn=A.get', 'cfn=square', 'calls=1 1',
+                          f'fn={SCRIPT}', 'cfn=fib', 'calls=1 2', 'cfn=A.get', 'calls=1 6'])
+
+    def test_line_hits(self):
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()) as errors:
+            main(['--profile-lines', self.script])
+        hits = errors.getvalue().split('   hits  line\n')[1].splitlines()
+        self.assertEqual(hits[0].split(), ['23', f'{self.script}:3'])
+        self.assertEqual(hits[1].split(), ['7', f'{self.script}:4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from plox.program import CompileError, compile
+
+
+class ProgramTest(unittest.TestCase):
+    def test_compile_error(self):
+        with self.assertRaises(CompileError) as raised:
+            compile('print ;')
+        self.assertEqual(raised.exception.errors[0].line, 1)
+
+    def test_run_collects_output(self):
+        result = compile('print 1 + 2;').run()
+        self.assertTrue(result.ok)
+        self.assertEqual(result.output, '3\n')
+
+    def test_runtime_error(self):
+        result = compile('print 1;\nprint -"a";').run()
+        self.assertFalse(result.ok)
+        self.assertEqual(result.output, '1\n')
+        self.assertEqual(result.error.kind, 'runtime')
+        self.assertEqual(result.error.line, 2)
+
+    def test_reuse_with_different_globals(self):
+        program = compile('var seen = mode * 10; print seen;')
+        first = program.run(globals={'mode': 1})
+        second = program.run(globals={'mode': 2})
+        self.assertEqual((first.output, second.output), ('10\n', '20\n'))
+        self.assertEqual(second.globals['seen'], 20)
+        self.assertEqual(len(program._idle), 1)
+
+    def test_reuse_does_not_keep_globals(self):
+        program = compile('print mode;')
+        program.run(globals={'mode': 1})
+        result = program.run()
+        self.assertEqual(result.error.message, "Undefined variable 'mode'.")
+
+    def test_reuse_with_async_calls(self):
+        program = compile('async fun f() { await sleep(1); return mode; } print await f();')
+        outputs = [program.run(globals={'mode': mode}).output for mode in (1, 2)]
+        self.assertEqual(outputs, ['1\n', '2\n'])
+
+    def test_reuse_resets_the_scheduler(self):
+        program = compile('async fun f() { return 1; } var t = f();')
+        program.run()
+        interpreter = program._idle[0]
+        self.assertIsNone(interpreter.scheduler.current)
+        self.assertIsNone(interpreter.scheduler._loop)
+
+    def test_python_natives(self):
+        result = compile('print twice(21);').run(globals={'twice': lambda x: x * 2})
+        self.assertEqual(result.output, '42\n')
+
+    def test_recursion_error_is_a_diagnostic(self):
+        program = compile('fun f(n) { return f(n + 1); } f(0);')
+        result = program.run()
+        self.assertEqual(result.error.kind, 'internal')
+        self.assertIn('RecursionError', str(result.error))
+        # the pooled interpreter still runs the next program
+        self.assertTrue(compile('print 1;').run().ok)
+        self.assertEqual(len(program._idle), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from plox.lox import Lox, main
+from plox.lox_native import LoxNative
+from plox.profiler import LoxProfiler
+from plox.sampler import Sampler
+
+
+class SamplerTest(unittest.TestCase):
+    def setUp(self):
+        # a timer that never fires during a test, the script takes the samples
+        self.sampler = Sampler(rate=1)
+        self.lox = Lox()
+
+    def run_lox(self, source):
+        self.lox.interpreter.globals.define('probe', LoxNative('probe', 0, self.sampler.sample))
+        self.sampler.start(self.lox.interpreter)
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                self.lox.run(source)
+        finally:
+            self.sampler.stop()
+        return output.getvalue()
+
+    def probed(self):
+        return {stack: count for stack, count in self.sampler.stacks.items() if stack.endswith('probe (native)')}
+
+    def test_call_stack(self):
+        self.run_lox('fun inner() { probe(); }\n'
+                     'class A { outer() {\n'
+                     '  inner();\n'
+                     '} }\n'
+                     'A().outer();\n'
+                     'probe();\n'
+                     'A().outer();')
+        self.assertEqual(self.probed(), {'<script>:5;A.outer:3;inner:1;probe (native)': 1,
+                                         '<script>:6;probe (native)': 1,
+                                         '<script>:7;A.outer:3;inner:1;probe (native)': 1})
+
+    def test_runtime_error_unwinds(self):
+        output = self.run_lox('fun f() {\n  return -"a";\n}\nf();')
+        self.assertIn('[RuntimeError at line 2]', output)
+        self.sampler.start(self.lox.interpreter)
+        self.sampler.sample()
+        self.sampler.stop()
+        self.assertEqual(list(self.sampler.stacks), ['<script>:4'])
+
+    def test_async_calls(self):
+        output = self.run_lox('async fun task(n) {\n'
+                              '  probe();\n'
+                              '  await sleep(0);\n'
+                              '  probe();\n'
+                              '  return n;\n'
+                              '}\n'
+                              'print await task(1) + await task(2);\n'
+                              'probe();')
+        self.assertEqual(output, '3\n')
+        self.assertEqual(self.probed(), {'task (async):2;probe (native)': 2,
+                                         'task (async):4;probe (native)': 2,
+                                         '<script>:8;probe (native)': 1})
+
+    def test_hooks_are_removed(self):
+        self.run_lox('probe();')
+        self.assertFalse({'_invoke', '_call_getter', '_execute'} & set(vars(self.lox.interpreter)))
+
+    def test_profiled_lines_are_counted(self):
+        profiler = LoxProfiler(lines=True)
+        self.lox = Lox(profiler=profiler)
+        self.run_lox('fun f() { probe(); }\nf();\nf();')
+        self.assertEqual(self.probed(), {'<script>:2;f:1;probe (native)': 1, '<script>:3;f:1;probe (native)': 1})
+        # line 1 has the declaration of f and its body, which runs twice
+        self.assertEqual(profiler.lines, {1: 3, 2: 1, 3: 1})
+
+    def test_sample_option(self):
+        with tempfile.TemporaryDirectory() as directory:
+            script = os.path.join(directory, 'script.lox')
+            with open(script, 'w') as lf:
+                lf.write('fun fib(n) {\n  if (n < 2) return n;\n  return fib(n - 1) + fib(n - 2);\n}\n'
+                         'print fib(20);')
+            path = os.path.join(directory, 'out.folded')
+            with redirect_stdout(io.StringIO()) as output:
+                main(['--sample', path, '--sample-rate', '1000', script])
+            with open(path) as ff:
+                lines = ff.read().splitlines()
+        self.assertEqual(output.getvalue(), '6765\n')
+        self.assertTrue(lines)
+        self.assertEqual(lines, sorted(lines))
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+            frames = stack.split(';')
+            self.assertEqual(frames[0], '<script>:5')
+            self.assertTrue(all(frame in ('fib', 'fib:2', 'fib:3') for frame in frames[1:]), stack)
+
+
+if __name__ == '__main__':
+    unittest.main()
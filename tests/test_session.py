@@ -0,0 +1,63 @@
+import io
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from plox.lox import Lox, run_prompt
+
+TIMEOUT = 10
+
+
+def prompt(lines):
+    """Feed lines to the prompt, its output or None when it hangs."""
+    output = io.StringIO()
+    replies = iter(lines)
+
+    def read(_prompt):
+        try:
+            return next(replies)
+        except StopIteration:
+            raise EOFError()
+
+    def run():
+        with redirect_stdout(output), mock.patch('builtins.input', read):
+            run_prompt()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    return None if thread.is_alive() else output.getvalue()
+
+
+class SessionTest(unittest.TestCase):
+    def test_globals_persist(self):
+        lox = Lox(session=True)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            lox.run('var a = 1;')
+            lox.run('fun f() { return a + 1; }')
+            lox.run('f()')
+        self.assertEqual(output.getvalue(), '2\n')
+
+    def test_error_does_not_end_session(self):
+        lox = Lox(session=True)
+        with redirect_stdout(io.StringIO()):
+            lox.run('print -"a";')
+            self.assertTrue(lox.had_runtime_error)
+            lox.run('print 1;')
+        self.assertFalse(lox.had_runtime_error)
+
+    def test_prompt_awaits_after_drained_call(self):
+        output = prompt([
+            'async fun f() { return 1; }',
+            'var t = f();',
+            'await sleep(1)',
+            'await t',
+            'await f()',
+        ])
+        self.assertEqual(output, 'nil\n1\n1\n\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
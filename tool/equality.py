@@ -0,0 +1,43 @@
+import time
+
+i = 0
+
+
+def evaluate_operands():
+    # CPython drops a bare constant, storing it in a local evaluates it
+    # about as cheaply as the Lox expression statement pops it
+    global i
+    while i < 10000000:
+        i = i + 1
+
+        _ = 1; _ = 1; _ = 1; _ = 2; _ = 1; _ = None; _ = 1; _ = "str"; _ = 1; _ = True
+        _ = None; _ = None; _ = None; _ = 1; _ = None; _ = "str"; _ = None; _ = True
+        _ = True; _ = True; _ = True; _ = 1; _ = True; _ = False; _ = True; _ = "str"; _ = True; _ = None
+        _ = "str"; _ = "str"; _ = "str"; _ = "stru"; _ = "str"; _ = 1; _ = "str"; _ = None; _ = "str"; _ = True
+
+
+def compare_operands():
+    global i
+    while i < 10000000:
+        i = i + 1
+
+        1 == 1; 1 == 2; 1 == None; 1 == "str"; 1 == True
+        None == None; None == 1; None == "str"; None == True
+        True == True; True == 1; True == False; True == "str"; True == None
+        "str" == "str"; "str" == "stru"; "str" == 1; "str" == None; "str" == True
+
+
+loopStart = time.time()
+evaluate_operands()
+loopTime = time.time() - loopStart
+
+start = time.time()
+i = 0
+compare_operands()
+elapsed = time.time() - start
+print("loop")
+print(loopTime)
+print("elapsed")
+print(elapsed)
+print("equals")
+print(elapsed - loopTime)
@@ -63,20 +63,23 @@ if __name__ == '__main__':
 
     output_dir = sys.argv[1]
 
+    # annotations are not evaluated, so typing, slow to import, is not needed
     imports = [
-        'from plox.token import Token',
-        'from typing import List'
+        'from __future__ import annotations',
+        'from plox.token import Token'
     ]
     define_ast(output_dir, 'Expr', imports, [
         "Assign   : Token name, Expr value",
+        "Await    : Token keyword, Expr value",
         "Binary   : Expr left, Token operator, Expr right",
-        "Call     : Expr callee, Token paren, List[Expr] arguments",
+        "Call     : Expr callee, Token paren, list[Expr] arguments",
         "Get      : Expr objct, Token name",
         "Grouping : Expr expression",
         "Literal  : object value",
         "Logical  : Expr left, Token operator, Expr right",
         "Set      : Expr objct, Token name, Expr value",
         "Subscript: Expr objct, Token bracket, Expr index",
+        "SubscriptSet: Expr objct, Token bracket, Expr index, Expr value",
         "Super    : Token keyword, Token method",
         "Ternary  : Expr condition, Expr then_branch, Expr else_branch",
         "This     : Token keyword",
@@ -85,19 +88,20 @@ if __name__ == '__main__':
     ])
 
     imports = [
+        'from __future__ import annotations',
         'from plox.expr import Expr, Variable',
-        'from plox.token import Token',
-        'from typing import List'
+        'from plox.token import Token'
     ]
     define_ast(output_dir, 'Stmt', imports, [
-        "Block      : List[Stmt] statements",
+        "Block      : list[Stmt] statements",
         "Break      : Token name",
-        "Function   : Token name, List[Token] params, List[Stmt] body, bool anonymous, bool getter",
-        "Class      : Token name, Variable superclass, List[Function] methods",
+        "Function   : Token name, list[Token] params, list[Stmt] body, bool anonymous, bool getter, bool is_async",
+        "Class      : Token name, Variable superclass, list[Function] methods",
         "Expression : Expr expression",
+        "ForRange   : Token name, Token keyword, Expr start, Expr stop, Expr step, Stmt body",
         "If         : Expr condition, Stmt then_branch, Stmt else_branch",
         "Print      : Expr expression",
         "Return     : Token keyword, Expr value",
         "Var        : Token name, Expr initializer",
-        "While      : Expr condition, Stmt body"
+        "While      : Token keyword, Expr condition, Stmt body"
     ])